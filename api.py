@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field, field_validator
+from starlette.concurrency import run_in_threadpool
+
+import data_manager
+import db_manager
+import metrics
+import notification_manager
+
+# API configuration
+API_HOST = os.environ.get("API_HOST", "0.0.0.0")
+API_PORT = int(os.environ.get("API_PORT", "8000"))
+API_TOKEN = os.environ.get("API_TOKEN")  # if set, clients must send "Authorization: Bearer <token>"
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", "1000"))
+API_MAX_BULK = int(os.environ.get("API_MAX_BULK", "5000"))  # expenses per bulk insert request
+
+# HTTP API over the data layer for scripts and other machine clients. Handlers are async;
+# the blocking db_manager calls run in Starlette's thread pool and share the engine's
+# connection pool, so keep DB_POOL_SIZE + DB_MAX_OVERFLOW in line with the expected
+# concurrency. Writes go to the database and are mirrored to the JSON data file the
+# Streamlit app reads, just like the app's own write paths; data_manager locks the file
+# across processes, so API and app writes don't overwrite each other.
+
+class ExpenseIn(BaseModel):
+    date: Optional[str] = Field(None, description="YYYY-MM-DD HH:MM:SS, defaults to now")
+    expenses: Dict[str, float] = Field(..., min_length=1, description="Amount per category")
+    status: Literal["paid", "unpaid"] = "unpaid"
+    notes: str = ""
+    
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value):
+        if value is not None:
+            datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        return value
+    
+    @field_validator("expenses")
+    @classmethod
+    def check_amounts(cls, value):
+        if any(amount < 0 for amount in value.values()):
+            raise ValueError("amounts must not be negative")
+        return value
+
+class StatusUpdate(BaseModel):
+    status: Literal["paid", "unpaid"]
+
+class MessageIn(BaseModel):
+    sender: str
+    receiver: str
+    content: str = Field(..., min_length=1)
+
+async def require_token(authorization: Optional[str] = Header(None)):
+    """Check the bearer token when API_TOKEN is configured"""
+    if API_TOKEN and authorization != f"Bearer {API_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API token")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Same setup as the Streamlit app, minus the JSON migration; the outbox worker
+    # delivers notifications for API writes even when no Streamlit server is running
+    await run_in_threadpool(db_manager.init_db)
+    data_manager.init_data()
+    notification_manager.start_outbox_worker()
+    metrics.start_exporter()
+    yield
+
+app = FastAPI(title="Expense Tracker API", lifespan=lifespan, dependencies=[Depends(require_token)])
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+def etag_response(request, payload):
+    """JSON response with a weak ETag; answers 304 when the client already has this version"""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+async def require_user(username):
+    """404 unless the user exists"""
+    if await run_in_threadpool(db_manager.get_user_by_name, username) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown user: {username}")
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/users")
+async def list_users(request: Request):
+    return etag_response(request, {"users": await run_in_threadpool(db_manager.get_users)})
+
+@app.get("/users/{username}/expenses")
+async def list_expenses(
+    request: Request,
+    username: str,
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    status: Optional[Literal["paid", "unpaid"]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    await require_user(username)
+    items, next_cursor = await run_in_threadpool(
+        db_manager.get_expenses_page, username, cursor, limit, status, start_date, end_date
+    )
+    return etag_response(request, {"items": items, "next_cursor": next_cursor})
+
+@app.post("/users/{username}/expenses", status_code=201)
+async def add_expenses(username: str, expenses: List[ExpenseIn], skip_duplicates: bool = False):
+    if len(expenses) > API_MAX_BULK:
+        raise HTTPException(status_code=413, detail=f"At most {API_MAX_BULK} expenses per request")
+    await require_user(username)
+    
+    # Same entry format as the Add Expense page
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    entries = [{
+        "date": expense.date or now,
+        "expenses": expense.expenses,
+        "total": sum(expense.expenses.values()),
+        "status": expense.status,
+        "notes": expense.notes
+    } for expense in expenses]
+    
+    # Optionally drop entries identical to recorded ones, so clients can safely retry a batch
+    duplicates = []
+    if skip_duplicates:
+        entries, duplicates = await run_in_threadpool(db_manager.filter_new_expenses, username, entries)
+    
+    expense_ids = await run_in_threadpool(db_manager.bulk_add_expenses, username, entries, True)
+    if expense_ids is None:
+        raise HTTPException(status_code=500, detail="Could not save expenses")
+    
+    if entries:
+        await run_in_threadpool(data_manager.add_expenses, username, entries)
+    
+    notification_manager.wake_outbox_worker()
+    return {"created": len(expense_ids), "ids": expense_ids, "duplicates": len(duplicates)}
+
+@app.patch("/users/{username}/expenses/{expense_id}")
+async def update_expense_status(username: str, expense_id: int, update: StatusUpdate):
+    expense = await run_in_threadpool(
+        db_manager.update_expense_status_by_id, username, expense_id, update.status, True
+    )
+    if expense is None:
+        raise HTTPException(status_code=404, detail=f"Unknown expense: {expense_id}")
+    
+    await run_in_threadpool(data_manager.update_expense_status, username, expense, update.status)
+    
+    notification_manager.wake_outbox_worker()
+    return expense
+
+@app.get("/users/{username}/summary")
+async def get_summary(request: Request, username: str):
+    await require_user(username)
+    return etag_response(request, await run_in_threadpool(db_manager.get_user_summary, username))
+
+@app.get("/messages/{username}/{other_username}")
+async def list_messages(
+    request: Request,
+    username: str,
+    other_username: str,
+    after_id: Optional[int] = Query(None, description="Only messages newer than this id"),
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    mark_read: bool = False
+):
+    await require_user(username)
+    await require_user(other_username)
+    messages = await run_in_threadpool(
+        db_manager.get_messages_since, username, other_username, after_id, limit, mark_read
+    )
+    next_cursor = messages[-1]["id"] if messages else after_id
+    return etag_response(request, {"items": messages, "next_cursor": next_cursor})
+
+@app.post("/messages", status_code=201)
+async def send_message(message: MessageIn):
+    await require_user(message.sender)
+    await require_user(message.receiver)
+    if not await run_in_threadpool(db_manager.send_message, message.sender, message.receiver, message.content):
+        raise HTTPException(status_code=500, detail="Could not send message")
+    return {"sent": True}
+
+# Run the API server
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -1,17 +1,32 @@
+import startup_timing
+
+# Time the app's imports on a cold start (reported once bootstrap finishes)
+startup_timing.start()
+
 import streamlit as st
 import pandas as pd
 import json
+import calendar
 from datetime import datetime, timedelta
 import os
+import time
 from io import BytesIO
-import base64
 
+import cache_manager
+import data_exporter
 import data_manager
 import db_manager
+import metrics
 import notification_manager
+import profiling
+import receipt_generator
 import visualization
 import utils
 
+# Chat polling: the Messages page checks for new messages this often (seconds)
+CHAT_POLL_INTERVAL = float(os.environ.get("CHAT_POLL_INTERVAL", "3"))
+CHAT_HISTORY_LIMIT = int(os.environ.get("CHAT_HISTORY_LIMIT", "200"))  # messages kept per open chat
+
 # Page configuration
 st.set_page_config(
     page_title="Expense Tracker",
@@ -20,11 +35,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Page render time for the metrics (covers the whole rerun, from here to the end of the script)
+render_started = time.perf_counter()
+
+# Opt-in timing of each rerun for the debug panel (DEBUG_PANEL=1)
+if profiling.DEBUG_PANEL:
+    profiling.install()
+    profiling.start_rerun(capture=st.session_state.pop("profile_next_rerun", None))
+
 # Load and apply custom CSS
 def load_css():
     try:
-        with open('.streamlit/style.css', 'r') as f:
-            css = f.read()
+        css = cache_manager.read_asset('.streamlit/style.css')
         st.markdown(f'<style>{css}</style>', unsafe_allow_html=True)
     except Exception as e:
         st.error(f"Error loading CSS: {e}")
@@ -35,79 +57,161 @@ load_css()
 # Display logo at the top
 def render_logo():
     try:
-        with open('assets/images/logo.svg', 'r') as f:
-            logo_svg = f.read()
+        logo_svg = cache_manager.read_asset('assets/images/logo.svg')
         
         st.markdown(f'<div style="text-align: center; margin-bottom: 20px;">{logo_svg}</div>', unsafe_allow_html=True)
     except Exception as e:
         st.image("https://via.placeholder.com/200x100?text=Expense+Tracker", width=200)
 
-# Initialize session state variables
-if 'current_user' not in st.session_state:
-    st.session_state.current_user = None
+# Move the expense history to another page (button callback)
+def change_history_page(step):
+    st.session_state.history_page = st.session_state.get("history_page", 1) + step
 
-# Initialize database
-db_manager.init_db()
-
-# Initialize data file (legacy - will be removed in future)
-data_manager.init_data()
+# Fetch only the messages newer than the last one seen and append them to the session's chat log
+def sync_chat(user, chat_with):
+    chat_log = st.session_state.get("chat_log")
+    
+    if not chat_log or chat_log["user"] != user or chat_log["with"] != chat_with:
+        messages = db_manager.get_messages_since(user, chat_with, limit=CHAT_HISTORY_LIMIT)
+        chat_log = st.session_state.chat_log = {"user": user, "with": chat_with, "messages": messages, "last_id": 0}
+    else:
+        messages = db_manager.get_messages_since(user, chat_with, after_id=chat_log["last_id"])
+        chat_log["messages"].extend(messages)
+        del chat_log["messages"][:-CHAT_HISTORY_LIMIT]
+    
+    if messages:
+        chat_log["last_id"] = messages[-1]["id"]
+    return chat_log["messages"]
 
-# Migrate data from JSON to database if needed
-db_manager.migrate_data_from_json()
+# Display a chat and its message box; reruns on its own every CHAT_POLL_INTERVAL seconds
+@st.fragment(run_every=CHAT_POLL_INTERVAL)
+def show_chat(user, chat_with):
+    # Messages are drawn above the input but fetched after a send, so a new message shows up at once
+    chat_box = st.container()
+    
+    # Message input
+    with st.form(key="message_form", clear_on_submit=True):
+        col1, col2 = st.columns([5, 1])
+        
+        with col1:
+            new_message = st.text_input("Type a message", key="message_input")
+        
+        with col2:
+            submit_message = st.form_submit_button("Send")
+    
+    if submit_message and new_message.strip():
+        # Save and send message
+        if not db_manager.send_message(user, chat_with, new_message):
+            st.error("Failed to send message. Please try again.")
+    
+    messages = sync_chat(user, chat_with)
+    
+    with chat_box:
+        # Display messages
+        st.markdown('<div class="message-container">', unsafe_allow_html=True)
+        
+        if not messages:
+            st.info(f"No messages with {chat_with} yet. Say hello!")
+        else:
+            for msg in messages:
+                # Current user's messages are right-aligned, the other user's left-aligned
+                message_class = "message-sender" if msg["sender"] == user else "message-receiver"
+                st.markdown(
+                    f"""
+                    <div class="message {message_class}">
+                        {msg["content"]}
+                        <div class="message-time">{msg["timestamp"].split()[1]}</div>
+                    </div>
+                    """, 
+                    unsafe_allow_html=True
+                )
+        
+        st.markdown('</div>', unsafe_allow_html=True)
 
-# Sidebar for navigation
-with st.sidebar:
-    st.title("💰 Expense Tracker")
+# Display this month's spend against a user's budgets: usage chart and month-end projection
+def show_budget_usage(budgets):
+    today = datetime.now().date()
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
     
-    # User selection or management
-    st.subheader("User Management")
+    st.plotly_chart(visualization.create_budget_usage_chart(budgets, today), use_container_width=True)
     
-    users = db_manager.get_users()
-    user_action = st.radio("Action", ["Select User", "Add New User"])
+    budgets_df = pd.DataFrame([
+        {
+            "Budget": budget["category"] or "All categories",
+            "Limit": f"₹{budget['budget']:.2f}",
+            "Spent": f"₹{budget['spent']:.2f}",
+            "Remaining": f"₹{budget['remaining']:.2f}",
+            "Used": f"{budget['percent']:.1f}%",
+            # Month-end spend if the rest of the month goes like the days so far
+            "Projected": f"₹{budget['spent'] / today.day * days_in_month:.2f}"
+        }
+        for budget in budgets
+    ])
+    st.dataframe(budgets_df, hide_index=True, use_container_width=True)
+
+# The page itself; its render time and the debug panel are still recorded if it fails or stops early
+page = "Welcome"  # replaced by the selected page once a user is logged in
+try:
+    # Initialize session state variables
+    if 'current_user' not in st.session_state:
+        st.session_state.current_user = None
     
-    if user_action == "Select User":
-        if users:
-            selected_user = st.selectbox("Select User", users)
-            if st.button("Login"):
-                st.session_state.current_user = selected_user
-                st.success(f"Logged in as {selected_user}")
-                st.rerun()
+    # Initialize storage and background workers (once per server process)
+    cache_manager.bootstrap()
+    
+    # Sidebar for navigation
+    with st.sidebar:
+        st.title("💰 Expense Tracker")
+        
+        # User selection or management
+        st.subheader("User Management")
+        
+        users = cache_manager.get_users()
+        user_action = st.radio("Action", ["Select User", "Add New User"])
+        
+        if user_action == "Select User":
+            if users:
+                selected_user = st.selectbox("Select User", users)
+                if st.button("Login"):
+                    st.session_state.current_user = selected_user
+                    st.success(f"Logged in as {selected_user}")
+                    st.rerun()
+            else:
+                st.info("No users found. Please add a user.")
         else:
-            st.info("No users found. Please add a user.")
-    else:
-        new_user = st.text_input("Enter new user name")
-        if st.button("Add User"):
-            if new_user:
-                success = db_manager.add_user(new_user)
-                if success:
-                    st.success(f"User {new_user} added successfully!")
+            new_user = st.text_input("Enter new user name")
+            if st.button("Add User"):
+                if new_user:
+                    success = db_manager.add_user(new_user)
+                    if success:
+                        st.success(f"User {new_user} added successfully!")
+                    else:
+                        st.error(f"User {new_user} already exists.")
                 else:
-                    st.error(f"User {new_user} already exists.")
-            else:
-                st.warning("Please enter a username.")
-    
-    # Navigation (only visible when user is logged in)
-    if st.session_state.current_user:
-        st.divider()
-        st.subheader("Navigation")
-        page = st.radio("", ["Dashboard", "Add Expense", "View History", "Manage Categories", "Messages", "Notification Settings", "Export Data"])
+                    st.warning("Please enter a username.")
         
-        st.divider()
-        if st.button("Logout"):
-            st.session_state.current_user = None
-            st.rerun()
-
-# Main content
-if not st.session_state.current_user:
-    # Welcome page when no user is logged in
-    render_logo()
-    st.title("Welcome to Expense Tracker")
-    st.write("Please select or add a user from the sidebar to get started.")
+        # Navigation (only visible when user is logged in)
+        if st.session_state.current_user:
+            st.divider()
+            st.subheader("Navigation")
+            page = st.radio("", ["Dashboard", "Household Trends", "Add Expense", "View History", "Budgets", "Manage Categories", "Messages", "Notification Settings", "Export Data"])
+            
+            st.divider()
+            if st.button("Logout"):
+                st.session_state.current_user = None
+                st.rerun()
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Features")
-        st.markdown("""
+    # Main content
+    if not st.session_state.current_user:
+        # Welcome page when no user is logged in
+        render_logo()
+        st.title("Welcome to Expense Tracker")
+        st.write("Please select or add a user from the sidebar to get started.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Features")
+            st.markdown("""
         - Track expenses by categories
         - Visualize spending patterns
         - Manage multiple users
@@ -115,528 +219,615 @@ if not st.session_state.current_user:
         - Filter by date and category
         - Mark expenses as paid/unpaid
         """)
-    
-    with col2:
-        st.subheader("Getting Started")
-        st.markdown("""
+        
+        with col2:
+            st.subheader("Getting Started")
+            st.markdown("""
         1. Add a user from the sidebar
         2. Login with your username
         3. Start tracking your expenses
         4. View your financial insights
         """)
-else:
-    # User is logged in, show selected page
-    user = st.session_state.current_user
-    
-    if 'page' not in locals():
-        page = "Dashboard"  # Default page
-    
-    if page == "Dashboard":
-        st.title(f"{user}'s Dashboard")
-        
-        # Get user data
-        data = data_manager.load_data()
-        user_data = data.get(user, [])
+    else:
+        # User is logged in, show selected page
+        user = st.session_state.current_user
         
-        if not user_data:
-            st.info("No expenses recorded yet. Start by adding some expenses!")
-        else:
-            # Summary metrics
-            col1, col2, col3, col4 = st.columns(4)
-            
-            total_spent = sum(entry["total"] for entry in user_data)
-            unpaid_amount = sum(entry["total"] for entry in user_data if entry["status"] == "unpaid")
-            paid_amount = total_spent - unpaid_amount
-            expense_count = len(user_data)
-            
-            with col1:
-                st.metric("Total Expenses", f"₹{total_spent:.2f}")
-            
-            with col2:
-                st.metric("Unpaid Amount", f"₹{unpaid_amount:.2f}")
+        if page == "Dashboard":
+            st.title(f"{user}'s Dashboard")
             
-            with col3:
-                st.metric("Paid Amount", f"₹{paid_amount:.2f}")
+            # Get user data
+            user_data = cache_manager.get_user_expenses(user)
             
-            with col4:
-                st.metric("Number of Entries", expense_count)
-            
-            # Filters for dashboard
-            st.subheader("Filter Dashboard")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Date range filter
-                today = datetime.now().date()
-                thirty_days_ago = today - timedelta(days=30)
+            if not user_data:
+                st.info("No expenses recorded yet. Start by adding some expenses!")
+            else:
+                # Summary metrics
+                col1, col2, col3, col4 = st.columns(4)
                 
-                date_range = st.date_input(
-                    "Select Date Range",
-                    value=(thirty_days_ago, today),
-                    max_value=today
-                )
-            
-            with col2:
-                # Category filter
-                all_categories = data_manager.get_categories()
-                selected_categories = st.multiselect(
-                    "Select Categories", 
-                    all_categories,
-                    default=all_categories
-                )
-            
-            # Apply filters
-            filtered_data = utils.filter_expenses(
-                user_data, 
-                start_date=date_range[0] if len(date_range) > 0 else None,
-                end_date=date_range[1] if len(date_range) > 1 else None,
-                categories=selected_categories
-            )
-            
-            # Visualizations
-            if filtered_data:
-                st.subheader("Expense Analysis")
-                tab1, tab2, tab3 = st.tabs(["Category Breakdown", "Time Series", "Payment Status"])
-                
-                with tab1:
-                    st.plotly_chart(visualization.create_category_pie_chart(filtered_data), use_container_width=True)
-                    
-                with tab2:
-                    st.plotly_chart(visualization.create_time_series_chart(filtered_data), use_container_width=True)
-                    
-                with tab3:
-                    st.plotly_chart(visualization.create_payment_status_chart(filtered_data), use_container_width=True)
-                
-                # Recent transactions
-                st.subheader("Recent Transactions")
-                expenses_df = pd.DataFrame([
-                    {
-                        "Date": datetime.strptime(entry["date"], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y"),
-                        "Amount": f"₹{entry['total']:.2f}",
-                        "Categories": ", ".join(entry["expenses"].keys()),
-                        "Status": entry["status"].capitalize()
-                    }
-                    for entry in sorted(filtered_data, key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d %H:%M:%S"), reverse=True)[:5]
-                ])
-                
-                if not expenses_df.empty:
-                    st.dataframe(expenses_df, use_container_width=True)
+                summary = cache_manager.get_expense_summary(user)
+                
+                with col1:
+                    st.metric("Total Expenses", f"₹{summary['total']:.2f}")
+                
+                with col2:
+                    st.metric("Unpaid Amount", f"₹{summary['unpaid']:.2f}")
+                
+                with col3:
+                    st.metric("Paid Amount", f"₹{summary['paid']:.2f}")
+                
+                with col4:
+                    st.metric("Number of Entries", summary["count"])
+                
+                # Read from the budget totals kept by every write, so this costs no scan of the expenses
+                budgets = cache_manager.get_budget_status(user)
+                if budgets:
+                    st.subheader("Budgets This Month")
+                    show_budget_usage(budgets)
+                
+                # Filters for dashboard
+                st.subheader("Filter Dashboard")
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    # Date range filter
+                    today = datetime.now().date()
+                    thirty_days_ago = today - timedelta(days=30)
+                    
+                    date_range = st.date_input(
+                        "Select Date Range",
+                        value=(thirty_days_ago, today),
+                        max_value=today
+                    )
+                
+                with col2:
+                    # Category filter
+                    all_categories = cache_manager.get_categories()
+                    selected_categories = st.multiselect(
+                        "Select Categories", 
+                        all_categories,
+                        default=all_categories
+                    )
+                
+                # Apply filters (cached newest first, shared with the charts below)
+                start_date = date_range[0] if len(date_range) > 0 else None
+                end_date = date_range[1] if len(date_range) > 1 else None
+                filtered_data = cache_manager.get_filtered_expenses(user, start_date, end_date, selected_categories)
+                
+                # Visualizations
+                if filtered_data:
+                    st.subheader("Expense Analysis")
+                    charts = cache_manager.get_dashboard_charts(user, start_date, end_date, selected_categories)
+                    tab1, tab2, tab3, tab4 = st.tabs(["Category Breakdown", "Time Series", "Payment Status", "Monthly Trends"])
+                    
+                    with tab1:
+                        st.plotly_chart(charts["category"], use_container_width=True)
+                        
+                    with tab2:
+                        st.plotly_chart(charts["time_series"], use_container_width=True)
+                        
+                    with tab3:
+                        st.plotly_chart(charts["status"], use_container_width=True)
+                    
+                    with tab4:
+                        st.plotly_chart(charts["monthly"], use_container_width=True)
+                    
+                    # Recent transactions
+                    st.subheader("Recent Transactions")
+                    expenses_df = pd.DataFrame([
+                        {
+                            "Date": datetime.strptime(entry["date"], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y"),
+                            "Amount": f"₹{entry['total']:.2f}",
+                            "Categories": ", ".join(entry["expenses"].keys()),
+                            "Status": entry["status"].capitalize()
+                        }
+                        for entry in filtered_data[:5]
+                    ])
+                    
+                    if not expenses_df.empty:
+                        st.dataframe(expenses_df, use_container_width=True)
+                    else:
+                        st.info("No transactions match your filters.")
                 else:
-                    st.info("No transactions match your filters.")
-            else:
-                st.info("No expenses match your selected filters.")
-    
-    elif page == "Add Expense":
-        st.title("Add New Expense")
-        
-        # Get categories
-        categories = data_manager.get_categories()
+                    st.info("No expenses match your selected filters.")
         
-        with st.form("expense_form"):
-            st.write("Enter amount for each category (leave blank to skip)")
-            
-            expense_inputs = {}
-            col1, col2 = st.columns(2)
+        elif page == "Household Trends":
+            st.title("Household Trends")
             
-            # Create two columns of category inputs
-            half = len(categories) // 2 + len(categories) % 2
+            trends = cache_manager.get_household_trends()
             
-            with col1:
-                for category in categories[:half]:
-                    expense_inputs[category] = st.number_input(f"{category} (₹)", min_value=0.0, step=1.0, format="%.2f")
-            
-            with col2:
-                for category in categories[half:]:
-                    expense_inputs[category] = st.number_input(f"{category} (₹)", min_value=0.0, step=1.0, format="%.2f")
-            
-            # Additional notes
-            notes = st.text_area("Notes (optional)")
-            
-            submitted = st.form_submit_button("Save Expense")
-            
-            if submitted:
-                # Filter out zero amounts
-                expenses = {k: v for k, v in expense_inputs.items() if v > 0}
-                
-                if expenses:
-                    # Create expense entry
-                    entry = {
-                        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "expenses": expenses,
-                        "total": sum(expenses.values()),
-                        "status": "unpaid",
-                        "notes": notes
-                    }
-                    
-                    # Add the expense to the database
-                    data_manager.add_expense(user, entry)
-                    
-                    # Send notifications to other users
-                    notification_count = notification_manager.notify_new_expense(user, entry)
-                    
-                    if notification_count > 0:
-                        st.success(f"Expense added successfully! Notifications sent to {notification_count} users.")
-                    else:
-                        st.success("Expense added successfully!")
+            if trends.empty:
+                st.info("No expenses recorded yet. Start by adding some expenses!")
+            else:
+                # Limit the comparison to the selected household members
+                members = sorted(trends["User"].unique())
+                selected_members = st.multiselect("Household Members", members, default=members)
+                trends = trends[trends["User"].isin(selected_members)]
+                
+                if trends.empty:
+                    st.info("Select at least one household member.")
                 else:
-                    st.error("Please enter at least one expense amount.")
-    
-    elif page == "View History":
-        st.title("Expense History")
-        
-        # Get user data
-        data = data_manager.load_data()
-        user_data = data.get(user, [])
+                    # Household totals across the selected members
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        st.metric("Household Total", f"₹{trends['Total'].sum():.2f}")
+                    
+                    with col2:
+                        st.metric("Unpaid", f"₹{trends['Unpaid'].sum():.2f}")
+                    
+                    with col3:
+                        st.metric("Paid", f"₹{trends['Paid'].sum():.2f}")
+                    
+                    tab1, tab2 = st.tabs(["Member Comparison", "Paid vs Unpaid"])
+                    
+                    with tab1:
+                        st.plotly_chart(visualization.create_household_comparison_chart(trends), use_container_width=True)
+                    
+                    with tab2:
+                        st.plotly_chart(visualization.create_household_status_chart(trends), use_container_width=True)
+                    
+                    # Month-by-member table
+                    st.subheader("Monthly Totals")
+                    table = trends.pivot_table(index="Month", columns="User", values="Total", aggfunc="sum", fill_value=0)
+                    table.index = table.index.strftime("%b %Y")
+                    st.dataframe(table.style.format("₹{:.2f}"), use_container_width=True)
         
-        if not user_data:
-            st.info("No expenses recorded yet.")
-        else:
-            # Filters
-            st.subheader("Filter Expenses")
-            col1, col2, col3 = st.columns(3)
+        elif page == "Add Expense":
+            st.title("Add New Expense")
             
-            with col1:
-                # Date range filter
-                today = datetime.now().date()
-                last_year = today.replace(year=today.year - 1)
-                
-                date_range = st.date_input(
-                    "Date Range",
-                    value=(last_year, today),
-                    max_value=today
-                )
-            
-            with col2:
-                # Category filter
-                all_categories = data_manager.get_categories()
-                selected_categories = st.multiselect(
-                    "Categories", 
-                    all_categories,
-                    default=[]
-                )
-            
-            with col3:
-                # Status filter
-                status_filter = st.selectbox("Payment Status", ["All", "Paid", "Unpaid"])
-            
-            # Apply filters
-            filtered_status = None if status_filter == "All" else status_filter.lower()
-            
-            filtered_data = utils.filter_expenses(
-                user_data, 
-                start_date=date_range[0] if len(date_range) > 0 else None,
-                end_date=date_range[1] if len(date_range) > 1 else None,
-                categories=selected_categories if selected_categories else None,
-                status=filtered_status
-            )
-            
-            # Sort filtered data
-            sort_option = st.selectbox("Sort By", ["Newest First", "Oldest First", "Amount (High to Low)", "Amount (Low to High)"])
+            # Get categories
+            categories = cache_manager.get_categories()
             
-            if sort_option == "Newest First":
-                filtered_data = sorted(filtered_data, key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d %H:%M:%S"), reverse=True)
-            elif sort_option == "Oldest First":
-                filtered_data = sorted(filtered_data, key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d %H:%M:%S"))
-            elif sort_option == "Amount (High to Low)":
-                filtered_data = sorted(filtered_data, key=lambda x: x["total"], reverse=True)
-            elif sort_option == "Amount (Low to High)":
-                filtered_data = sorted(filtered_data, key=lambda x: x["total"])
-            
-            # Display results
-            if filtered_data:
-                st.subheader(f"Found {len(filtered_data)} expenses")
-                
-                # Create expense entries
-                for i, entry in enumerate(filtered_data):
-                    with st.expander(f"₹{entry['total']:.2f} - {entry['date']} ({entry['status'].upper()})"):
-                        col1, col2 = st.columns([3, 1])
+            with st.form("expense_form"):
+                st.write("Enter amount for each category (leave blank to skip)")
+                
+                expense_inputs = {}
+                col1, col2 = st.columns(2)
+                
+                # Create two columns of category inputs
+                half = len(categories) // 2 + len(categories) % 2
+                
+                with col1:
+                    for category in categories[:half]:
+                        expense_inputs[category] = st.number_input(f"{category} (₹)", min_value=0.0, step=1.0, format="%.2f")
+                
+                with col2:
+                    for category in categories[half:]:
+                        expense_inputs[category] = st.number_input(f"{category} (₹)", min_value=0.0, step=1.0, format="%.2f")
+                
+                # Additional notes
+                notes = st.text_area("Notes (optional)")
+                
+                allow_duplicate = st.checkbox("Save even if it looks like a duplicate")
+                
+                submitted = st.form_submit_button("Save Expense")
+                
+                if submitted:
+                    # Filter out zero amounts
+                    expenses = {k: v for k, v in expense_inputs.items() if v > 0}
+                    
+                    if expenses:
+                        # Create expense entry
+                        entry = {
+                            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "expenses": expenses,
+                            "total": sum(expenses.values()),
+                            "status": "unpaid",
+                            "notes": notes
+                        }
                         
-                        with col1:
-                            # Expense details
-                            st.write("**Categories:**")
-                            for cat, amount in entry["expenses"].items():
-                                st.write(f"- {cat}: ₹{amount:.2f}")
-                            
-                            if "notes" in entry and entry["notes"]:
-                                st.write("**Notes:**", entry["notes"])
+                        # Same amount recorded a few minutes ago is most likely a double submission
+                        duplicates = db_manager.find_duplicate_expenses(user, entry)["near"]
                         
-                        with col2:
-                            # Status and actions
-                            status_color = "red" if entry["status"] == "unpaid" else "green"
-                            st.markdown(f"<h3 style='color:{status_color};'>Status: {entry['status'].upper()}</h3>", unsafe_allow_html=True)
+                        if duplicates and not allow_duplicate:
+                            recorded_at = ", ".join(duplicate["date"] for duplicate in duplicates)
+                            st.warning(f"An expense of ₹{entry['total']:.2f} was already recorded at {recorded_at}. "
+                                       "Tick \"Save even if it looks like a duplicate\" and save again to add it anyway.")
+                        else:
+                            # Add the expense to the data file
+                            data_manager.add_expense(user, entry)
                             
-                            # Toggle payment status
-                            new_status = "paid" if entry["status"] == "unpaid" else "unpaid"
-                            if st.button(f"Mark as {new_status.upper()}", key=f"toggle_{i}"):
-                                # Update expense status
-                                data_manager.update_expense_status(user, entry, new_status)
-                                
-                                # Send notification about status change
-                                notification_count = notification_manager.notify_status_change(user, entry, new_status)
-                                
-                                if notification_count > 0:
-                                    st.success(f"Marked as {new_status}. Notifications sent to {notification_count} users.")
-                                else:
-                                    st.success(f"Marked as {new_status}")
-                                st.rerun()
-            else:
-                st.info("No expenses match your filters.")
-    
-    elif page == "Manage Categories":
-        st.title("Manage Categories")
-        
-        # Get current categories
-        categories = data_manager.get_categories()
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Current Categories")
-            for category in categories:
-                st.write(f"- {category}")
-        
-        with col2:
-            st.subheader("Add New Category")
-            with st.form("add_category"):
-                new_category = st.text_input("Category Name")
-                submit = st.form_submit_button("Add Category")
-                
-                if submit and new_category:
-                    success = data_manager.add_category(new_category)
-                    if success:
-                        st.success(f"Category '{new_category}' added successfully!")
-                        st.rerun()
+                            # Record it in the database along with notifications for other users
+                            if db_manager.add_expense(user, entry, notify=True):
+                                notification_manager.wake_outbox_worker()
+                            
+                            st.success("Expense added successfully!")
                     else:
-                        st.error(f"Category '{new_category}' already exists.")
-    
-    elif page == "Messages":
-        st.title("Messages")
-        
-        # Get other users for chat selection
-        other_users = [u for u in db_manager.get_users() if u != user]
+                        st.error("Please enter at least one expense amount.")
         
-        if not other_users:
-            st.info("No other users available to message.")
-        else:
-            # Set up columns for the messaging interface
-            col1, col2 = st.columns([1, 3])
+        elif page == "View History":
+            st.title("Expense History")
             
-            with col1:
-                st.subheader("Contacts")
-                # Initialize session state for selected user if not set
-                if "selected_chat_user" not in st.session_state:
-                    st.session_state.selected_chat_user = other_users[0]
-                
-                # User selection
-                for other_user in other_users:
-                    # Get unread message count
-                    unread_count = db_manager.get_unread_message_count(user)
-                    count_display = f" ({unread_count})" if unread_count > 0 else ""
-                    
-                    if st.button(f"{other_user}{count_display}", key=f"user_{other_user}", 
-                               use_container_width=True,
-                               help=f"Chat with {other_user}"):
-                        st.session_state.selected_chat_user = other_user
-                        st.rerun()
+            # Get user data
+            user_data = cache_manager.get_user_expenses(user)
             
-            with col2:
-                chat_with = st.session_state.selected_chat_user
-                st.subheader(f"Chat with {chat_with}")
+            if not user_data:
+                st.info("No expenses recorded yet.")
+            else:
+                # Filters
+                st.subheader("Filter Expenses")
+                col1, col2, col3 = st.columns(3)
                 
-                # Get messages
-                messages = db_manager.get_messages(user, chat_with)
+                with col1:
+                    # Date range filter
+                    today = datetime.now().date()
+                    last_year = today.replace(year=today.year - 1)
+                    
+                    date_range = st.date_input(
+                        "Date Range",
+                        value=(last_year, today),
+                        max_value=today
+                    )
                 
-                # Display messages
-                st.markdown('<div class="message-container">', unsafe_allow_html=True)
+                with col2:
+                    # Category filter
+                    all_categories = cache_manager.get_categories()
+                    selected_categories = st.multiselect(
+                        "Categories", 
+                        all_categories,
+                        default=[]
+                    )
                 
-                if not messages:
-                    st.info(f"No messages with {chat_with} yet. Say hello!")
-                else:
-                    for msg in messages:
-                        if msg["sender"] == user:
-                            # Current user message (right-aligned)
-                            st.markdown(
-                                f"""
-                                <div class="message message-sender">
-                                    {msg["content"]}
-                                    <div class="message-time">{msg["timestamp"].split()[1]}</div>
-                                </div>
-                                """, 
-                                unsafe_allow_html=True
-                            )
-                        else:
-                            # Other user message (left-aligned)
-                            st.markdown(
-                                f"""
-                                <div class="message message-receiver">
-                                    {msg["content"]}
-                                    <div class="message-time">{msg["timestamp"].split()[1]}</div>
-                                </div>
-                                """, 
-                                unsafe_allow_html=True
-                            )
+                with col3:
+                    # Status filter
+                    status_filter = st.selectbox("Payment Status", ["All", "Paid", "Unpaid"])
                 
-                st.markdown('</div>', unsafe_allow_html=True)
+                # Apply filters
+                filtered_status = None if status_filter == "All" else status_filter.lower()
                 
-                # Message input
-                with st.form(key="message_form", clear_on_submit=True):
-                    col1, col2 = st.columns([5, 1])
+                # Sort filtered data
+                sort_option = st.selectbox("Sort By", utils.SORT_OPTIONS)
+                
+                # Filtered and sorted list is cached until the user's expenses change,
+                # so moving between pages only renders the requested slice
+                filtered_data = cache_manager.get_filtered_expenses(
+                    user,
+                    start_date=date_range[0] if len(date_range) > 0 else None,
+                    end_date=date_range[1] if len(date_range) > 1 else None,
+                    categories=selected_categories if selected_categories else None,
+                    status=filtered_status,
+                    sort_option=sort_option
+                )
+                
+                # Display results
+                if filtered_data:
+                    st.subheader(f"Found {len(filtered_data)} expenses")
+                    
+                    # Bulk receipt export for the filtered expenses
+                    with st.expander("Download Receipts"):
+                        st.write(f"Bundle receipts for these {len(filtered_data)} expenses into a ZIP archive.")
+                        receipt_format = st.radio("Receipt Format", ["HTML", "PDF"], horizontal=True)
+                        if st.button("Prepare Receipts ZIP"):
+                            # st.download_button holds the whole file in memory, so downloads are built as bytes
+                            with st.spinner("Building receipts archive..."):
+                                archive = receipt_generator.build_receipts_zip(
+                                    user, filtered_data, receipt_format=receipt_format.lower()
+                                )
+                            st.download_button(
+                                "Download Receipts ZIP",
+                                data=archive,
+                                file_name=f"{user}_receipts.zip",
+                                mime="application/zip"
+                            )
                     
+                    # Pagination controls
+                    col1, col2 = st.columns(2)
                     with col1:
-                        new_message = st.text_input("Type a message", key="message_input")
+                        page_size = st.selectbox("Expenses per page", [10, 25, 50, 100], index=1)
+                    
+                    # Go back to the first page whenever the filters change
+                    filter_signature = (tuple(date_range), tuple(selected_categories), status_filter, sort_option, page_size)
+                    if st.session_state.get("history_filters") != filter_signature:
+                        st.session_state.history_filters = filter_signature
+                        st.session_state.history_page = 1
                     
                     with col2:
-                        submit_message = st.form_submit_button("Send")
-                
-                if submit_message and new_message.strip():
-                    # Save and send message
-                    if db_manager.send_message(user, chat_with, new_message):
-                        st.rerun()  # Refresh to show new message
-                    else:
-                        st.error("Failed to send message. Please try again.")
-    
-    elif page == "Notification Settings":
-        st.title("Notification Settings")
-        
-        # Get current notification preferences
-        prefs = db_manager.get_user_notification_preferences(user)
+                        if sort_option in ("Newest First", "Oldest First"):
+                            jump_date = st.date_input("Jump to date", value=None, key="history_jump_date")
+                            if jump_date and st.session_state.get("history_jumped_to") != jump_date:
+                                st.session_state.history_page = utils.find_page_for_date(
+                                    filtered_data, jump_date, page_size, sort_option
+                                )
+                            st.session_state.history_jumped_to = jump_date
+                    
+                    page_data, page_count = utils.paginate(filtered_data, st.session_state.history_page, page_size)
+                    st.session_state.history_page = min(max(st.session_state.history_page, 1), page_count)
+                    first_index = (st.session_state.history_page - 1) * page_size
+                    
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col1:
+                        st.button("← Previous", disabled=st.session_state.history_page <= 1,
+                                  on_click=change_history_page, args=(-1,))
+                    with col2:
+                        st.write(f"Page {st.session_state.history_page} of {page_count} "
+                                 f"(expenses {first_index + 1}-{first_index + len(page_data)})")
+                    with col3:
+                        st.button("Next →", disabled=st.session_state.history_page >= page_count,
+                                  on_click=change_history_page, args=(1,))
+                    
+                    # Create expense entries for the current page only
+                    for i, entry in enumerate(page_data, start=first_index):
+                        with st.expander(f"₹{entry['total']:.2f} - {entry['date']} ({entry['status'].upper()})"):
+                            col1, col2 = st.columns([3, 1])
+                            
+                            with col1:
+                                # Expense details
+                                st.write("**Categories:**")
+                                for cat, amount in entry["expenses"].items():
+                                    st.write(f"- {cat}: ₹{amount:.2f}")
+                                
+                                if "notes" in entry and entry["notes"]:
+                                    st.write("**Notes:**", entry["notes"])
+                            
+                            with col2:
+                                # Status and actions
+                                status_color = "red" if entry["status"] == "unpaid" else "green"
+                                st.markdown(f"<h3 style='color:{status_color};'>Status: {entry['status'].upper()}</h3>", unsafe_allow_html=True)
+                                
+                                # Toggle payment status
+                                new_status = "paid" if entry["status"] == "unpaid" else "unpaid"
+                                if st.button(f"Mark as {new_status.upper()}", key=f"toggle_{i}"):
+                                    # Update expense status
+                                    data_manager.update_expense_status(user, entry, new_status)
+                                    
+                                    # Update the database and queue notifications about the change
+                                    if db_manager.update_expense_status(user, entry, new_status, notify=True):
+                                        notification_manager.wake_outbox_worker()
+                                    
+                                    st.success(f"Marked as {new_status}")
+                                    st.rerun()
+                else:
+                    st.info("No expenses match your filters.")
         
-        if not prefs:
-            st.error("Could not retrieve notification preferences.")
-        else:
-            st.info("Set up notifications to receive alerts when expenses are added or updated.")
+        elif page == "Budgets":
+            st.title("Budgets")
             
-            with st.form("notification_preferences"):
-                st.subheader("SMS Notification Settings")
-                
-                phone_number = st.text_input(
-                    "Phone Number (with country code, e.g., +919876543210)", 
-                    value=prefs.get("phone_number", "")
-                )
-                
-                st.write("Enable notifications for:")
+            with st.form("set_budget"):
+                st.subheader("Set a Monthly Budget")
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    notify_new_expense = st.checkbox(
-                        "New expenses added by other users", 
-                        value=prefs.get("notify_on_new_expense", False)
-                    )
-                    
-                    notify_status_change = st.checkbox(
-                        "Expense status changes", 
-                        value=prefs.get("notify_on_status_change", False)
-                    )
+                    budget_category = st.selectbox("Category", ["All categories"] + cache_manager.get_categories())
                 
                 with col2:
-                    notify_daily_summary = st.checkbox(
-                        "Daily expense summary", 
-                        value=prefs.get("notify_daily_summary", False)
-                    )
+                    budget_amount = st.number_input("Monthly limit (₹)", min_value=0.0, step=500.0, format="%.2f",
+                                                    help="Set to 0 to remove the budget")
                 
-                st.caption("Note: Standard SMS rates may apply based on your mobile plan.")
+                thresholds = ", ".join(f"{percent}%" for percent in db_manager.BUDGET_ALERT_THRESHOLDS)
+                budget_alert = st.checkbox(f"Send me an SMS when this month's spending reaches {thresholds} of the limit",
+                                           value=True)
+                st.caption("Alerts go to the phone number in Notification Settings.")
                 
-                submit = st.form_submit_button("Save Notification Preferences")
-                
-                if submit:
-                    if any([notify_new_expense, notify_status_change, notify_daily_summary]) and not phone_number:
-                        st.error("Please enter a phone number to receive notifications.")
-                    else:
-                        success = db_manager.set_user_notification_preferences(
-                            user,
-                            phone_number=phone_number if phone_number else None,
-                            notify_on_new_expense=notify_new_expense,
-                            notify_on_status_change=notify_status_change,
-                            notify_daily_summary=notify_daily_summary
-                        )
-                        
-                        if success:
-                            st.success("Notification preferences saved successfully!")
+                if st.form_submit_button("Save Budget"):
+                    category = None if budget_category == "All categories" else budget_category
+                    if db_manager.set_budget(user, budget_amount, category, alert=budget_alert):
+                        if budget_amount > 0:
+                            st.success(f"Budget for {budget_category} set to ₹{budget_amount:.2f} a month.")
                         else:
-                            st.error("Error saving notification preferences.")
+                            st.success(f"Budget for {budget_category} removed.")
+                    else:
+                        st.error("Error saving budget.")
             
-            # Testing section
-            st.subheader("Test Notifications")
-            if not phone_number:
-                st.warning("Add a phone number above to test notifications.")
+            budgets = cache_manager.get_budget_status(user)
+            st.subheader(f"{datetime.now().strftime('%B %Y')}")
+            if budgets:
+                show_budget_usage(budgets)
             else:
-                if st.button("Send Test SMS"):
-                    test_message = f"This is a test notification from your Expense Tracker app. Time: {datetime.now().strftime('%H:%M:%S')}"
-                    if notification_manager.send_sms_notification(phone_number, test_message):
-                        st.success("Test notification sent successfully!")
-                    else:
-                        st.error("Failed to send test notification. Please check your phone number and try again.")
-    
-    elif page == "Export Data":
-        st.title("Export Data")
+                st.info("No budgets yet. Set a monthly limit for all your spending or for a category above.")
         
-        # Get user data
-        data = data_manager.load_data()
-        user_data = data.get(user, [])
+        elif page == "Manage Categories":
+            st.title("Manage Categories")
+            
+            # Get current categories
+            categories = cache_manager.get_categories()
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Current Categories")
+                for category in categories:
+                    st.write(f"- {category}")
+            
+            with col2:
+                st.subheader("Add New Category")
+                with st.form("add_category"):
+                    new_category = st.text_input("Category Name")
+                    submit = st.form_submit_button("Add Category")
+                    
+                    if submit and new_category:
+                        success = data_manager.add_category(new_category)
+                        if success:
+                            st.success(f"Category '{new_category}' added successfully!")
+                            st.rerun()
+                        else:
+                            st.error(f"Category '{new_category}' already exists.")
         
-        if not user_data:
-            st.info("No expenses recorded yet.")
-        else:
-            st.subheader("Export Options")
+        elif page == "Messages":
+            st.title("Messages")
             
-            # Date range for export
-            today = datetime.now().date()
-            default_start = today.replace(month=1, day=1)  # First day of current year
+            # Get other users for chat selection
+            other_users = [u for u in cache_manager.get_users() if u != user]
             
-            export_date_range = st.date_input(
-                "Select Date Range for Export",
-                value=(default_start, today),
-                max_value=today
-            )
+            if not other_users:
+                st.info("No other users available to message.")
+            else:
+                # Set up columns for the messaging interface
+                col1, col2 = st.columns([1, 3])
+                
+                with col1:
+                    st.subheader("Contacts")
+                    # Initialize session state for selected user if not set
+                    if "selected_chat_user" not in st.session_state:
+                        st.session_state.selected_chat_user = other_users[0]
+                    
+                    # User selection
+                    for other_user in other_users:
+                        # Get unread message count
+                        unread_count = cache_manager.get_unread_message_count(user)
+                        count_display = f" ({unread_count})" if unread_count > 0 else ""
+                        
+                        if st.button(f"{other_user}{count_display}", key=f"user_{other_user}", 
+                                   use_container_width=True,
+                                   help=f"Chat with {other_user}"):
+                            st.session_state.selected_chat_user = other_user
+                            st.rerun()
+                
+                with col2:
+                    chat_with = st.session_state.selected_chat_user
+                    st.subheader(f"Chat with {chat_with}")
+                    
+                    # Messages and input refresh on their own without rerunning the page
+                    show_chat(user, chat_with)
+        
+        elif page == "Notification Settings":
+            st.title("Notification Settings")
             
-            # Apply date filter
-            filtered_data = utils.filter_expenses(
-                user_data, 
-                start_date=export_date_range[0] if len(export_date_range) > 0 else None,
-                end_date=export_date_range[1] if len(export_date_range) > 1 else None
-            )
+            # Get current notification preferences
+            prefs = cache_manager.get_notification_preferences(user)
             
-            if filtered_data:
-                # Create DataFrame for export
-                export_records = []
+            if not prefs:
+                st.error("Could not retrieve notification preferences.")
+            else:
+                st.info("Set up notifications to receive alerts when expenses are added or updated.")
                 
-                for entry in filtered_data:
-                    record = {
-                        "Date": entry["date"],
-                        "Total": entry["total"],
-                        "Status": entry["status"].capitalize()
-                    }
+                with st.form("notification_preferences"):
+                    st.subheader("SMS Notification Settings")
+                    
+                    phone_number = st.text_input(
+                        "Phone Number (with country code, e.g., +919876543210)", 
+                        value=prefs.get("phone_number", "")
+                    )
+                    
+                    st.write("Enable notifications for:")
                     
-                    # Add categories as columns
-                    for category, amount in entry["expenses"].items():
-                        record[category] = amount
+                    col1, col2 = st.columns(2)
                     
-                    # Add notes if present
-                    if "notes" in entry:
-                        record["Notes"] = entry["notes"]
+                    with col1:
+                        notify_new_expense = st.checkbox(
+                            "New expenses added by other users", 
+                            value=prefs.get("notify_on_new_expense", False)
+                        )
+                        
+                        notify_status_change = st.checkbox(
+                            "Expense status changes", 
+                            value=prefs.get("notify_on_status_change", False)
+                        )
                     
-                    export_records.append(record)
+                    with col2:
+                        notify_daily_summary = st.checkbox(
+                            "Daily expense summary", 
+                            value=prefs.get("notify_daily_summary", False)
+                        )
+                        
+                        daily_summary_time = st.time_input(
+                            "Send daily summary at",
+                            value=datetime.strptime(prefs.get("daily_summary_time") or "20:00", "%H:%M").time()
+                        )
+                    
+                    st.caption("Note: Standard SMS rates may apply based on your mobile plan.")
+                    
+                    submit = st.form_submit_button("Save Notification Preferences")
+                    
+                    if submit:
+                        if any([notify_new_expense, notify_status_change, notify_daily_summary]) and not phone_number:
+                            st.error("Please enter a phone number to receive notifications.")
+                        else:
+                            success = db_manager.set_user_notification_preferences(
+                                user,
+                                phone_number=phone_number if phone_number else None,
+                                notify_on_new_expense=notify_new_expense,
+                                notify_on_status_change=notify_status_change,
+                                notify_daily_summary=notify_daily_summary,
+                                daily_summary_time=daily_summary_time.strftime("%H:%M")
+                            )
+                            
+                            if success:
+                                st.success("Notification preferences saved successfully!")
+                            else:
+                                st.error("Error saving notification preferences.")
                 
-                export_df = pd.DataFrame(export_records)
+                # Testing section
+                st.subheader("Test Notifications")
+                if not phone_number:
+                    st.warning("Add a phone number above to test notifications.")
+                else:
+                    if st.button("Send Test SMS"):
+                        test_message = f"This is a test notification from your Expense Tracker app. Time: {datetime.now().strftime('%H:%M:%S')}"
+                        if notification_manager.send_sms_notification(phone_number, test_message):
+                            st.success("Test notification sent successfully!")
+                        else:
+                            st.error("Failed to send test notification. Please check your phone number and try again.")
+        
+        elif page == "Export Data":
+            st.title("Export Data")
+            
+            # Get user data
+            user_data = cache_manager.get_user_expenses(user)
+            
+            if not user_data:
+                st.info("No expenses recorded yet.")
+            else:
+                st.subheader("Export Options")
                 
-                # Show preview
-                st.subheader("Data Preview")
-                st.dataframe(export_df.head(5), use_container_width=True)
+                # Date range for export
+                today = datetime.now().date()
+                default_start = today.replace(month=1, day=1)  # First day of current year
                 
-                col1, col2 = st.columns(2)
+                export_date_range = st.date_input(
+                    "Select Date Range for Export",
+                    value=(default_start, today),
+                    max_value=today
+                )
                 
-                with col1:
-                    # Export to CSV
-                    csv = export_df.to_csv(index=False)
-                    csv_b64 = base64.b64encode(csv.encode()).decode()
-                    href = f'<a href="data:file/csv;base64,{csv_b64}" download="{user}_expenses.csv" class="button">Download CSV</a>'
-                    st.markdown(href, unsafe_allow_html=True)
+                start_date = export_date_range[0] if len(export_date_range) > 0 else None
+                end_date = export_date_range[1] if len(export_date_range) > 1 else None
                 
-                with col2:
-                    # Export summary stats
-                    st.write(f"Total Records: {len(export_df)}")
-                    st.write(f"Date Range: {export_date_range[0]} to {export_date_range[1]}")
-                    st.write(f"Total Amount: ₹{export_df['Total'].sum():.2f}")
-            else:
-                st.info("No data available for the selected date range.")
+                # Apply date filter (cached; the export itself streams from this list in chunks)
+                filtered_data = cache_manager.get_filtered_expenses(
+                    user,
+                    start_date=start_date,
+                    end_date=end_date,
+                    sort_option="Oldest First"
+                )
+                
+                if filtered_data:
+                    # Show preview
+                    st.subheader("Data Preview")
+                    categories = data_exporter.get_export_categories(filtered_data)
+                    preview_rows = next(data_exporter.iter_export_chunks(filtered_data, categories, chunk_size=5))
+                    preview_df = pd.DataFrame(preview_rows, columns=data_exporter.get_export_columns(categories))
+                    st.dataframe(preview_df, use_container_width=True)
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        # Export to CSV or Parquet
+                        export_format = st.radio("Export Format", ["CSV", "Parquet"], horizontal=True).lower()
+                        if st.button("Prepare Export"):
+                            with st.spinner("Exporting expenses..."):
+                                export = data_exporter.build_expenses_export(
+                                    filtered_data, export_format=export_format
+                                )
+                            mime, extension = data_exporter.EXPORT_FORMATS[export_format]
+                            st.download_button(
+                                f"Download {export_format.upper()}",
+                                data=export,
+                                file_name=f"{user}_expenses.{extension}",
+                                mime=mime
+                            )
+                    
+                    with col2:
+                        # Export summary stats
+                        st.write(f"Total Records: {len(filtered_data)}")
+                        st.write(f"Date Range: {start_date} to {end_date}")
+                        st.write(f"Total Amount: ₹{sum(entry['total'] for entry in filtered_data):.2f}")
+                else:
+                    st.info("No data available for the selected date range.")
+finally:
+    # Record the page render time
+    metrics.PAGE_RENDER_SECONDS.observe(time.perf_counter() - render_started, page=page)
+    
+    # Show where this rerun's time went
+    if profiling.DEBUG_PANEL:
+        profiling.render_panel(*profiling.finish_rerun())
@@ -0,0 +1,140 @@
+# Notification load benchmark: drives notify_new_expense, notify_status_change and
+# send_daily_summary against the local SMS gateway stand-in with thousands of recipients.
+#
+#   python benchmark_notifications.py --recipients 2000 --latency-ms 100 --error-rate 0.01
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def seed_recipients(db_manager, count):
+    """Create count users subscribed to every notification type"""
+    session = db_manager.Session()
+    try:
+        existing = {username for (username,) in session.query(db_manager.User.username)}
+        users = [db_manager.User(username=f"bench_user_{i}") for i in range(count) if f"bench_user_{i}" not in existing]
+        session.add_all(users)
+        session.flush()
+        
+        session.add_all([
+            db_manager.NotificationPreference(
+                user_id=user.id,
+                phone_number=f"+9190000{user.id:05d}",
+                notify_on_new_expense=1,
+                notify_on_status_change=1,
+                notify_daily_summary=1
+            )
+            for user in users
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SMS notification fan-out against a local gateway")
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="gateway messages per second (0 = unlimited)")
+    parser.add_argument("--gateway-url", help="use an already running gateway instead of starting one")
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite database")
+    args = parser.parse_args()
+    
+    import sms_gateway_stub
+    
+    server = None
+    if args.gateway_url:
+        base_url = args.gateway_url
+    else:
+        server, base_url = sms_gateway_stub.start_gateway(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            rate_limit=args.rate_limit
+        )
+    
+    # Configuration is read at import time, so set it before loading the app modules
+    os.environ["TWILIO_API_BASE_URL"] = base_url
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbenchmark")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "benchmark")
+    os.environ.setdefault("TWILIO_PHONE_NUMBER", "+15005550006")
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    
+    import db_manager
+    import notification_manager
+    
+    db_manager.init_db()
+    seed_recipients(db_manager, args.recipients)
+    
+    # Time every individual send
+    send_timings = []
+    send_sms = notification_manager.send_sms_notification
+    
+    def timed_send(to_phone_number, message):
+        started = time.perf_counter()
+        try:
+            return send_sms(to_phone_number, message)
+        finally:
+            send_timings.append(time.perf_counter() - started)
+    
+    notification_manager.send_sms_notification = timed_send
+    
+    # Keep per-message logging out of the report
+    devnull = open(os.devnull, "w")
+    expense = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "expenses": {"Groceries": 420.0, "Vegetables": 80.0},
+        "total": 500.0,
+        "status": "unpaid",
+        "notes": ""
+    }
+    
+    print(f"Gateway {base_url}, {args.recipients} recipients, "
+          f"{notification_manager.NOTIFICATION_MAX_WORKERS} workers, pool size {notification_manager.TWILIO_POOL_SIZE}")
+    
+    for run in range(args.runs):
+        scenarios = [
+            ("notify_new_expense", lambda: notification_manager.notify_new_expense("Padam", expense)),
+            ("notify_status_change", lambda: notification_manager.notify_status_change("Padam", expense, "paid")),
+            ("send_daily_summary", lambda: notification_manager.send_daily_summary())
+        ]
+        for name, func in scenarios:
+            stdout = sys.stdout
+            sys.stdout = devnull
+            try:
+                send_timings.clear()
+                started = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - started
+            finally:
+                sys.stdout = stdout
+            report(name, result, elapsed, send_timings)
+    
+    if server:
+        print(f"Gateway counters: {server.state.stats}")
+        server.shutdown()
+
+def report(name, result, elapsed, send_timings):
+    """Print throughput and per-send latency percentiles for one scenario"""
+    sends = result["sent"] + result["failed"]
+    latencies = [t * 1000 for t in send_timings]
+    print(f"{name:<22} {sends:>7} sends  {result['failed']:>6} failed  {elapsed:>8.2f}s  "
+          f"{sends / elapsed if elapsed else 0:>9.1f} msg/s  "
+          f"p50 {percentile(latencies, 50):>7.1f}ms  p99 {percentile(latencies, 99):>7.1f}ms")
+
+if __name__ == "__main__":
+    main()
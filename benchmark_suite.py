@@ -0,0 +1,203 @@
+# Benchmark suite: times the data layer, filters, charts and receipts against synthetic
+# households (synthetic_data.py) of increasing size, appends the results to a JSON lines
+# file and compares them with an earlier run to catch regressions.
+#
+#   python benchmark_suite.py --sizes 1000,100000,1000000 --baseline benchmark_results.jsonl
+#
+# Each size runs in its own process with a throwaway SQLite database and data directory,
+# so sizes don't share caches or memory.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Benchmark defaults
+DEFAULT_SIZES = "1000,100000"  # add 1000000 for the full run
+DEFAULT_OUTPUT = "benchmark_results.jsonl"
+DEFAULT_REPEAT = 5
+DEFAULT_MAX_SECONDS = 10.0  # per benchmark; slow benchmarks stop repeating after this
+DEFAULT_THRESHOLD = 1.25  # median this many times slower than the baseline is a regression
+
+BENCH_USERS = 4
+BENCH_YEARS = 3
+PDF_BATCH = 20
+
+def time_call(func, repeat=DEFAULT_REPEAT, max_seconds=DEFAULT_MAX_SECONDS):
+    """Run func up to repeat times (at least once, stopping after max_seconds); returns the timings in seconds"""
+    timings = []
+    budget_start = time.perf_counter()
+    while len(timings) < repeat:
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+        if time.perf_counter() - budget_start > max_seconds:
+            break
+    return timings
+
+def get_benchmarks(household):
+    """(name, function) pairs to time against a loaded household"""
+    import data_manager
+    import db_manager
+    import pdf_renderer
+    import receipt_generator
+    import utils
+    import visualization
+    
+    user, other = household["users"][0], household["users"][1]
+    expenses = household["expenses"][user]
+    today = datetime.now().date()
+    new_expense = {"date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "expenses": {"Gas": 950.0},
+                   "total": 950.0, "status": "unpaid", "notes": ""}
+    pdf_jobs = [(user, expense_data, receipt_generator.get_receipt_id(user, expense_data))
+                for expense_data in expenses[-PDF_BATCH:]]
+    
+    return [
+        ("utils.filter_expenses", lambda: utils.filter_expenses(
+            expenses, start_date=today - timedelta(days=90), end_date=today, categories=["Vegetables", "Gas"])),
+        ("utils.sort_expenses", lambda: utils.sort_expenses(expenses, "Amount (High to Low)")),
+        ("visualization.create_category_pie_chart", lambda: visualization.create_category_pie_chart(expenses)),
+        ("visualization.create_time_series_chart", lambda: visualization.create_time_series_chart(expenses)),
+        ("visualization.create_payment_status_chart", lambda: visualization.create_payment_status_chart(expenses)),
+        ("visualization.create_monthly_trends_chart", lambda: visualization.create_monthly_trends_chart(expenses)),
+        ("visualization.compute_household_monthly_trends",
+         lambda: visualization.compute_household_monthly_trends(household["expenses"])),
+        ("db_manager.get_user_expenses", lambda: db_manager.get_user_expenses(user)),
+        ("db_manager.get_user_summary", lambda: db_manager.get_user_summary(user)),
+        ("db_manager.get_messages", lambda: db_manager.get_messages(user, other)),
+        ("data_manager.load_data", data_manager.load_data),
+        ("data_manager.add_expense", lambda: data_manager.add_expense(user, dict(new_expense))),
+        ("data_manager.add_expenses x100", lambda: data_manager.add_expenses(user, [dict(new_expense) for _ in range(100)])),
+        ("receipt_generator.generate_receipts_html", lambda: receipt_generator.generate_receipts_html(user, expenses)),
+        (f"pdf_renderer.render_receipt_pdf_batch x{PDF_BATCH}", lambda: pdf_renderer.render_receipt_pdf_batch(pdf_jobs)),
+    ]
+
+def run_size(size, repeat, max_seconds, only=None):
+    """Generate and load a household of size expenses, then time every benchmark (runs in a child process)"""
+    import synthetic_data
+    
+    started = time.perf_counter()
+    household = synthetic_data.generate_household(BENCH_USERS, size, BENCH_YEARS, messages=max(100, size // 10), seed=size)
+    synthetic_data.load_into_json(household)
+    synthetic_data.load_into_database(household)
+    print(f"[{size}] household loaded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    
+    # Imported once here so the first chart benchmark doesn't pay for it
+    import plotly.express  # noqa: F401
+    
+    results = {}
+    for name, func in get_benchmarks(household):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        timings = [t * 1000 for t in time_call(func, repeat, max_seconds)]
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "runs": len(timings)
+        }
+        print(f"[{size}] {name:<52} {results[name]['median_ms']:>11.2f} ms  (min {results[name]['min_ms']:.2f}, "
+              f"{len(timings)} runs)", file=sys.stderr)
+    return results
+
+def run_size_in_subprocess(size, args):
+    """Run one size in a fresh process with its own database and data directory"""
+    # The database, receipt cache and data files are removed when the run finishes
+    with tempfile.TemporaryDirectory(prefix=f"bench_{size}_") as workdir:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": "sqlite:///" + os.path.join(workdir, "bench.db"),
+            "SHARED_CACHE_PATH": "",
+            "RECEIPT_CACHE_DIR": os.path.join(workdir, "receipts")
+        })
+        
+        command = [sys.executable, os.path.abspath(__file__), "--child-size", str(size),
+                   "--repeat", str(args.repeat), "--max-seconds", str(args.max_seconds)]
+        for pattern in args.only:
+            command += ["--only", pattern]
+        
+        completed = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmark run for {size} rows failed with exit code {completed.returncode}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def get_commit():
+    """Short hash of the checked out commit, if this is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_baseline(path):
+    """Last run recorded in a results file, or None"""
+    try:
+        with open(path, "r") as f:
+            lines = [line for line in f if line.strip()]
+    except FileNotFoundError:
+        return None
+    return json.loads(lines[-1]) if lines else None
+
+def compare(run, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print median timings against the baseline; returns the benchmarks that regressed"""
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} from {baseline['timestamp']}:")
+    for size, results in run["results"].items():
+        for name, result in results.items():
+            previous = baseline["results"].get(size, {}).get(name)
+            if not previous or not previous["median_ms"]:
+                continue
+            ratio = result["median_ms"] / previous["median_ms"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"  {size:>8} {name:<52} {previous['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms "
+                  f"({ratio:.2f}x){flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data layer, charts and receipts on synthetic data")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated expense counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS, help="Stop repeating a benchmark after this long")
+    parser.add_argument("--only", action="append", default=[], help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Append the results to this JSON lines file (empty to skip)")
+    parser.add_argument("--baseline", help="Compare with the last run in this results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--child-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child_size:
+        print(json.dumps(run_size(args.child_size, args.repeat, args.max_seconds, args.only)))
+        return 0
+    
+    # Read the baseline before appending this run, so --baseline can name the output file
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "results": {str(size): run_size_in_subprocess(size, args) for size in sizes}
+    }
+    
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"Results appended to {args.output}")
+    
+    if baseline:
+        regressions = compare(run, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks are more than {args.threshold:.2f}x slower than the baseline")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
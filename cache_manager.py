@@ -0,0 +1,188 @@
+from datetime import datetime
+
+import streamlit as st
+
+import cache_versions
+import data_manager
+import db_manager
+import metrics
+import notification_manager
+import scheduler
+import shared_cache
+import startup_timing
+import utils
+import visualization
+
+# Cached reads for the Streamlit app. Each loader takes the version of the data it
+# depends on as an argument, so a bumped version is a cache miss and everything
+# else is served from memory without touching the database or the data files.
+# Loaders wrapped in st.cache_resource return shared objects: treat them as read-only.
+#
+# Summaries, aggregates and figures are also kept in the shared cache (shared_cache.py),
+# so with several server processes only the first one to need a value computes it and
+# the others load it from disk on their first in-memory miss.
+
+@st.cache_resource(show_spinner=False)
+def bootstrap():
+    """One-time setup per server process"""
+    try:
+        # Initialize database
+        with startup_timing.phase("init_db"):
+            db_manager.init_db()
+        
+        # Initialize data file (legacy - will be removed in future)
+        data_manager.init_data()
+        
+        # Migrate data from JSON to database if needed
+        with startup_timing.phase("migrate_data_from_json"):
+            db_manager.migrate_data_from_json()
+        
+        # Deliver queued notifications and run scheduled jobs in the background
+        notification_manager.start_outbox_worker()
+        scheduler.start_scheduler()
+        
+        # Serve or write metrics if METRICS_PORT / METRICS_FILE is set
+        metrics.start_exporter()
+        
+        return True
+    finally:
+        # Log how long the cold start took and restore the import hook, even if setup failed
+        # (no-op timing if app.py did not start it)
+        startup_timing.report()
+
+@st.cache_resource(show_spinner=False)
+def read_asset(path):
+    """Read a static file (stylesheet, logo) once per process"""
+    with open(path, "r") as f:
+        return f.read()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_users(version):
+    metrics.CACHE_MISSES.inc(cache="users")
+    return db_manager.get_users()
+
+def get_users():
+    """All usernames"""
+    metrics.CACHE_REQUESTS.inc(cache="users")
+    return _load_users(cache_versions.get_version(cache_versions.USERS))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_categories(version):
+    metrics.CACHE_MISSES.inc(cache="categories")
+    return data_manager.get_categories()
+
+def get_categories():
+    """All expense categories"""
+    metrics.CACHE_REQUESTS.inc(cache="categories")
+    return _load_categories(cache_versions.get_version(cache_versions.CATEGORIES))
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _load_user_expenses(username, version):
+    metrics.CACHE_MISSES.inc(cache="user_expenses")
+    return data_manager.load_data().get(username, [])
+
+def get_user_expenses(username):
+    """A user's expenses (shared list, do not mutate)"""
+    metrics.CACHE_REQUESTS.inc(cache="user_expenses")
+    return _load_user_expenses(username, cache_versions.get_version(cache_versions.expenses_scope(username)))
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_filtered_expenses(username, version, start_date, end_date, categories, status, sort_option):
+    metrics.CACHE_MISSES.inc(cache="filtered_expenses")
+    filtered = utils.filter_expenses(
+        get_user_expenses(username),
+        start_date=start_date,
+        end_date=end_date,
+        categories=list(categories) if categories else None,
+        status=status
+    )
+    return utils.sort_expenses(filtered, sort_option)
+
+def get_filtered_expenses(username, start_date=None, end_date=None, categories=None, status=None,
+                          sort_option="Newest First"):
+    """A user's expenses filtered and sorted, so paging through them costs only the page (shared list)"""
+    metrics.CACHE_REQUESTS.inc(cache="filtered_expenses")
+    version = cache_versions.get_version(cache_versions.expenses_scope(username))
+    return _load_filtered_expenses(username, version, start_date, end_date,
+                                   tuple(categories or ()), status, sort_option)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _load_expense_summary(username, version):
+    metrics.CACHE_MISSES.inc(cache="expense_summary")
+    return shared_cache.get_or_compute(
+        shared_cache.make_key("expense_summary", username, version),
+        lambda: utils.summarize_expenses(get_user_expenses(username))
+    )
+
+def get_expense_summary(username):
+    """Total, unpaid and paid amounts and number of a user's expenses"""
+    metrics.CACHE_REQUESTS.inc(cache="expense_summary")
+    return _load_expense_summary(username, cache_versions.get_version(cache_versions.expenses_scope(username)))
+
+def _create_dashboard_charts(username, start_date, end_date, categories):
+    expenses = get_filtered_expenses(username, start_date, end_date, categories)
+    return {
+        "category": visualization.create_category_pie_chart(expenses),
+        "time_series": visualization.create_time_series_chart(expenses),
+        "status": visualization.create_payment_status_chart(expenses),
+        "monthly": visualization.create_monthly_trends_chart(expenses)
+    }
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_dashboard_charts(username, version, start_date, end_date, categories):
+    metrics.CACHE_MISSES.inc(cache="dashboard_charts")
+    return shared_cache.get_or_compute(
+        shared_cache.make_key("dashboard_charts", username, version, start_date, end_date, categories),
+        lambda: _create_dashboard_charts(username, start_date, end_date, categories)
+    )
+
+def get_dashboard_charts(username, start_date=None, end_date=None, categories=None):
+    """Dashboard figures for a user's filtered expenses, by chart name (shared figures, do not mutate)"""
+    metrics.CACHE_REQUESTS.inc(cache="dashboard_charts")
+    version = cache_versions.get_version(cache_versions.expenses_scope(username))
+    return _load_dashboard_charts(username, version, start_date, end_date, tuple(categories or ()))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_household_trends(version):
+    metrics.CACHE_MISSES.inc(cache="household_trends")
+    return shared_cache.get_or_compute(
+        shared_cache.make_key("household_trends", version),
+        lambda: visualization.compute_household_monthly_trends(data_manager.load_data())
+    )
+
+def get_household_trends():
+    """Monthly paid/unpaid/total per household member (shared DataFrame, do not mutate)"""
+    metrics.CACHE_REQUESTS.inc(cache="household_trends")
+    return _load_household_trends(cache_versions.get_version(cache_versions.EXPENSES))
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _load_unread_message_count(username, version):
+    metrics.CACHE_MISSES.inc(cache="unread_message_count")
+    return db_manager.get_unread_message_count(username)
+
+def get_unread_message_count(username):
+    """Number of unread messages for a user"""
+    metrics.CACHE_REQUESTS.inc(cache="unread_message_count")
+    return _load_unread_message_count(username, cache_versions.get_version(cache_versions.inbox_scope(username)))
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _load_notification_preferences(username, version):
+    metrics.CACHE_MISSES.inc(cache="notification_preferences")
+    return db_manager.get_user_notification_preferences(username)
+
+def get_notification_preferences(username):
+    """A user's notification preferences"""
+    metrics.CACHE_REQUESTS.inc(cache="notification_preferences")
+    return _load_notification_preferences(username, cache_versions.get_version(cache_versions.preferences_scope(username)))
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _load_budget_status(username, month, expenses_version, budgets_version):
+    metrics.CACHE_MISSES.inc(cache="budget_status")
+    return db_manager.get_budget_status(username, month)
+
+def get_budget_status(username):
+    """This month's spend against each of a user's budgets, from the maintained budget totals"""
+    metrics.CACHE_REQUESTS.inc(cache="budget_status")
+    return _load_budget_status(username, db_manager.get_month(datetime.now()),
+                               cache_versions.get_version(cache_versions.expenses_scope(username)),
+                               cache_versions.get_version(cache_versions.budgets_scope(username)))
@@ -0,0 +1,62 @@
+import threading
+
+import shared_cache
+
+# Data version counters. Every write path bumps the scopes it changes, and cached
+# reads take the current version as part of their cache key, so a write invalidates
+# exactly the cached reads that depend on it. With the shared cache enabled the
+# counters live in its SQLite file, so a write in any server process (or in the API
+# or importer) invalidates the caches of every process on the host.
+USERS = "users"
+CATEGORIES = "categories"
+EXPENSES = "expenses"  # any user's expenses
+
+# In-process counters, used when the shared cache is disabled or cannot be read
+_versions = {}
+_lock = threading.Lock()
+
+def expenses_scope(username):
+    """Scope for one user's expenses"""
+    return f"expenses:{username}"
+
+def conversation_scope(user1, user2):
+    """Scope for the messages between two users"""
+    return "messages:" + "|".join(sorted([user1, user2]))
+
+def inbox_scope(username):
+    """Scope for a user's unread message count"""
+    return f"inbox:{username}"
+
+def preferences_scope(username):
+    """Scope for a user's notification preferences"""
+    return f"preferences:{username}"
+
+def budgets_scope(username):
+    """Scope for a user's budget settings"""
+    return f"budgets:{username}"
+
+def get_version(scope):
+    """Get the current version of a scope"""
+    if not shared_cache.is_enabled():
+        return _versions.get(scope, 0)
+    
+    version = shared_cache.get_version(scope)
+    if version is not None:
+        return version
+    
+    # The shared counter could not be read: fall back to this process's counter, tagged so
+    # it can never equal a shared version and hit a cached read made for other data
+    return ("local", _versions.get(scope, 0))
+
+def bump_version(*scopes):
+    """Invalidate cached reads of the given scopes"""
+    with _lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+    
+    if shared_cache.is_enabled():
+        shared_cache.bump_versions(scopes)
+
+def bump_expenses(username):
+    """Invalidate everything derived from a user's expenses"""
+    bump_version(expenses_scope(username), EXPENSES)
@@ -0,0 +1,101 @@
+import csv
+import io
+import os
+from datetime import datetime
+
+import utils
+
+# Export configuration
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))  # rows converted at a time
+
+# Expenses are exported one chunk of rows at a time straight into the output file, so
+# memory stays bounded by the chunk size instead of holding the dataset in a DataFrame,
+# a CSV string and a base64 copy at once.
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Get the category columns for an export (in order of first appearance)
+def get_export_categories(expenses):
+    categories = {}
+    for entry in expenses:
+        for category in entry["expenses"]:
+            categories.setdefault(category, None)
+    return list(categories)
+
+# Get the column headers for an export
+def get_export_columns(categories):
+    return ["Date", "Total", "Status"] + categories + ["Notes"]
+
+# Convert one expense into an export row (None for categories it does not use)
+def get_export_row(entry, categories):
+    amounts = entry["expenses"]
+    return [entry["date"], entry["total"], entry["status"].capitalize()] + \
+        [amounts.get(category) for category in categories] + [entry.get("notes", "")]
+
+# Yield export rows for the expenses in chunks of chunk_size
+def iter_export_chunks(expenses, categories, chunk_size=EXPORT_CHUNK_SIZE):
+    chunk = []
+    for entry in expenses:
+        chunk.append(get_export_row(entry, categories))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_expenses_csv(expenses, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the expenses as CSV bytes, one chunk of rows at a time"""
+    expenses = utils.filter_expenses(expenses, start_date=start_date, end_date=end_date)
+    categories = get_export_categories(expenses)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(get_export_columns(categories))
+    
+    for chunk in iter_export_chunks(expenses, categories, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def write_expenses_parquet(out, expenses, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the expenses to out as Parquet, one row group per chunk"""
+    # pyarrow is only needed for Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    expenses = utils.filter_expenses(expenses, start_date=start_date, end_date=end_date)
+    categories = get_export_categories(expenses)
+    
+    # Status repeats a handful of values, so it is dictionary-encoded
+    schema = pa.schema(
+        [("Date", pa.timestamp("s")), ("Total", pa.float64()), ("Status", pa.dictionary(pa.int8(), pa.string()))] +
+        [(category, pa.float64()) for category in categories] +
+        [("Notes", pa.string())]
+    )
+    
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for chunk in iter_export_chunks(expenses, categories, chunk_size):
+            columns = list(zip(*chunk))
+            columns[0] = [datetime.strptime(value, "%Y-%m-%d %H:%M:%S") for value in columns[0]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+
+def build_expenses_export(expenses, start_date=None, end_date=None, export_format="csv"):
+    """Build an export of the expenses as bytes"""
+    export = io.BytesIO()
+    if export_format == "parquet":
+        write_expenses_parquet(export, expenses, start_date, end_date)
+    else:
+        for chunk in stream_expenses_csv(expenses, start_date, end_date):
+            export.write(chunk)
+    return export.getvalue()
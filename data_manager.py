@@ -1,10 +1,21 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
 
+# File locking is POSIX flock, or msvcrt's byte-range locks on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+import cache_versions
+
 # Define constants
 DATA_FILE = "expenses_data.json"
 CATEGORIES_FILE = "categories.json"
+DATA_LOCK_FILE = DATA_FILE + ".lock"
 
 # Default categories
 DEFAULT_CATEGORIES = [
@@ -30,10 +41,48 @@ def load_data():
     with open(DATA_FILE, "r") as f:
         return json.load(f)
 
-# Save data to file
+# Save data to file; written to a temporary file and renamed into place, so readers
+# never see a partly written file
 def save_data(data):
-    with open(DATA_FILE, "w") as f:
+    temp_file = f"{DATA_FILE}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
         json.dump(data, f, indent=4)
+    os.replace(temp_file, DATA_FILE)
+
+# Block until this process holds the lock file
+def _lock_file(lock_file):
+    if fcntl:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    
+    # Lock the first byte; LK_LOCK gives up after about 10 seconds, so keep trying
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+# Release the lock file
+def _unlock_file(lock_file):
+    if fcntl:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# Hold an exclusive lock on the data file for a read-modify-write cycle. The lock is taken
+# on a sidecar file, so it also serializes writers in other processes (the Streamlit app
+# and the API both write the data file)
+@contextmanager
+def data_file_lock():
+    with open(DATA_LOCK_FILE, "a+") as lock_file:
+        _lock_file(lock_file)
+        try:
+            yield
+        finally:
+            _unlock_file(lock_file)
 
 # Get list of users
 def get_users():
@@ -42,25 +91,38 @@ def get_users():
 
 # Add a new user
 def add_user(username):
-    data = load_data()
-    if username in data:
-        return False
-    
-    data[username] = []
-    save_data(data)
-    return True
+    with data_file_lock():
+        data = load_data()
+        if username in data:
+            return False
+        
+        data[username] = []
+        save_data(data)
+        cache_versions.bump_version(cache_versions.USERS)
+        return True
 
 # Add expense for a user
 def add_expense(user, expense_entry):
-    data = load_data()
-    
-    # Create user if doesn't exist
-    if user not in data:
-        data[user] = []
-    
-    data[user].append(expense_entry)
-    save_data(data)
-    return True
+    with data_file_lock():
+        data = load_data()
+        
+        # Create user if doesn't exist
+        if user not in data:
+            data[user] = []
+        
+        data[user].append(expense_entry)
+        save_data(data)
+        cache_versions.bump_expenses(user)
+        return True
+
+# Add many expenses for a user with a single write of the data file
+def add_expenses(user, expense_entries):
+    with data_file_lock():
+        data = load_data()
+        data.setdefault(user, []).extend(expense_entries)
+        save_data(data)
+        cache_versions.bump_expenses(user)
+        return True
 
 # Get categories
 def get_categories():
@@ -83,24 +145,27 @@ def add_category(category):
     with open(CATEGORIES_FILE, "w") as f:
         json.dump(categories, f, indent=4)
     
+    cache_versions.bump_version(cache_versions.CATEGORIES)
     return True
 
 # Update expense status
 def update_expense_status(user, expense_entry, new_status):
-    data = load_data()
-    
-    if user not in data:
+    with data_file_lock():
+        data = load_data()
+        
+        if user not in data:
+            return False
+        
+        # Find the expense by matching date and total
+        for entry in data[user]:
+            if (entry["date"] == expense_entry["date"] and 
+                entry["total"] == expense_entry["total"]):
+                entry["status"] = new_status
+                save_data(data)
+                cache_versions.bump_expenses(user)
+                return True
+        
         return False
-    
-    # Find the expense by matching date and total
-    for entry in data[user]:
-        if (entry["date"] == expense_entry["date"] and 
-            entry["total"] == expense_entry["total"]):
-            entry["status"] = new_status
-            save_data(data)
-            return True
-    
-    return False
 
 # Get expense summary for a user
 def get_user_summary(user):
@@ -1,15 +1,68 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, desc
+import threading
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, Index, UniqueConstraint, and_, case, desc, distinct, extract, func, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.orm import aliased, sessionmaker, relationship
+from collections import Counter
+from datetime import datetime, timedelta
 import json
 
+import cache_versions
+import dedupe
+
 # Initialize SQLAlchemy
 DATABASE_URL = os.environ.get('DATABASE_URL')
-engine = create_engine(DATABASE_URL)
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+
+# Connection pool shared by every thread of the process (Streamlit sessions, API requests,
+# background workers); SQLite keeps SQLAlchemy's default pool
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+# The engine (and with it the database driver) is created on first use rather than
+# at import time, so pages and processes that never query skip the cost
+_engine = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker()
+
+def get_engine():
+    """Get the process-wide engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                options = {"pool_pre_ping": True}
+                if DATABASE_URL and not DATABASE_URL.startswith("sqlite"):
+                    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE)
+                engine = create_engine(DATABASE_URL, **options)
+                _session_factory.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def set_engine(engine):
+    """Use the given engine instead of creating one from DATABASE_URL (e.g. one with an instrumented pool)"""
+    global _engine
+    with _engine_lock:
+        _session_factory.configure(bind=engine)
+        _engine = engine
+
+def Session():
+    """Open a database session"""
+    get_engine()
+    return _session_factory()
+
+# Daily summaries go out at this time unless a user picks another one
+DEFAULT_DAILY_SUMMARY_TIME = "20:00"
+
+# Budget alerts are sent to the budget's owner the first time this month's spend reaches
+# each of these percentages of the budget
+BUDGET_ALERT_THRESHOLDS = tuple(sorted(
+    int(percent) for percent in os.environ.get("BUDGET_ALERT_THRESHOLDS", "80,100").split(",") if percent.strip()
+))
+ALL_CATEGORIES = 0  # category_id of budgets and spend totals covering every category
 
 # Define models
 class User(Base):
@@ -119,15 +172,159 @@ class Message(Base):
     sender = relationship("User", foreign_keys=[sender_id])
     receiver = relationship("User", foreign_keys=[receiver_id])
     
+    # Serves the "id > last seen id" chat polls (see get_messages_since)
+    __table_args__ = (
+        Index('ix_messages_conversation', 'sender_id', 'receiver_id', 'id'),
+    )
+    
     def __repr__(self):
         return f"<Message(sender_id={self.sender_id}, receiver_id={self.receiver_id})>"
 
+class NotificationOutbox(Base):
+    __tablename__ = 'notification_outbox'
+    
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(200), unique=True, nullable=False)
+    event_type = Column(String(50), nullable=False)
+    recipient_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    phone_number = Column(String(20), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON encoded event details
+    status = Column(String(20), default='pending')  # pending, sending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.now)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    recipient = relationship("User")
+    
+    __table_args__ = (
+        Index('ix_notification_outbox_due', 'status', 'next_attempt_at'),
+        Index('ix_notification_outbox_phone_sent', 'phone_number', 'sent_at'),
+    )
+    
+    def __repr__(self):
+        return f"<NotificationOutbox(event_type='{self.event_type}', recipient_id={self.recipient_id}, status='{self.status}')>"
+
+class ExpenseStatusChange(Base):
+    __tablename__ = 'expense_status_changes'
+    
+    id = Column(Integer, primary_key=True)
+    expense_id = Column(Integer, ForeignKey('expenses.id', ondelete='CASCADE'), nullable=False)
+    sequence = Column(Integer, nullable=False)  # 1 for the expense's first status change, 2 for the next...
+    old_status = Column(String(20), nullable=False)
+    new_status = Column(String(20), nullable=False)
+    changed_at = Column(DateTime, default=datetime.now)
+    
+    # The sequence names a transition, so its notifications get one idempotency key and two
+    # writers racing to record the same transition conflict instead of both notifying
+    __table_args__ = (
+        UniqueConstraint('expense_id', 'sequence', name='uq_expense_status_changes_sequence'),
+    )
+    
+    def __repr__(self):
+        return f"<ExpenseStatusChange(expense_id={self.expense_id}, sequence={self.sequence}, new_status='{self.new_status}')>"
+
+class DailySummarySchedule(Base):
+    __tablename__ = 'daily_summary_schedules'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), unique=True)
+    send_time = Column(String(5), default=DEFAULT_DAILY_SUMMARY_TIME)  # HH:MM, server local time
+    last_sent_on = Column(Date, nullable=True)
+    
+    # Relationships
+    user = relationship("User")
+    
+    def __repr__(self):
+        return f"<DailySummarySchedule(user_id={self.user_id}, send_time='{self.send_time}')>"
+
+class SchedulerLock(Base):
+    __tablename__ = 'scheduler_locks'
+    
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(200), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<SchedulerLock(name='{self.name}', holder='{self.holder}')>"
+
+class ExpenseFingerprint(Base):
+    __tablename__ = 'expense_fingerprints'
+    
+    id = Column(Integer, primary_key=True)
+    expense_id = Column(Integer, ForeignKey('expenses.id', ondelete='CASCADE'), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    fingerprint = Column(String(40), nullable=False)  # see dedupe.get_fingerprint
+    amount_cents = Column(Integer, nullable=False)
+    minute = Column(Integer, nullable=False)  # minutes since the epoch of the expense date
+    
+    __table_args__ = (
+        Index('ix_expense_fingerprints_fingerprint', 'fingerprint'),
+        Index('ix_expense_fingerprints_near', 'user_id', 'amount_cents', 'minute'),
+    )
+    
+    def __repr__(self):
+        return f"<ExpenseFingerprint(expense_id={self.expense_id}, fingerprint='{self.fingerprint}')>"
+
+class Budget(Base):
+    __tablename__ = 'budgets'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    category_id = Column(Integer, nullable=False, default=ALL_CATEGORIES)  # a category id, or ALL_CATEGORIES
+    amount = Column(Float, nullable=False)  # monthly limit
+    alert = Column(Integer, default=1)  # SMS the owner at BUDGET_ALERT_THRESHOLDS
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'category_id', name='uq_budgets_user_category'),
+    )
+    
+    def __repr__(self):
+        return f"<Budget(user_id={self.user_id}, category_id={self.category_id}, amount={self.amount})>"
+
+class BudgetSpend(Base):
+    __tablename__ = 'budget_spend'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    month = Column(Integer, nullable=False)  # YYYYMM of the expense date
+    category_id = Column(Integer, nullable=False)  # a category id, or ALL_CATEGORIES
+    spent = Column(Float, nullable=False, default=0)
+    paid = Column(Float, nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    alerted_percent = Column(Integer, nullable=False, default=0)  # highest threshold alerted this month
+    
+    # Running totals kept up to date by every expense write (see _apply_budget_spend),
+    # so reading a month's spend never scans the expenses
+    __table_args__ = (
+        UniqueConstraint('user_id', 'month', 'category_id', name='uq_budget_spend_user_month_category'),
+    )
+    
+    def __repr__(self):
+        return f"<BudgetSpend(user_id={self.user_id}, month={self.month}, category_id={self.category_id}, spent={self.spent})>"
+
 # Database operations
 def init_db():
     """Initialize the database if not already set up"""
     # Create tables
+    engine = get_engine()
     Base.metadata.create_all(engine)
     
+    # create_all only adds indexes along with new tables, so add ones introduced later
+    # to tables that already exist
+    for index in [*Message.__table__.indexes, *NotificationOutbox.__table__.indexes]:
+        index.create(engine, checkfirst=True)
+    
+    # Index expenses recorded before duplicate detection existed
+    backfill_expense_fingerprints()
+    
+    # Total up expenses recorded before budgets existed
+    backfill_budget_spend()
+    
     # Add default users if they don't exist
     add_user("Padam")
     add_user("Sandip")
@@ -168,6 +365,7 @@ def add_user(username):
         new_user = User(username=username)
         session.add(new_user)
         session.commit()
+        cache_versions.bump_version(cache_versions.USERS)
         return True
     except Exception as e:
         session.rollback()
@@ -214,6 +412,7 @@ def add_category(category_name):
         new_category = Category(name=category_name)
         session.add(new_category)
         session.commit()
+        cache_versions.bump_version(cache_versions.CATEGORIES)
         return True
     except Exception as e:
         session.rollback()
@@ -230,8 +429,8 @@ def get_category_by_name(name):
     finally:
         session.close()
 
-def add_expense(username, expense_data):
-    """Add an expense for a user"""
+def add_expense(username, expense_data, notify=False):
+    """Add an expense for a user, optionally queueing notifications in the same transaction"""
     session = Session()
     try:
         # Get user or create if doesn't exist
@@ -254,6 +453,7 @@ def add_expense(username, expense_data):
         
         # Add expense details
         expenses_dict = expense_data.get("expenses", {})
+        category_amounts = {}
         for category_name, amount in expenses_dict.items():
             # Get category or create if doesn't exist
             category = session.query(Category).filter(Category.name == category_name).first()
@@ -269,8 +469,38 @@ def add_expense(username, expense_data):
                 amount=amount
             )
             session.add(expense_detail)
+            category_amounts[category.id] = amount
+        
+        session.add(ExpenseFingerprint(
+            expense_id=expense.id,
+            user_id=user.id,
+            fingerprint=dedupe.get_fingerprint(username, expense.date, expense.total, expenses_dict),
+            amount_cents=dedupe.get_amount_cents(expense.total),
+            minute=dedupe.get_minute(expense.date)
+        ))
+        
+        deltas = {}
+        _add_expense_spend(deltas, expense.date, expense.total, category_amounts, paid=expense.status == "paid")
+        spend = _apply_budget_spend(session, user.id, deltas)
+        _update_budget_alerts(session, user, spend, notify)
+        
+        if notify:
+            _enqueue_notifications(
+                session,
+                "new_expense",
+                user,
+                NotificationPreference.notify_on_new_expense,
+                f"new_expense:{expense.id}",
+                {
+                    "user": username,
+                    "total": expense.total,
+                    "categories": list(expenses_dict.keys()),
+                    "timestamp": datetime.now().strftime("%d-%b %H:%M")
+                }
+            )
         
         session.commit()
+        cache_versions.bump_expenses(username)
         return True
     except Exception as e:
         session.rollback()
@@ -287,13 +517,31 @@ def get_user_expenses(username):
         if not user:
             return []
         
-        expenses = session.query(Expense).filter(Expense.user_id == user.id).order_by(desc(Expense.date)).all()
-        return [expense.to_dict() for expense in expenses]
+        # Load every detail of the user's expenses in one query instead of one per expense
+        details = {}
+        rows = (session.query(ExpenseDetail.expense_id, Category.name, ExpenseDetail.amount)
+                .join(Category)
+                .join(Expense)
+                .filter(Expense.user_id == user.id)
+                .order_by(ExpenseDetail.id))
+        for expense_id, category_name, amount in rows:
+            details.setdefault(expense_id, {})[category_name] = amount
+        
+        expenses = (session.query(Expense.id, Expense.date, Expense.total, Expense.status, Expense.notes)
+                    .filter(Expense.user_id == user.id)
+                    .order_by(desc(Expense.date)))
+        return [{
+            "date": expense.date.strftime("%Y-%m-%d %H:%M:%S"),
+            "total": expense.total,
+            "status": expense.status,
+            "expenses": details.get(expense.id, {}),
+            "notes": expense.notes or ""
+        } for expense in expenses]
     finally:
         session.close()
 
-def update_expense_status(username, expense_entry, new_status):
-    """Update the payment status of an expense"""
+def update_expense_status(username, expense_entry, new_status, notify=False):
+    """Update the payment status of an expense, optionally queueing notifications in the same transaction"""
     session = Session()
     try:
         user = session.query(User).filter(User.username == username).first()
@@ -312,9 +560,10 @@ def update_expense_status(username, expense_entry, new_status):
                    
         if not expense:
             return False
-            
-        expense.status = new_status
+        
+        _set_expense_status(session, user, expense, new_status, notify)
         session.commit()
+        cache_versions.bump_expenses(username)
         return True
     except Exception as e:
         session.rollback()
@@ -323,6 +572,630 @@ def update_expense_status(username, expense_entry, new_status):
     finally:
         session.close()
 
+def _set_expense_status(session, user, expense, new_status, notify):
+    """Change an expense's status, queueing notifications in the caller's transaction if asked"""
+    old_status = expense.status
+    if old_status == new_status:
+        return  # already applied (double click, retried request): nothing to record or announce
+    expense.status = new_status
+    
+    sequence = (session.query(func.coalesce(func.max(ExpenseStatusChange.sequence), 0))
+                .filter(ExpenseStatusChange.expense_id == expense.id)
+                .scalar()) + 1
+    session.add(ExpenseStatusChange(expense_id=expense.id, sequence=sequence, old_status=old_status, new_status=new_status))
+    
+    # Move the amounts between unpaid and paid in the budget totals
+    if (old_status == "paid") != (new_status == "paid"):
+        category_amounts = dict(session.query(ExpenseDetail.category_id, ExpenseDetail.amount)
+                                .filter(ExpenseDetail.expense_id == expense.id)
+                                .all())
+        deltas = {}
+        _add_expense_spend(deltas, expense.date, expense.total, category_amounts,
+                           spent=0, paid=1 if new_status == "paid" else -1)
+        _apply_budget_spend(session, user.id, deltas)
+    
+    if notify:
+        changed_at = datetime.now()
+        _enqueue_notifications(
+            session,
+            "status_change",
+            user,
+            NotificationPreference.notify_on_status_change,
+            f"status_change:{expense.id}:{sequence}:{old_status}:{new_status}",
+            {
+                "user": user.username,
+                "total": expense.total,
+                "status": new_status,
+                "timestamp": changed_at.strftime("%d-%b %H:%M")
+            }
+        )
+
+def update_expense_status_by_id(username, expense_id, new_status, notify=False):
+    """Update the payment status of one of a user's expenses by id; returns the updated expense or None"""
+    session = Session()
+    try:
+        expense = (session.query(Expense)
+                   .join(User)
+                   .filter(User.username == username)
+                   .filter(Expense.id == expense_id)
+                   .first())
+        
+        if not expense:
+            return None
+        
+        _set_expense_status(session, expense.user, expense, new_status, notify)
+        session.commit()
+        cache_versions.bump_expenses(username)
+        return _expenses_to_dicts(session, [expense])[0]
+    except Exception as e:
+        session.rollback()
+        print(f"Error updating expense status: {e}")
+        return None
+    finally:
+        session.close()
+
+def bulk_add_expenses(username, expenses, notify=False):
+    """Add many expenses for a user in a single transaction; returns their ids in order (None on failure)"""
+    if not expenses:
+        return []
+    
+    session = Session()
+    try:
+        # Get user or create if doesn't exist
+        user = session.query(User).filter(User.username == username).first()
+        if not user:
+            user = User(username=username)
+            session.add(user)
+            session.flush()
+        
+        # Look up every category once, creating the missing ones
+        category_names = sorted({name for expense_data in expenses for name in expense_data.get("expenses", {})})
+        category_ids = dict(session.query(Category.name, Category.id).filter(Category.name.in_(category_names)).all())
+        missing = [name for name in category_names if name not in category_ids]
+        if missing:
+            session.execute(insert(Category), [{"name": name} for name in missing])
+            category_ids.update(session.query(Category.name, Category.id).filter(Category.name.in_(missing)).all())
+        
+        # Insert expenses and their details with one multi-row statement each
+        now = datetime.now()
+        expense_rows = [{
+            "user_id": user.id,
+            "date": datetime.fromisoformat(expense_data["date"]) if expense_data.get("date") else now,
+            "total": expense_data.get("total", sum(expense_data.get("expenses", {}).values())),
+            "status": expense_data.get("status", "unpaid"),
+            "notes": expense_data.get("notes", ""),
+            "created_at": now
+        } for expense_data in expenses]
+        connection = session.connection()
+        expense_ids = connection.execute(
+            insert(Expense.__table__).returning(Expense.id, sort_by_parameter_order=True),
+            expense_rows
+        ).scalars().all()
+        
+        detail_rows = [{
+            "expense_id": expense_id,
+            "category_id": category_ids[category_name],
+            "amount": amount
+        } for expense_id, expense_data in zip(expense_ids, expenses)
+          for category_name, amount in expense_data.get("expenses", {}).items()]
+        if detail_rows:
+            connection.execute(insert(ExpenseDetail.__table__), detail_rows)
+        
+        connection.execute(insert(ExpenseFingerprint.__table__), [{
+            "expense_id": expense_id,
+            "user_id": user.id,
+            "fingerprint": dedupe.get_fingerprint(username, row["date"], row["total"], expense_data.get("expenses", {})),
+            "amount_cents": dedupe.get_amount_cents(row["total"]),
+            "minute": dedupe.get_minute(row["date"])
+        } for expense_id, row, expense_data in zip(expense_ids, expense_rows, expenses)])
+        
+        # One upsert per month and category touched, however many expenses there are
+        deltas = {}
+        for row, expense_data in zip(expense_rows, expenses):
+            _add_expense_spend(deltas, row["date"], row["total"], {
+                category_ids[category_name]: amount for category_name, amount in expense_data.get("expenses", {}).items()
+            }, paid=row["status"] == "paid")
+        spend = _apply_budget_spend(session, user.id, deltas)
+        _update_budget_alerts(session, user, spend, notify)
+        
+        if notify:
+            # One lookup of the subscribers for the whole batch; delivery coalesces the rows into digests
+            recipients = _get_notification_recipients(session, user.id, NotificationPreference.notify_on_new_expense)
+            timestamp = now.strftime("%d-%b %H:%M")
+            outbox_rows = [{
+                "idempotency_key": f"new_expense:{expense_id}:{recipient_id}",
+                "event_type": "new_expense",
+                "recipient_id": recipient_id,
+                "phone_number": phone_number,
+                "payload": json.dumps({
+                    "user": username,
+                    "total": row["total"],
+                    "categories": list(expense_data.get("expenses", {}).keys()),
+                    "timestamp": timestamp
+                })
+            } for expense_id, row, expense_data in zip(expense_ids, expense_rows, expenses)
+              for recipient_id, phone_number in recipients]
+            if outbox_rows:
+                connection.execute(insert(NotificationOutbox.__table__), outbox_rows)
+        
+        session.commit()
+        cache_versions.bump_expenses(username)
+        return list(expense_ids)
+    except Exception as e:
+        session.rollback()
+        print(f"Error adding expenses: {e}")
+        return None
+    finally:
+        session.close()
+
+# Budgets
+def get_month(date):
+    """Month key (YYYYMM) of a date, as used by the budget totals"""
+    return date.year * 100 + date.month
+
+def get_reached_threshold(spent, amount):
+    """Highest of BUDGET_ALERT_THRESHOLDS that spent has reached for a budget of amount (0 if none)"""
+    if amount <= 0:
+        return 0
+    return max([percent for percent in BUDGET_ALERT_THRESHOLDS if spent >= amount * percent / 100], default=0)
+
+def _add_expense_spend(deltas, date, total, category_amounts, spent=1, paid=0):
+    """Add an expense's total and per-category amounts to (month, category id) -> [spent, paid, entries] deltas,
+    scaled by spent and paid (1, 0 or -1)"""
+    month = get_month(date)
+    for category_id, amount in [(ALL_CATEGORIES, total)] + list(category_amounts.items()):
+        delta = deltas.setdefault((month, category_id), [0.0, 0.0, 0])
+        delta[0] += spent * amount
+        delta[1] += paid * amount
+        delta[2] += spent
+
+def _apply_budget_spend(session, user_id, deltas):
+    """Add deltas to a user's budget totals in the caller's transaction with a single upsert;
+    returns (month, category id) -> (spent, alerted percent) after the update"""
+    if not deltas:
+        return {}
+    
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    table = BudgetSpend.__table__
+    
+    # Sorted so concurrent writers lock the rows in the same order; chunked to stay under
+    # SQLite's bound parameter limit
+    items = sorted(deltas.items())
+    spend = {}
+    for start in range(0, len(items), 1000):
+        statement = dialect.insert(table).values([{
+            "user_id": user_id,
+            "month": month,
+            "category_id": category_id,
+            "spent": spent,
+            "paid": paid,
+            "entry_count": entries,
+            "alerted_percent": 0
+        } for (month, category_id), (spent, paid, entries) in items[start:start + 1000]])
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.month, table.c.category_id],
+            set_={
+                "spent": table.c.spent + statement.excluded.spent,
+                "paid": table.c.paid + statement.excluded.paid,
+                "entry_count": table.c.entry_count + statement.excluded.entry_count
+            }
+        ).returning(table.c.month, table.c.category_id, table.c.spent, table.c.alerted_percent)
+        spend.update({(month, category_id): (spent, alerted)
+                      for month, category_id, spent, alerted in session.execute(statement)})
+    return spend
+
+def _update_budget_alerts(session, user, spend, notify):
+    """Record the thresholds this month's budgets reached; with notify, queue a budget_alert for each new one"""
+    month = get_month(datetime.now())
+    current = {category_id: values for (spend_month, category_id), values in spend.items() if spend_month == month}
+    if not current:
+        return 0
+    
+    queued = 0
+    budgets = (session.query(Budget)
+               .filter(Budget.user_id == user.id)
+               .filter(Budget.category_id.in_(current))
+               .all())
+    for budget in budgets:
+        spent, alerted = current[budget.category_id]
+        reached = get_reached_threshold(spent, budget.amount)
+        if reached <= alerted:
+            continue
+        
+        # Recorded on every write, even when no SMS goes out (imports, alerts turned off, no phone
+        # number), so a later write doesn't alert about a threshold passed long ago
+        session.execute(update(BudgetSpend)
+                        .where(BudgetSpend.user_id == user.id)
+                        .where(BudgetSpend.month == month)
+                        .where(BudgetSpend.category_id == budget.category_id)
+                        .values(alerted_percent=reached))
+        if not notify or not budget.alert:
+            continue
+        
+        phone_number = (session.query(NotificationPreference.phone_number)
+                        .filter(NotificationPreference.user_id == user.id)
+                        .scalar())
+        if not phone_number:
+            continue
+        
+        category_name = None
+        if budget.category_id != ALL_CATEGORIES:
+            category_name = session.query(Category.name).filter(Category.id == budget.category_id).scalar()
+        
+        session.add(NotificationOutbox(
+            idempotency_key=f"budget_alert:{user.id}:{budget.category_id}:{month}:{reached}",
+            event_type="budget_alert",
+            recipient_id=user.id,
+            phone_number=phone_number,
+            payload=json.dumps({
+                "user": user.username,
+                "category": category_name,
+                "month": datetime.now().strftime("%b %Y"),
+                "spent": spent,
+                "budget": budget.amount,
+                "percent": reached,
+                "timestamp": datetime.now().strftime("%d-%b %H:%M")
+            })
+        ))
+        queued += 1
+    
+    return queued
+
+def set_budget(username, amount, category=None, alert=True):
+    """Set a user's monthly budget for a category (None for all categories); an amount of 0 removes it"""
+    session = Session()
+    try:
+        user = session.query(User).filter(User.username == username).first()
+        if not user:
+            return False
+        
+        # Get category or create if doesn't exist (categories added in the app may only be in the JSON file)
+        category_id = ALL_CATEGORIES
+        if category:
+            category_row = session.query(Category).filter(Category.name == category).first()
+            if not category_row:
+                category_row = Category(name=category)
+                session.add(category_row)
+                session.flush()
+            category_id = category_row.id
+        
+        budget = (session.query(Budget)
+                  .filter(Budget.user_id == user.id)
+                  .filter(Budget.category_id == category_id)
+                  .first())
+        
+        if amount <= 0:
+            if budget:
+                session.delete(budget)
+        else:
+            if not budget:
+                budget = Budget(user_id=user.id, category_id=category_id)
+                session.add(budget)
+            budget.amount = amount
+            budget.alert = 1 if alert else 0
+            
+            # Thresholds this month's spend already reached under the new amount are shown, not sent
+            spend = (session.query(BudgetSpend)
+                     .filter(BudgetSpend.user_id == user.id)
+                     .filter(BudgetSpend.month == get_month(datetime.now()))
+                     .filter(BudgetSpend.category_id == category_id)
+                     .first())
+            if spend:
+                spend.alerted_percent = get_reached_threshold(spend.spent, amount)
+        
+        session.commit()
+        cache_versions.bump_version(cache_versions.budgets_scope(username))
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error setting budget: {e}")
+        return False
+    finally:
+        session.close()
+
+def get_budget_status(username, month=None):
+    """Spend against each of a user's budgets in a month (YYYYMM, default this month), read from the budget totals"""
+    month = month or get_month(datetime.now())
+    session = Session()
+    try:
+        rows = (session.query(Category.name, Budget.amount, Budget.alert,
+                              BudgetSpend.spent, BudgetSpend.paid, BudgetSpend.entry_count)
+                .join(User, User.id == Budget.user_id)
+                .outerjoin(Category, Category.id == Budget.category_id)
+                .outerjoin(BudgetSpend, and_(BudgetSpend.user_id == Budget.user_id,
+                                             BudgetSpend.category_id == Budget.category_id,
+                                             BudgetSpend.month == month))
+                .filter(User.username == username)
+                .all())
+        
+        budgets = [{
+            "category": category_name,  # None for the budget covering all categories
+            "budget": amount,
+            "spent": spent or 0.0,
+            "paid": paid or 0.0,
+            "entry_count": entry_count or 0,
+            "percent": round((spent or 0.0) / amount * 100, 1) if amount else 0.0,
+            "remaining": amount - (spent or 0.0),
+            "alert": bool(alert)
+        } for category_name, amount, alert, spent, paid, entry_count in rows]
+        
+        # Overall budget first, then by category
+        return sorted(budgets, key=lambda budget: (budget["category"] is not None, budget["category"] or ""))
+    finally:
+        session.close()
+
+def backfill_budget_spend():
+    """Build the budget totals from the recorded expenses when they are empty; returns how many rows were added"""
+    session = Session()
+    try:
+        if session.query(BudgetSpend.id).first() is not None or session.query(Expense.id).first() is None:
+            return 0
+        
+        month = (extract("year", Expense.date) * 100 + extract("month", Expense.date)).label("month")
+        rows = [{
+            "user_id": user_id,
+            "month": int(expense_month),
+            "category_id": ALL_CATEGORIES,
+            "spent": spent,
+            "paid": paid,
+            "entry_count": entries,
+            "alerted_percent": 0
+        } for user_id, expense_month, spent, paid, entries in (
+            session.query(Expense.user_id, month, func.sum(Expense.total),
+                          func.sum(case((Expense.status == "paid", Expense.total), else_=0)),
+                          func.count(Expense.id))
+            .filter(Expense.date.isnot(None))
+            .group_by(Expense.user_id, month)
+        )]
+        rows += [{
+            "user_id": user_id,
+            "month": int(expense_month),
+            "category_id": category_id,
+            "spent": spent,
+            "paid": paid,
+            "entry_count": entries,
+            "alerted_percent": 0
+        } for user_id, expense_month, category_id, spent, paid, entries in (
+            session.query(Expense.user_id, month, ExpenseDetail.category_id, func.sum(ExpenseDetail.amount),
+                          func.sum(case((Expense.status == "paid", ExpenseDetail.amount), else_=0)),
+                          func.count(ExpenseDetail.id))
+            .join(ExpenseDetail, ExpenseDetail.expense_id == Expense.id)
+            .filter(Expense.date.isnot(None))
+            .group_by(Expense.user_id, month, ExpenseDetail.category_id)
+        )]
+        
+        if rows:
+            session.execute(insert(BudgetSpend.__table__), rows)
+            session.commit()
+            print(f"Built budget totals for {len(rows)} months and categories of existing expenses")
+        return len(rows)
+    except Exception as e:
+        session.rollback()
+        print(f"Error building budget totals: {e}")
+        return 0
+    finally:
+        session.close()
+
+# Duplicate detection
+def filter_new_expenses(username, expenses, added=None):
+    """Split expenses into (new, duplicates), where duplicates exactly match already recorded expenses.
+    
+    Repeats are counted: if an expense is recorded twice, the first two identical entries in
+    the batch are duplicates and any further ones are new. For imports done in several batches,
+    pass the same Counter as added to every call: the new expenses' fingerprints are added to it
+    and not counted as recorded in later batches."""
+    if not expenses:
+        return [], []
+    
+    fingerprints = [dedupe.fingerprint_expense(username, expense_data)["fingerprint"] for expense_data in expenses]
+    unique = list(set(fingerprints))
+    
+    session = Session()
+    try:
+        recorded = Counter()
+        for start in range(0, len(unique), 500):
+            recorded.update(dict(session.query(ExpenseFingerprint.fingerprint, func.count(ExpenseFingerprint.id))
+                                 .filter(ExpenseFingerprint.fingerprint.in_(unique[start:start + 500]))
+                                 .group_by(ExpenseFingerprint.fingerprint)
+                                 .all()))
+    finally:
+        session.close()
+    
+    if added:
+        recorded.subtract(added)
+    
+    new, duplicates = [], []
+    for expense_data, fingerprint in zip(expenses, fingerprints):
+        if recorded[fingerprint] > 0:
+            recorded[fingerprint] -= 1
+            duplicates.append(expense_data)
+        else:
+            new.append(expense_data)
+            if added is not None:
+                added[fingerprint] += 1
+    return new, duplicates
+
+def find_duplicate_expenses(username, expense_data, window_minutes=dedupe.DEDUPE_WINDOW_MINUTES):
+    """Recorded expenses that duplicate an entry: exact matches and same-amount ones within the window"""
+    columns = dedupe.fingerprint_expense(username, expense_data)
+    session = Session()
+    try:
+        matches = (session.query(Expense.id, Expense.date, Expense.total, ExpenseFingerprint.fingerprint)
+                   .join(ExpenseFingerprint, ExpenseFingerprint.expense_id == Expense.id)
+                   .join(User, User.id == ExpenseFingerprint.user_id)
+                   .filter(User.username == username)
+                   .filter(ExpenseFingerprint.amount_cents == columns["amount_cents"])
+                   .filter(ExpenseFingerprint.minute.between(columns["minute"] - window_minutes,
+                                                            columns["minute"] + window_minutes))
+                   .order_by(Expense.id)
+                   .all())
+        
+        # An exact duplicate can only have the same amount and minute, so it is always in the window
+        return {
+            "exact": [match.id for match in matches if match.fingerprint == columns["fingerprint"]],
+            "near": [{
+                "id": match.id,
+                "date": match.date.strftime("%Y-%m-%d %H:%M:%S"),
+                "total": match.total
+            } for match in matches]
+        }
+    finally:
+        session.close()
+
+def get_duplicate_report(username=None, window_minutes=dedupe.DEDUPE_WINDOW_MINUTES, limit=100):
+    """Groups of exact duplicate expenses and pairs of same-amount expenses within the window"""
+    session = Session()
+    try:
+        # Exact duplicates: fingerprints recorded more than once
+        groups = (session.query(ExpenseFingerprint.fingerprint)
+                  .join(User, User.id == ExpenseFingerprint.user_id))
+        if username:
+            groups = groups.filter(User.username == username)
+        duplicate_fingerprints = [row.fingerprint for row in (groups.group_by(ExpenseFingerprint.fingerprint)
+                                                              .having(func.count(ExpenseFingerprint.id) > 1)
+                                                              .order_by(func.min(ExpenseFingerprint.expense_id))
+                                                              .limit(limit)
+                                                              .all())]
+        
+        exact = {}
+        if duplicate_fingerprints:
+            rows = (session.query(ExpenseFingerprint.fingerprint, Expense.id, Expense.date, Expense.total, User.username)
+                    .join(Expense, Expense.id == ExpenseFingerprint.expense_id)
+                    .join(User, User.id == ExpenseFingerprint.user_id)
+                    .filter(ExpenseFingerprint.fingerprint.in_(duplicate_fingerprints))
+                    .order_by(Expense.id)
+                    .all())
+            for row in rows:
+                group = exact.setdefault(row.fingerprint, {
+                    "user": row.username,
+                    "date": row.date.strftime("%Y-%m-%d %H:%M:%S"),
+                    "total": row.total,
+                    "expense_ids": []
+                })
+                group["expense_ids"].append(row.id)
+        
+        # Near duplicates: same user and amount, recorded within the window of each other,
+        # different fingerprint (exact duplicates are already listed above)
+        first = aliased(ExpenseFingerprint)
+        second = aliased(ExpenseFingerprint)
+        first_expense = aliased(Expense)
+        second_expense = aliased(Expense)
+        pairs = (session.query(User.username, first_expense.id, first_expense.date, first_expense.total,
+                               second_expense.id, second_expense.date)
+                 .select_from(first)
+                 .join(second, (second.user_id == first.user_id) &
+                               (second.amount_cents == first.amount_cents) &
+                               (second.minute.between(first.minute - window_minutes, first.minute + window_minutes)) &
+                               (second.expense_id > first.expense_id) &
+                               (second.fingerprint != first.fingerprint))
+                 .join(first_expense, first_expense.id == first.expense_id)
+                 .join(second_expense, second_expense.id == second.expense_id)
+                 .join(User, User.id == first.user_id))
+        if username:
+            pairs = pairs.filter(User.username == username)
+        
+        near = [{
+            "user": row[0],
+            "expense_id": row[1],
+            "date": row[2].strftime("%Y-%m-%d %H:%M:%S"),
+            "total": row[3],
+            "other_expense_id": row[4],
+            "other_date": row[5].strftime("%Y-%m-%d %H:%M:%S")
+        } for row in pairs.order_by(first_expense.id).limit(limit).all()]
+        
+        return {"exact": list(exact.values()), "near": near, "window_minutes": window_minutes}
+    finally:
+        session.close()
+
+def backfill_expense_fingerprints(batch_size=5000):
+    """Add fingerprints for expenses that do not have one yet; returns how many were added"""
+    added = 0
+    session = Session()
+    try:
+        while True:
+            expenses = (session.query(Expense.id, Expense.user_id, Expense.date, Expense.total, User.username)
+                        .join(User, User.id == Expense.user_id)
+                        .outerjoin(ExpenseFingerprint, ExpenseFingerprint.expense_id == Expense.id)
+                        .filter(ExpenseFingerprint.id.is_(None))
+                        .order_by(Expense.id)
+                        .limit(batch_size)
+                        .all())
+            if not expenses:
+                break
+            
+            breakdowns = {}
+            for expense_id, category_name, amount in (session.query(ExpenseDetail.expense_id, Category.name, ExpenseDetail.amount)
+                                                      .join(Category)
+                                                      .filter(ExpenseDetail.expense_id.in_([expense.id for expense in expenses]))
+                                                      .all()):
+                breakdowns.setdefault(expense_id, {})[category_name] = amount
+            
+            session.execute(insert(ExpenseFingerprint.__table__), [{
+                "expense_id": expense.id,
+                "user_id": expense.user_id,
+                "fingerprint": dedupe.get_fingerprint(expense.username, expense.date, expense.total,
+                                                      breakdowns.get(expense.id, {})),
+                "amount_cents": dedupe.get_amount_cents(expense.total),
+                "minute": dedupe.get_minute(expense.date)
+            } for expense in expenses])
+            session.commit()
+            added += len(expenses)
+        
+        if added:
+            print(f"Indexed {added} existing expenses for duplicate detection")
+        return added
+    except Exception as e:
+        session.rollback()
+        print(f"Error indexing expenses for duplicate detection: {e}")
+        return added
+    finally:
+        session.close()
+
+def _expenses_to_dicts(session, expenses):
+    """Convert expenses to dicts (with their ids), loading all of their details in one query"""
+    details = {}
+    if expenses:
+        rows = (session.query(ExpenseDetail.expense_id, Category.name, ExpenseDetail.amount)
+                .join(Category)
+                .filter(ExpenseDetail.expense_id.in_([expense.id for expense in expenses]))
+                .order_by(ExpenseDetail.id)
+                .all())
+        for expense_id, category_name, amount in rows:
+            details.setdefault(expense_id, {})[category_name] = amount
+    
+    return [{
+        "id": expense.id,
+        "date": expense.date.strftime("%Y-%m-%d %H:%M:%S"),
+        "total": expense.total,
+        "status": expense.status,
+        "expenses": details.get(expense.id, {}),
+        "notes": expense.notes or ""
+    } for expense in expenses]
+
+def get_expenses_page(username, cursor=None, limit=100, status=None, start_date=None, end_date=None):
+    """Get one page of a user's expenses, newest first, and the cursor for the next page (None at the end)"""
+    session = Session()
+    try:
+        query = (session.query(Expense)
+                 .join(User)
+                 .filter(User.username == username))
+        
+        # Keyset pagination: the cursor is the id of the last expense on the previous page
+        if cursor is not None:
+            query = query.filter(Expense.id < cursor)
+        if status:
+            query = query.filter(Expense.status == status)
+        if start_date:
+            query = query.filter(Expense.date >= datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            query = query.filter(Expense.date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        
+        expenses = query.order_by(desc(Expense.id)).limit(limit + 1).all()
+        next_cursor = expenses[limit - 1].id if len(expenses) > limit else None
+        return _expenses_to_dicts(session, expenses[:limit]), next_cursor
+    finally:
+        session.close()
+
 def get_user_summary(username):
     """Get expense summary for a user"""
     session = Session()
@@ -367,11 +1240,14 @@ def get_user_notification_preferences(username):
             session.add(prefs)
             session.commit()
             
+        schedule = session.query(DailySummarySchedule).filter(DailySummarySchedule.user_id == user.id).first()
+            
         return {
             "phone_number": prefs.phone_number,
             "notify_on_new_expense": bool(prefs.notify_on_new_expense),
             "notify_on_status_change": bool(prefs.notify_on_status_change),
-            "notify_daily_summary": bool(prefs.notify_daily_summary)
+            "notify_daily_summary": bool(prefs.notify_daily_summary),
+            "daily_summary_time": schedule.send_time if schedule else DEFAULT_DAILY_SUMMARY_TIME
         }
     except Exception as e:
         session.rollback()
@@ -381,7 +1257,8 @@ def get_user_notification_preferences(username):
         session.close()
 
 def set_user_notification_preferences(username, phone_number=None, notify_on_new_expense=False, 
-                                      notify_on_status_change=False, notify_daily_summary=False):
+                                      notify_on_status_change=False, notify_daily_summary=False,
+                                      daily_summary_time=None):
     """Set notification preferences for a user"""
     session = Session()
     try:
@@ -407,8 +1284,16 @@ def set_user_notification_preferences(username, phone_number=None, notify_on_new
             prefs.notify_on_status_change = 1 if notify_on_status_change else 0
             prefs.notify_daily_summary = 1 if notify_daily_summary else 0
             prefs.updated_at = datetime.now()
+        
+        if daily_summary_time:
+            schedule = session.query(DailySummarySchedule).filter(DailySummarySchedule.user_id == user.id).first()
+            if not schedule:
+                schedule = DailySummarySchedule(user_id=user.id)
+                session.add(schedule)
+            schedule.send_time = daily_summary_time
             
         session.commit()
+        cache_versions.bump_version(cache_versions.preferences_scope(username))
         return True
     except Exception as e:
         session.rollback()
@@ -451,6 +1336,338 @@ def get_users_to_notify_for_status_change(expense_username):
     finally:
         session.close()
 
+# Notification outbox functions
+def _get_notification_recipients(session, actor_id, preference_column):
+    """(user id, phone number) of every user other than the actor subscribed to an event"""
+    return (session.query(User.id, NotificationPreference.phone_number)
+            .join(NotificationPreference)
+            .filter(User.id != actor_id)
+            .filter(preference_column == 1)
+            .filter(NotificationPreference.phone_number.isnot(None))
+            .all())
+
+def _enqueue_notifications(session, event_type, actor, preference_column, event_key, payload):
+    """Queue one outbox row per subscribed user (other than the actor) in the caller's transaction"""
+    recipients = _get_notification_recipients(session, actor.id, preference_column)
+    
+    payload_json = json.dumps(payload)
+    for recipient_id, phone_number in recipients:
+        session.add(NotificationOutbox(
+            idempotency_key=f"{event_key}:{recipient_id}",
+            event_type=event_type,
+            recipient_id=recipient_id,
+            phone_number=phone_number,
+            payload=payload_json
+        ))
+    
+    return len(recipients)
+
+def claim_outbox_batch(limit=50, lease_seconds=60, coalesce_event_types=(), coalesce_seconds=0):
+    """Claim due outbox rows for delivery, leasing them so other workers skip them
+    
+    Rows of a coalesced event type only become due once they are coalesce_seconds old;
+    when one does, every other pending row of those types for the same recipient is
+    claimed with it so they can be merged into a single message.
+    """
+    session = Session()
+    try:
+        now = datetime.now()
+        
+        # Rows stuck in 'sending' past their lease belong to a worker that died
+        query = (session.query(NotificationOutbox)
+                 .filter(NotificationOutbox.status.in_(["pending", "sending"]))
+                 .filter(NotificationOutbox.next_attempt_at <= now))
+        
+        if coalesce_event_types and coalesce_seconds > 0:
+            window_start = now - timedelta(seconds=coalesce_seconds)
+            query = query.filter(or_(
+                NotificationOutbox.event_type.notin_(coalesce_event_types),
+                NotificationOutbox.created_at <= window_start
+            ))
+        
+        rows = (query
+                .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all())
+        
+        # Pull in the rest of each recipient's open window; rows waiting out a retry backoff or
+        # a rate limit stay put until they are due themselves
+        coalesced_recipients = {row.recipient_id for row in rows if row.event_type in coalesce_event_types}
+        if coalesced_recipients:
+            rows += (session.query(NotificationOutbox)
+                     .filter(NotificationOutbox.status == "pending")
+                     .filter(NotificationOutbox.next_attempt_at <= now)
+                     .filter(NotificationOutbox.event_type.in_(coalesce_event_types))
+                     .filter(NotificationOutbox.recipient_id.in_(coalesced_recipients))
+                     .filter(NotificationOutbox.id.notin_([row.id for row in rows]))
+                     .order_by(NotificationOutbox.id)
+                     .with_for_update(skip_locked=True)
+                     .all())
+        
+        lease_until = now + timedelta(seconds=lease_seconds)
+        claimed = []
+        for row in rows:
+            row.status = "sending"
+            row.next_attempt_at = lease_until
+            claimed.append({
+                "id": row.id,
+                "idempotency_key": row.idempotency_key,
+                "event_type": row.event_type,
+                "recipient_id": row.recipient_id,
+                "phone_number": row.phone_number,
+                "payload": json.loads(row.payload),
+                "attempts": row.attempts,
+                "created_at": row.created_at
+            })
+        
+        session.commit()
+        return claimed
+    except Exception as e:
+        session.rollback()
+        print(f"Error claiming outbox batch: {e}")
+        return []
+    finally:
+        session.close()
+
+def reserve_outbox_sends(messages, limit, window_seconds):
+    """Reserve sends against the per-recipient rate limit, shared by every worker process
+    
+    messages is a list of (phone number, outbox row ids merged into one SMS). Returns a
+    (sent_at, retry_at) pair per message: sent_at when it may be sent now (its rows are
+    stamped with it), otherwise retry_at, when the recipient has room again. Each message
+    gets its own sent_at, so messages in the window are counted as distinct sent_at values.
+    """
+    if not messages:
+        return []
+    
+    phone_numbers = sorted({phone_number for phone_number, _ in messages})
+    session = Session()
+    try:
+        now = datetime.now()
+        
+        # Lock the in-flight rows of these recipients (the whole database on SQLite), so
+        # workers sending to the same number count and reserve one after the other
+        session.execute(update(NotificationOutbox)
+                        .where(NotificationOutbox.phone_number.in_(phone_numbers))
+                        .where(NotificationOutbox.status == "sending")
+                        .values(status="sending"),
+                        execution_options={"synchronize_session": False})
+        
+        sent = {}
+        if limit > 0:
+            window_start = now - timedelta(seconds=window_seconds)
+            rows = (session.query(NotificationOutbox.phone_number,
+                                  func.count(distinct(NotificationOutbox.sent_at)),
+                                  func.min(NotificationOutbox.sent_at))
+                    .filter(NotificationOutbox.phone_number.in_(phone_numbers))
+                    .filter(NotificationOutbox.sent_at >= window_start)
+                    .group_by(NotificationOutbox.phone_number)
+                    .all())
+            sent = {phone_number: (count, oldest) for phone_number, count, oldest in rows}
+        
+        reservations = []
+        updates = []
+        for index, (phone_number, row_ids) in enumerate(messages):
+            count, oldest = sent.get(phone_number, (0, None))
+            if limit > 0 and count >= limit:
+                reservations.append((None, oldest + timedelta(seconds=window_seconds)))
+                continue
+            
+            sent_at = now + timedelta(microseconds=index)
+            sent[phone_number] = (count + 1, oldest or sent_at)
+            updates.extend({"id": row_id, "sent_at": sent_at} for row_id in row_ids)
+            reservations.append((sent_at, None))
+        
+        if updates:
+            session.execute(update(NotificationOutbox), updates)
+        session.commit()
+        return reservations
+    except Exception as e:
+        session.rollback()
+        print(f"Error reserving outbox sends: {e}")
+        return None
+    finally:
+        session.close()
+
+def update_outbox_entries(updates):
+    """Apply delivery outcomes to outbox rows (list of dicts keyed by 'id')"""
+    if not updates:
+        return True
+    
+    session = Session()
+    try:
+        session.execute(update(NotificationOutbox), updates)
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error updating outbox entries: {e}")
+        return False
+    finally:
+        session.close()
+
+def get_outbox_counts():
+    """Get the number of outbox rows in each status"""
+    session = Session()
+    try:
+        rows = (session.query(NotificationOutbox.status, func.count(NotificationOutbox.id))
+                .group_by(NotificationOutbox.status)
+                .all())
+        return {status: count for status, count in rows}
+    finally:
+        session.close()
+
+# Daily summary functions
+def _daily_summary_query(session):
+    """Summaries for every user with daily summaries enabled, aggregated in a single grouped query"""
+    totals = (session.query(
+                  Expense.user_id.label("user_id"),
+                  func.sum(Expense.total).label("total_spent"),
+                  func.sum(case((Expense.status == "unpaid", Expense.total), else_=0)).label("unpaid"),
+                  func.count(Expense.id).label("entry_count"))
+              .group_by(Expense.user_id)
+              .subquery())
+    
+    return (session.query(
+                User.id,
+                User.username,
+                NotificationPreference.phone_number,
+                func.coalesce(DailySummarySchedule.send_time, DEFAULT_DAILY_SUMMARY_TIME),
+                DailySummarySchedule.id,
+                func.coalesce(totals.c.total_spent, 0),
+                func.coalesce(totals.c.unpaid, 0),
+                func.coalesce(totals.c.entry_count, 0))
+            .join(NotificationPreference, NotificationPreference.user_id == User.id)
+            .outerjoin(DailySummarySchedule, DailySummarySchedule.user_id == User.id)
+            .outerjoin(totals, totals.c.user_id == User.id)
+            .filter(NotificationPreference.notify_daily_summary == 1)
+            .filter(NotificationPreference.phone_number.isnot(None)))
+
+def _summary_row_to_dict(row):
+    user_id, username, phone_number, send_time, schedule_id, total_spent, unpaid, entry_count = row
+    return {
+        "user_id": user_id,
+        "username": username,
+        "phone_number": phone_number,
+        "send_time": send_time,
+        "schedule_id": schedule_id,
+        "total_spent": total_spent,
+        "unpaid": unpaid,
+        "paid": total_spent - unpaid,
+        "entry_count": entry_count
+    }
+
+def get_daily_summaries(username=None):
+    """Get expense summaries for all users subscribed to daily summaries (or just one of them)"""
+    session = Session()
+    try:
+        query = _daily_summary_query(session)
+        if username:
+            query = query.filter(User.username == username)
+        return [_summary_row_to_dict(row) for row in query.all()]
+    finally:
+        session.close()
+
+def enqueue_due_daily_summaries(now=None):
+    """Queue today's summary for every user whose send time has passed, in constant round-trips"""
+    now = now or datetime.now()
+    today = now.date()
+    session = Session()
+    try:
+        due = (_daily_summary_query(session)
+               .filter(func.coalesce(DailySummarySchedule.send_time, DEFAULT_DAILY_SUMMARY_TIME) <= now.strftime("%H:%M"))
+               .filter(or_(DailySummarySchedule.last_sent_on.is_(None), DailySummarySchedule.last_sent_on < today))
+               .all())
+        summaries = [_summary_row_to_dict(row) for row in due]
+        if not summaries:
+            return 0
+        
+        session.execute(insert(NotificationOutbox), [{
+            "idempotency_key": f"daily_summary:{today.isoformat()}:{summary['user_id']}",
+            "event_type": "daily_summary",
+            "recipient_id": summary["user_id"],
+            "phone_number": summary["phone_number"],
+            "payload": json.dumps({
+                "user": summary["username"],
+                "date": today.strftime("%d %b, %Y"),
+                "total_spent": summary["total_spent"],
+                "unpaid": summary["unpaid"],
+                "paid": summary["paid"],
+                "entry_count": summary["entry_count"]
+            }),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        } for summary in summaries])
+        
+        # Mark the users as done for today
+        existing = [{"id": summary["schedule_id"], "last_sent_on": today}
+                    for summary in summaries if summary["schedule_id"] is not None]
+        missing = [{"user_id": summary["user_id"], "send_time": DEFAULT_DAILY_SUMMARY_TIME, "last_sent_on": today}
+                   for summary in summaries if summary["schedule_id"] is None]
+        if existing:
+            session.execute(update(DailySummarySchedule), existing)
+        if missing:
+            session.execute(insert(DailySummarySchedule), missing)
+        
+        session.commit()
+        return len(summaries)
+    except Exception as e:
+        session.rollback()
+        print(f"Error queueing daily summaries: {e}")
+        return 0
+    finally:
+        session.close()
+
+# Scheduler lock functions
+def acquire_lock(name, holder, ttl_seconds):
+    """Take or renew a named lease so only one process in the deployment runs a job"""
+    session = Session()
+    try:
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        
+        result = session.execute(
+            update(SchedulerLock)
+            .where(SchedulerLock.name == name)
+            .where(or_(SchedulerLock.holder == holder, SchedulerLock.expires_at < now))
+            .values(holder=holder, expires_at=expires_at)
+        )
+        
+        if result.rowcount == 0:
+            if session.get(SchedulerLock, name) is not None:
+                # Someone else holds a live lease
+                session.rollback()
+                return False
+            session.add(SchedulerLock(name=name, holder=holder, expires_at=expires_at))
+        
+        session.commit()
+        return True
+    except IntegrityError:
+        # Another process created the lock first
+        session.rollback()
+        return False
+    except Exception as e:
+        session.rollback()
+        print(f"Error acquiring lock {name}: {e}")
+        return False
+    finally:
+        session.close()
+
+def release_lock(name, holder):
+    """Give up a named lease if this holder owns it"""
+    session = Session()
+    try:
+        session.query(SchedulerLock).filter(SchedulerLock.name == name, SchedulerLock.holder == holder).delete()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"Error releasing lock {name}: {e}")
+    finally:
+        session.close()
+
 # Messaging functions
 def send_message(sender_username, receiver_username, content):
     """Send a message from one user to another"""
@@ -474,6 +1691,10 @@ def send_message(sender_username, receiver_username, content):
         
         session.add(message)
         session.commit()
+        cache_versions.bump_version(
+            cache_versions.conversation_scope(sender_username, receiver_username),
+            cache_versions.inbox_scope(receiver_username)
+        )
         return True
     except Exception as e:
         session.rollback()
@@ -482,6 +1703,41 @@ def send_message(sender_username, receiver_username, content):
     finally:
         session.close()
 
+def bulk_add_messages(messages):
+    """Add many (sender, receiver, content, created_at) messages in one transaction; returns the count added"""
+    if not messages:
+        return 0
+    
+    session = Session()
+    try:
+        usernames = {name for sender, receiver, _, _ in messages for name in (sender, receiver)}
+        user_ids = dict(session.query(User.username, User.id).filter(User.username.in_(usernames)).all())
+        
+        rows = [{
+            "sender_id": user_ids[sender],
+            "receiver_id": user_ids[receiver],
+            "content": content,
+            "created_at": created_at,
+            "is_read": 0
+        } for sender, receiver, content, created_at in messages
+          if sender in user_ids and receiver in user_ids]
+        if rows:
+            session.connection().execute(insert(Message.__table__), rows)
+        session.commit()
+        
+        conversations = {(sender, receiver) for sender, receiver, _, _ in messages}
+        cache_versions.bump_version(
+            *{cache_versions.conversation_scope(sender, receiver) for sender, receiver in conversations},
+            *{cache_versions.inbox_scope(receiver) for _, receiver in conversations}
+        )
+        return len(rows)
+    except Exception as e:
+        session.rollback()
+        print(f"Error adding messages: {e}")
+        return None
+    finally:
+        session.close()
+
 def get_messages(user1_username, user2_username, limit=50):
     """Get messages between two users, ordered by time (newest last)"""
     session = Session()
@@ -504,11 +1760,15 @@ def get_messages(user1_username, user2_username, limit=50):
                    .all())
                    
         # Mark messages as read if user1 is the receiver
+        marked_read = False
         for msg in messages:
             if msg.receiver_id == user1.id and msg.is_read == 0:
                 msg.is_read = 1
+                marked_read = True
         
         session.commit()
+        if marked_read:
+            cache_versions.bump_version(cache_versions.inbox_scope(user1_username))
         
         # Convert to dicts for JSON serialization
         return [{
@@ -525,6 +1785,56 @@ def get_messages(user1_username, user2_username, limit=50):
     finally:
         session.close()
 
+def get_messages_since(user1_username, user2_username, after_id=None, limit=200, mark_read=True):
+    """Get messages between two users newer than after_id (or the latest ones if None), oldest first"""
+    session = Session()
+    try:
+        # Get user IDs
+        user_ids = dict(session.query(User.username, User.id)
+                        .filter(User.username.in_([user1_username, user2_username]))
+                        .all())
+        user1_id = user_ids.get(user1_username)
+        user2_id = user_ids.get(user2_username)
+        
+        if user1_id is None or user2_id is None:
+            return []
+        
+        # Messages in both directions, walking the conversation index by id
+        query = (session.query(Message.id, Message.sender_id, Message.receiver_id,
+                               Message.content, Message.created_at, Message.is_read)
+                 .filter(
+                     ((Message.sender_id == user1_id) & (Message.receiver_id == user2_id)) |
+                     ((Message.sender_id == user2_id) & (Message.receiver_id == user1_id))
+                 ))
+        
+        if after_id is None:
+            # First load: the most recent messages
+            messages = list(reversed(query.order_by(desc(Message.id)).limit(limit).all()))
+        else:
+            messages = query.filter(Message.id > after_id).order_by(Message.id).limit(limit).all()
+        
+        # Mark messages as read if user1 is the receiver
+        unread_ids = {msg.id for msg in messages if mark_read and msg.receiver_id == user1_id and msg.is_read == 0}
+        if unread_ids:
+            session.execute(update(Message).where(Message.id.in_(unread_ids)).values(is_read=1))
+            session.commit()
+            cache_versions.bump_version(cache_versions.inbox_scope(user1_username))
+        
+        return [{
+            "id": msg.id,
+            "sender": user1_username if msg.sender_id == user1_id else user2_username,
+            "receiver": user1_username if msg.receiver_id == user1_id else user2_username,
+            "content": msg.content,
+            "timestamp": msg.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "is_read": bool(msg.is_read) or msg.id in unread_ids
+        } for msg in messages]
+    except Exception as e:
+        session.rollback()
+        print(f"Error getting messages: {e}")
+        return []
+    finally:
+        session.close()
+
 def get_unread_message_count(username):
     """Get count of unread messages for a user"""
     session = Session()
@@ -573,16 +1883,20 @@ def migrate_data_from_json():
                 data = json.load(f)
                 
             total_expenses = 0
+            already_migrated = 0
             
             for username, expenses in data.items():
                 # Add user
                 add_user(username)
                 
-                # Add expenses
-                for expense in expenses:
-                    add_expense(username, expense)
-                    total_expenses += 1
+                # Add the expenses not in the database yet, so running the migration again is a no-op
+                new_expenses, duplicates = filter_new_expenses(username, expenses)
+                if new_expenses and bulk_add_expenses(username, new_expenses) is None:
+                    continue
+                total_expenses += len(new_expenses)
+                already_migrated += len(duplicates)
                     
-            print(f"Migrated data for {len(data)} users with {total_expenses} expenses from JSON to database")
+            print(f"Migrated data for {len(data)} users with {total_expenses} expenses from JSON to database "
+                  f"({already_migrated} already migrated)")
         except Exception as e:
             print(f"Error migrating expenses data: {e}")
\ No newline at end of file
@@ -0,0 +1,71 @@
+import argparse
+import hashlib
+import os
+from datetime import datetime
+
+# Duplicate detection configuration: expenses of the same user and amount recorded
+# within this many minutes of each other are reported as possible duplicates
+DEDUPE_WINDOW_MINUTES = int(os.environ.get("DEDUPE_WINDOW_MINUTES", "10"))
+
+# Every expense in the database has a row in expense_fingerprints (see db_manager) with
+# - fingerprint: hash of its normalized user, date, total and category breakdown, so an
+#   exact duplicate is one index lookup however long the history is
+# - amount_cents and minute: indexed with the user id, so "same amount within N minutes"
+#   is a range scan over the few rows with that user and amount
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _normalize_name(name):
+    return " ".join(name.split()).casefold()
+
+def get_fingerprint(username, expense_date, total, breakdown):
+    """Hash of an expense's normalized user, date, total and category breakdown"""
+    # Dates are stored to the second; isoformat matches "%Y-%m-%d %H:%M:%S" and is much cheaper than strftime
+    parts = [_normalize_name(username), expense_date.replace(microsecond=0).isoformat(" "), f"{total:.2f}"]
+    parts.extend(sorted(f"{_normalize_name(name)}={amount:.2f}" for name, amount in breakdown.items()))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+def get_amount_cents(total):
+    """Amount in the smallest currency unit, for exact comparisons"""
+    return int(round(total * 100))
+
+def get_minute(expense_date):
+    """Minutes since the epoch, for the near-duplicate window"""
+    return int((expense_date - _EPOCH).total_seconds() // 60)
+
+def fingerprint_expense(username, expense_data):
+    """Fingerprint columns for an expense entry in the app's format"""
+    expense_date = datetime.fromisoformat(expense_data["date"])
+    breakdown = expense_data.get("expenses", {})
+    total = expense_data.get("total", sum(breakdown.values()))
+    return {
+        "fingerprint": get_fingerprint(username, expense_date, total, breakdown),
+        "amount_cents": get_amount_cents(total),
+        "minute": get_minute(expense_date)
+    }
+
+def format_report(report):
+    """Format a duplicate report (see db_manager.get_duplicate_report) for the terminal"""
+    lines = [f"Exact duplicates: {len(report['exact'])} groups"]
+    for group in report["exact"]:
+        lines.append(f"  {group['user']:<12} {group['date']}  ₹{group['total']:.2f}  x{len(group['expense_ids'])}  "
+                     f"ids {', '.join(map(str, group['expense_ids']))}")
+    
+    lines.append(f"Possible duplicates (same amount within {report['window_minutes']} minutes): {len(report['near'])} pairs")
+    for pair in report["near"]:
+        lines.append(f"  {pair['user']:<12} ₹{pair['total']:.2f}  #{pair['expense_id']} {pair['date']}  "
+                     f"#{pair['other_expense_id']} {pair['other_date']}")
+    return "\n".join(lines)
+
+# Print a duplicate report for one or all users
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report duplicate expenses")
+    parser.add_argument("--user", help="Only report this user's expenses")
+    parser.add_argument("--window", type=int, default=DEDUPE_WINDOW_MINUTES, help="Near-duplicate window in minutes")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum groups/pairs listed per section")
+    args = parser.parse_args()
+    
+    import db_manager
+    
+    db_manager.init_db()
+    print(format_report(db_manager.get_duplicate_report(args.user, args.window, args.limit)))
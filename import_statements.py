@@ -0,0 +1,192 @@
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import data_manager
+import db_manager
+
+# Bulk importer for CSV bank statements. Each chunk of rows is parsed with vectorized
+# pandas operations (dates, amounts, category rules) and written with one
+# db_manager.bulk_add_expenses transaction; the JSON data file is updated once at the end.
+#
+#   python import_statements.py statement.csv --user Padam --date-col "Txn Date" \
+#       --amount-col Amount --description-col Narration --rule "swiggy|zomato=Extras"
+
+DEFAULT_CHUNK_SIZE = 20000
+DEFAULT_CATEGORY = "Miscellaneous"
+
+# Parse the date column of a chunk (NaT where it cannot be parsed)
+def parse_dates(values, date_format=None, dayfirst=False):
+    if date_format:
+        return pd.to_datetime(values, format=date_format, errors="coerce")
+    # pandas infers the format from the first date and parses the column in one pass
+    return pd.to_datetime(values, dayfirst=dayfirst, errors="coerce")
+
+# Normalize amount strings like "1,234.50", "₹ 99", "(45.00)", "-12" or "300 Dr" to signed floats
+def normalize_amounts(values):
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    
+    text = values.astype(str).str.strip()
+    negative = (text.str.startswith("-") |
+                (text.str.startswith("(") & text.str.endswith(")")) |
+                text.str.upper().str.endswith("DR"))
+    amounts = pd.to_numeric(text.str.replace(r"[^0-9.]", "", regex=True), errors="coerce")
+    return amounts.where(~negative, -amounts)
+
+# Map descriptions to categories: the first matching rule wins (rules are (regex, category) pairs)
+def categorize(descriptions, rules, default=DEFAULT_CATEGORY):
+    if not rules:
+        return np.full(len(descriptions), default, dtype=object)
+    
+    text = descriptions.fillna("").astype(str)
+    conditions = [text.str.contains(pattern, flags=re.IGNORECASE, regex=True).to_numpy() for pattern, _ in rules]
+    return np.select(conditions, [category for _, category in rules], default=default)
+
+# Load category rules from a JSON file ({"regex": "Category", ...}) and/or PATTERN=CATEGORY strings
+def load_rules(rules_file=None, rule_args=()):
+    rules = []
+    if rules_file:
+        with open(rules_file, "r") as f:
+            rules.extend(json.load(f).items())
+    for rule in rule_args:
+        pattern, _, category = rule.rpartition("=")
+        if not pattern or not category:
+            raise ValueError(f"Invalid rule (expected PATTERN=CATEGORY): {rule}")
+        rules.append((pattern, category))
+    
+    # Fail early on bad patterns rather than halfway through a file
+    for pattern, _ in rules:
+        re.compile(pattern)
+    return rules
+
+def chunk_to_entries(chunk, args, rules):
+    """Turn one chunk of statement rows into expense entries; returns (entries, skipped row count)"""
+    dates = parse_dates(chunk[args.date_col], args.date_format, args.dayfirst)
+    
+    # Spending is either the debit column or the amounts with the configured sign
+    if args.debit_col:
+        amounts = normalize_amounts(chunk[args.debit_col]).abs()
+    else:
+        amounts = normalize_amounts(chunk[args.amount_col])
+        amounts = -amounts if args.expense_sign == "negative" else amounts
+    
+    descriptions = chunk[args.description_col] if args.description_col else pd.Series("", index=chunk.index)
+    categories = categorize(descriptions, rules, args.default_category)
+    
+    valid = (dates.notna() & amounts.notna() & (amounts > 0)).to_numpy()
+    date_strings = dates[valid].dt.strftime("%Y-%m-%d %H:%M:%S")
+    
+    entries = [{
+        "date": date_string,
+        "expenses": {category: amount},
+        "total": amount,
+        "status": args.status,
+        "notes": description
+    } for date_string, category, amount, description in zip(
+        date_strings,
+        categories[valid],
+        amounts[valid].round(2).tolist(),
+        descriptions[valid].fillna("").astype(str).str.strip()
+    )]
+    return entries, int((~valid).sum())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import expenses from a CSV bank statement")
+    parser.add_argument("csv_file", help="Statement CSV file")
+    parser.add_argument("--user", required=True, help="User the expenses belong to")
+    parser.add_argument("--date-col", default="Date", help="Date column (default: Date)")
+    parser.add_argument("--date-format", help="strftime format of the dates (default: inferred)")
+    parser.add_argument("--dayfirst", action="store_true", help="Read ambiguous dates as day first (DD/MM/YYYY)")
+    parser.add_argument("--amount-col", default="Amount", help="Signed amount column (default: Amount)")
+    parser.add_argument("--expense-sign", choices=["negative", "positive"], default="negative",
+                        help="Sign of spending in the amount column (default: negative)")
+    parser.add_argument("--debit-col", help="Debit column; used instead of --amount-col when given")
+    parser.add_argument("--description-col", default="Description", help="Description column (default: Description)")
+    parser.add_argument("--rules", help="JSON file mapping description regexes to categories")
+    parser.add_argument("--rule", action="append", default=[], help="PATTERN=CATEGORY rule (repeatable, checked after --rules)")
+    parser.add_argument("--default-category", default=DEFAULT_CATEGORY, help="Category when no rule matches")
+    parser.add_argument("--status", choices=["paid", "unpaid"], default="paid", help="Status of imported expenses (default: paid)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk/transaction")
+    parser.add_argument("--encoding", default="utf-8", help="File encoding (default: utf-8)")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="Import rows even if identical expenses are already recorded (e.g. re-importing a statement)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without writing anything")
+    args = parser.parse_args(argv)
+    
+    try:
+        rules = load_rules(args.rules, args.rule)
+    except (OSError, ValueError, re.error) as e:
+        print(f"Error loading category rules: {e}")
+        return 1
+    
+    known_categories = set()
+    if not args.dry_run:
+        db_manager.init_db()
+        data_manager.init_data()
+        if args.user not in db_manager.get_users():
+            print(f"Unknown user: {args.user}")
+            return 1
+        known_categories.update(data_manager.get_categories())
+    
+    columns = [args.date_col, args.debit_col or args.amount_col] + ([args.description_col] if args.description_col else [])
+    imported = skipped = duplicates = rows_read = 0
+    saved_entries = []
+    added_fingerprints = Counter()
+    status = 0
+    started = time.perf_counter()
+    
+    try:
+        reader = pd.read_csv(args.csv_file, usecols=columns, dtype=str, chunksize=args.chunk_size,
+                             encoding=args.encoding, skipinitialspace=True)
+        for chunk in reader:
+            entries, chunk_skipped = chunk_to_entries(chunk, args, rules)
+            rows_read += len(chunk)
+            skipped += chunk_skipped
+            
+            if entries and not args.dry_run and not args.allow_duplicates:
+                # Skip statement lines already recorded, but not ones repeated within this file
+                entries, chunk_duplicates = db_manager.filter_new_expenses(args.user, entries, added=added_fingerprints)
+                duplicates += len(chunk_duplicates)
+            
+            if entries and not args.dry_run:
+                # One database transaction per chunk
+                if db_manager.bulk_add_expenses(args.user, entries) is None:
+                    print(f"Import stopped after {imported} expenses: could not save rows {rows_read - len(chunk) + 1}-{rows_read}")
+                    status = 1
+                    break
+                saved_entries.extend(entries)
+            
+            imported += len(entries)
+            elapsed = time.perf_counter() - started
+            print(f"{rows_read} rows read, {imported} imported, {duplicates} duplicates, {skipped} skipped "
+                  f"({rows_read / elapsed:,.0f} rows/s)")
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        print(f"Error reading {args.csv_file}: {e}")
+        status = 1
+    finally:
+        # Mirror whatever reached the database to the JSON data file, rewriting it once
+        if saved_entries:
+            data_manager.add_expenses(args.user, saved_entries)
+            
+            # Make new categories available in the app's filters
+            for category in {category for entry in saved_entries for category in entry["expenses"]} - known_categories:
+                data_manager.add_category(category)
+    
+    if status:
+        return status
+    
+    elapsed = time.perf_counter() - started
+    action = "Parsed" if args.dry_run else "Imported"
+    print(f"{action} {imported} expenses from {rows_read} rows in {elapsed:.2f}s "
+          f"({rows_read / elapsed if elapsed else 0:,.0f} rows/s); {duplicates} duplicates and {skipped} invalid rows skipped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
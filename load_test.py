@@ -0,0 +1,376 @@
+# Concurrent-session load test: N simulated users click through a realistic mix of pages
+# at the same time, the way Streamlit runs every browser session's script on its own
+# thread of one server process sharing db_manager's engine. Reports throughput, latency
+# percentiles per page, connection pool wait times and error rates at each user count.
+#
+#   python load_test.py --users 10,25,50 --duration 30
+#   python load_test.py --users 50,100 --database-url postgresql://localhost/expenses --pool-size 5 --max-overflow 10
+#
+# Pages are driven through the calls app.py makes (cache_manager reads of the JSON data file,
+# data_manager and db_manager writes), not AppTest: AppTest shares one script runtime per
+# process and can't run sessions concurrently. Widgets and rendering are not exercised.
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmark_notifications import percentile
+
+# Load test defaults
+DEFAULT_USERS = "10,25,50"
+DEFAULT_DURATION = 30.0  # seconds per user count
+DEFAULT_THINK_MS = 500.0  # mean pause between page views
+DEFAULT_RAMP_UP = 5.0  # seconds to start all users
+DEFAULT_HOUSEHOLD_USERS = 4
+DEFAULT_SEED_EXPENSES = 20000
+DEFAULT_SEED_MESSAGES = 2000
+HISTORY_PAGES = 3  # pages of history read per View History visit
+HISTORY_PAGE_SIZE = 50
+
+# Relative frequency of each page view
+PAGE_MIX = [
+    ("dashboard", 30),
+    ("view_history", 20),
+    ("messages", 20),
+    ("add_expense", 10),
+    ("mark_paid", 10),
+    ("notification_settings", 10)
+]
+
+_pool_stats = None
+
+class PoolStats:
+    """Connection checkouts seen by TimedQueuePool during one user count"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waits = []  # seconds per checkout, including opening new connections
+        self.timeouts = 0
+        self.peak_checked_out = 0
+    
+    def record(self, wait, checked_out):
+        with self.lock:
+            self.waits.append(wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+    
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+def create_pool_class():
+    """QueuePool that times every checkout into the current PoolStats"""
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from sqlalchemy.pool import QueuePool
+    
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                if _pool_stats:
+                    _pool_stats.record_timeout()
+                raise
+            if _pool_stats:
+                _pool_stats.record(time.perf_counter() - started, self.checkedout())
+            return connection
+    
+    return TimedQueuePool
+
+def create_engine(database_url, pool_size, max_overflow, pool_timeout):
+    """Engine for the load test, with the app's pool options and a timed pool"""
+    from sqlalchemy import create_engine as sqlalchemy_create_engine
+    
+    return sqlalchemy_create_engine(database_url, poolclass=create_pool_class(), pool_pre_ping=True,
+                                    pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+
+def seed_household(args):
+    """Load a synthetic household if the database has no expenses yet and write the database's
+    expenses to the JSON data file the pages read; returns the usernames"""
+    import data_manager
+    import db_manager
+    import synthetic_data
+    
+    db_manager.init_db()
+    session = db_manager.Session()
+    try:
+        has_expenses = session.query(db_manager.Expense.id).first() is not None
+    finally:
+        session.close()
+    if not has_expenses:
+        started = time.perf_counter()
+        household = synthetic_data.generate_household(args.household_users, args.seed_expenses, years=1,
+                                                      messages=DEFAULT_SEED_MESSAGES, seed=args.seed)
+        synthetic_data.load_into_database(household)
+        print(f"Seeded {args.seed_expenses} expenses for {len(household['users'])} users in {time.perf_counter() - started:.1f}s")
+    
+    usernames = db_manager.get_users()
+    data_manager.init_data()
+    data_manager.save_data({username: db_manager.get_user_expenses(username) for username in usernames})
+    return usernames
+
+def get_scenarios():
+    """Page name -> function(user state) returning a true value on success"""
+    import cache_manager
+    import data_manager
+    import db_manager
+    
+    def dashboard(state):
+        today = datetime.now().date()
+        categories = cache_manager.get_categories()
+        if not cache_manager.get_user_expenses(state["username"]):
+            return True  # the page only shows a hint
+        summary = cache_manager.get_expense_summary(state["username"])
+        budgets = cache_manager.get_budget_status(state["username"])
+        start_date = today - timedelta(days=30)
+        filtered = cache_manager.get_filtered_expenses(state["username"], start_date, today, categories)
+        if filtered:
+            cache_manager.get_dashboard_charts(state["username"], start_date, today, categories)
+        return summary is not None and budgets is not None
+    
+    def view_history(state):
+        today = datetime.now().date()
+        cache_manager.get_user_expenses(state["username"])
+        cache_manager.get_categories()
+        filtered = cache_manager.get_filtered_expenses(
+            state["username"],
+            start_date=today.replace(year=today.year - 1),
+            end_date=today,
+            status=state["rng"].choice([None, "paid", "unpaid"])
+        )
+        for page in range(HISTORY_PAGES):
+            if not filtered[page * HISTORY_PAGE_SIZE:(page + 1) * HISTORY_PAGE_SIZE]:
+                break
+        return True
+    
+    def messages(state):
+        # Poll the open conversation, sometimes replying
+        cache_manager.get_users()
+        cache_manager.get_unread_message_count(state["username"])
+        new_messages = db_manager.get_messages_since(state["username"], state["partner"], after_id=state["last_message_id"])
+        if new_messages:
+            state["last_message_id"] = new_messages[-1]["id"]
+        if state["rng"].random() < 0.3:
+            return db_manager.send_message(state["username"], state["partner"], "Load test message")
+        return True
+    
+    def add_expense(state):
+        cache_manager.get_categories()
+        amount = round(state["rng"].uniform(20, 500), 2)
+        expense = {
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "expenses": {state["rng"].choice(["Vegetables", "Gas", "Groceries"]): amount},
+            "total": amount,
+            "status": "unpaid",
+            "notes": "load test"
+        }
+        db_manager.find_duplicate_expenses(state["username"], expense)
+        data_manager.add_expense(state["username"], expense)
+        return db_manager.add_expense(state["username"], expense, notify=True)
+    
+    def mark_paid(state):
+        unpaid = cache_manager.get_filtered_expenses(state["username"], status="unpaid")[:HISTORY_PAGE_SIZE]
+        if not unpaid:
+            return True  # nothing left to pay
+        expense = state["rng"].choice(unpaid)
+        data_manager.update_expense_status(state["username"], expense, "paid")
+        return db_manager.update_expense_status(state["username"], expense, "paid", notify=True)
+    
+    def notification_settings(state):
+        return cache_manager.get_notification_preferences(state["username"]) is not None
+    
+    return {
+        "dashboard": dashboard,
+        "view_history": view_history,
+        "messages": messages,
+        "add_expense": add_expense,
+        "mark_paid": mark_paid,
+        "notification_settings": notification_settings
+    }
+
+def run_user(index, usernames, scenarios, start_at, deadline, think_ms, results, seed):
+    """One simulated session: view pages from PAGE_MIX until the deadline"""
+    rng = random.Random(seed * 100003 + index)
+    username = usernames[index % len(usernames)]
+    state = {
+        "rng": rng,
+        "username": username,
+        "partner": rng.choice([other for other in usernames if other != username]),
+        "last_message_id": None
+    }
+    names = [name for name, _ in PAGE_MIX]
+    weights = [weight for _, weight in PAGE_MIX]
+    
+    time.sleep(max(0.0, start_at - time.perf_counter()))
+    while time.perf_counter() < deadline:
+        page = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            error = None if scenarios[page](state) else "returned no result"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        results.append((page, elapsed, error))
+        
+        if think_ms:
+            time.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+
+def run_level(user_count, usernames, args):
+    """Run user_count concurrent sessions for args.duration seconds; returns the level's report"""
+    global _pool_stats
+    
+    scenarios = get_scenarios()
+    _pool_stats = PoolStats()
+    results = []  # (page, seconds, error); list.append is atomic
+    log = io.StringIO()
+    
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    threads = [
+        threading.Thread(target=run_user, name=f"load-user-{i}", daemon=True,
+                         args=(i, usernames, scenarios, started + args.ramp_up * i / user_count, deadline,
+                               args.think_ms, results, args.seed))
+        for i in range(user_count)
+    ]
+    
+    # db_manager prints its errors; collect them rather than flooding the report
+    with contextlib.redirect_stdout(log):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    
+    return summarize(user_count, results, elapsed, _pool_stats, log.getvalue())
+
+def summarize(user_count, results, elapsed, pool_stats, log):
+    """Throughput, per-page latency percentiles, pool waits and errors for one user count"""
+    pages = {}
+    for page, _ in PAGE_MIX:
+        latencies = [seconds * 1000 for name, seconds, _ in results if name == page]
+        errors = sum(1 for name, _, error in results if name == page and error)
+        pages[page] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2)
+        }
+    
+    latencies = [seconds * 1000 for _, seconds, _ in results]
+    errors = Counter(error for _, _, error in results if error)
+    log_errors = Counter(line.strip() for line in log.splitlines() if line.strip())
+    waits = [wait * 1000 for wait in pool_stats.waits]
+    
+    return {
+        "users": user_count,
+        "seconds": round(elapsed, 2),
+        "requests": len(results),
+        "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "pages": pages,
+        "pool": {
+            "checkouts": len(waits),
+            "wait_p50_ms": round(percentile(waits, 50), 3),
+            "wait_p99_ms": round(percentile(waits, 99), 3),
+            "wait_max_ms": round(max(waits), 3) if waits else 0.0,
+            "timeouts": pool_stats.timeouts,
+            "peak_checked_out": pool_stats.peak_checked_out
+        },
+        "top_errors": [{"error": error, "count": count} for error, count in (errors + log_errors).most_common(5)]
+    }
+
+def report(level):
+    """Print one user count's results"""
+    pool = level["pool"]
+    print(f"\n{level['users']} users: {level['requests']} page views in {level['seconds']:.1f}s, "
+          f"{level['throughput']:.1f}/s, {level['error_rate']:.2%} errors, "
+          f"p50 {level['p50_ms']:.1f}ms  p95 {level['p95_ms']:.1f}ms  p99 {level['p99_ms']:.1f}ms")
+    for page, result in level["pages"].items():
+        print(f"  {page:<22} {result['requests']:>7} views  {result['errors']:>5} errors  "
+              f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  p99 {result['p99_ms']:>8.1f}ms")
+    print(f"  pool: {pool['checkouts']} checkouts, wait p50 {pool['wait_p50_ms']:.2f}ms  p99 {pool['wait_p99_ms']:.2f}ms  "
+          f"max {pool['wait_max_ms']:.2f}ms, {pool['timeouts']} timeouts, peak {pool['peak_checked_out']} checked out")
+    for entry in level["top_errors"]:
+        print(f"  {entry['count']:>6} x {entry['error'][:160]}")
+
+def run_load_test(args, workdir, output):
+    """Seed the data stores and run every user count"""
+    # Configuration is read at import time, so set it before loading the app modules
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "load_test.db")
+    os.environ.setdefault("SHARED_CACHE_PATH", "")
+    
+    # cache_manager's Streamlit caches work without a server, but warn about it on every call
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    import db_manager
+    
+    pool_size = args.pool_size if args.pool_size is not None else db_manager.DB_POOL_SIZE
+    max_overflow = args.max_overflow if args.max_overflow is not None else db_manager.DB_MAX_OVERFLOW
+    db_manager.set_engine(create_engine(os.environ["DATABASE_URL"], pool_size, max_overflow, args.pool_timeout))
+    
+    usernames = seed_household(args)
+    if len(usernames) < 2:
+        print("The load test needs at least two users")
+        return 1
+    
+    print(f"{os.environ['DATABASE_URL'].split('://')[0]} database, {len(usernames)} household users, "
+          f"pool size {pool_size} + {max_overflow} overflow, think time {args.think_ms:.0f}ms")
+    
+    levels = []
+    for user_count in [int(count) for count in args.users.split(",") if count.strip()]:
+        level = run_level(user_count, usernames, args)
+        report(level)
+        levels.append(level)
+    
+    if output:
+        with open(output, "a") as f:
+            f.write(json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"),
+                                "database": os.environ["DATABASE_URL"].split("://")[0],
+                                "pool_size": pool_size, "max_overflow": max_overflow, "levels": levels}) + "\n")
+        print(f"Results appended to {output}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the data layer with concurrent simulated sessions")
+    parser.add_argument("--users", default=DEFAULT_USERS, help=f"Comma-separated concurrent session counts (default: {DEFAULT_USERS})")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds to run each user count after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=DEFAULT_RAMP_UP, help="Seconds over which sessions start")
+    parser.add_argument("--think-ms", type=float, default=DEFAULT_THINK_MS, help="Mean pause between page views (0 = none)")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite database")
+    parser.add_argument("--pool-size", type=int, help="Defaults to DB_POOL_SIZE")
+    parser.add_argument("--max-overflow", type=int, help="Defaults to DB_MAX_OVERFLOW")
+    parser.add_argument("--pool-timeout", type=float, default=30.0, help="Seconds to wait for a connection before failing")
+    parser.add_argument("--household-users", type=int, default=DEFAULT_HOUSEHOLD_USERS, help="Users seeded into an empty database")
+    parser.add_argument("--seed-expenses", type=int, default=DEFAULT_SEED_EXPENSES, help="Expenses seeded into an empty database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Append the results to this JSON lines file")
+    args = parser.parse_args()
+    
+    # The pages' JSON data file and categories (and the default SQLite database) are
+    # created in a scratch directory that is removed afterwards
+    output = os.path.abspath(args.output) if args.output else None
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        os.chdir(workdir)
+        try:
+            return run_load_test(args, workdir, output)
+        finally:
+            os.chdir(previous_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Metrics exposition configuration (nothing is exported unless one of these is set)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # serve /metrics on this port
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.environ.get("METRICS_FILE")  # write the metrics here every METRICS_INTERVAL; "{pid}" is replaced
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", "15"))
+
+# In-process metrics registry in the Prometheus text format. Every metric guards its
+# values with its own lock, held only for a dict update, so Streamlit's script threads,
+# the outbox worker and API threads can record concurrently. Values are per process:
+# with several server processes, give each its own METRICS_PORT or a METRICS_FILE with
+# "{pid}" and let Prometheus sum across them.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+_collectors = []
+_exporter_lock = threading.Lock()
+_exporter_started = False
+_state = threading.local()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonically increasing count, optionally per label values"""
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def get(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+    
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values)
+        return lines
+
+class Histogram:
+    """Distribution of observed values (e.g. latencies in seconds) in cumulative buckets"""
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [count per bucket (last is +Inf), sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+    
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def collect(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+def register_collector(collect):
+    """Add a function returning extra exposition lines at scrape time (e.g. gauges read from the database)"""
+    _collectors.append(collect)
+
+# Metrics recorded by the app
+PAGE_RENDER_SECONDS = Histogram("expense_page_render_seconds", "Time to render a page of the Streamlit app", ["page"])
+DB_CALL_SECONDS = Histogram("expense_db_call_seconds", "Duration of db_manager calls", ["function"])
+DB_QUERY_SECONDS = Histogram("expense_db_query_seconds", "Duration of SQL statements by calling db_manager function", ["function"])
+DB_ERRORS = Counter("expense_db_call_errors_total", "db_manager calls that raised", ["function"])
+CACHE_REQUESTS = Counter("expense_cache_requests_total", "Cached reads requested, by cache", ["cache"])
+CACHE_MISSES = Counter("expense_cache_misses_total", "Cached reads that had to load the data, by cache", ["cache"])
+NOTIFICATION_SENDS = Counter("expense_notification_sends_total", "SMS send attempts by result", ["result"])
+NOTIFICATION_SEND_SECONDS = Histogram("expense_notification_send_seconds", "Duration of SMS send attempts")
+OUTBOX_DELIVERIES = Counter("expense_outbox_rows_total", "Outbox rows processed by outcome", ["outcome"])
+
+def generate_text():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(_metrics):
+        lines.extend(metric.collect())
+    for collect in list(_collectors):
+        try:
+            lines.extend(collect())
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+    return "\n".join(lines) + "\n"
+
+def _collect_outbox_depth():
+    import db_manager
+    
+    lines = ["# HELP expense_outbox_rows Notification outbox rows by status",
+             "# TYPE expense_outbox_rows gauge"]
+    for status, count in sorted(db_manager.get_outbox_counts().items()):
+        lines.append(f'expense_outbox_rows{{status="{status}"}} {count}')
+    return lines
+
+def _collect_shared_cache():
+    import shared_cache
+    
+    if not shared_cache.is_enabled():
+        return []
+    stats = shared_cache.get_stats()
+    lines = ["# HELP expense_shared_cache_lookups_total Shared cache lookups by this process by result",
+             "# TYPE expense_shared_cache_lookups_total counter"]
+    lines.extend(f'expense_shared_cache_lookups_total{{result="{result}"}} {stats[key]}'
+                 for result, key in [("hit", "hits"), ("miss", "misses"), ("error", "errors")])
+    if stats["bytes"] is not None:
+        lines += ["# HELP expense_shared_cache_bytes Size of the shared cache",
+                  "# TYPE expense_shared_cache_bytes gauge",
+                  f"expense_shared_cache_bytes {stats['bytes']}"]
+    return lines
+
+def _db_timed(func, name):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Innermost db_manager function on this thread, so SQL is attributed to it
+        previous = getattr(_state, "db_function", None)
+        _state.db_function = name
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(function=name)
+            raise
+        finally:
+            DB_CALL_SECONDS.observe(time.perf_counter() - started, function=name)
+            _state.db_function = previous
+    
+    wrapper._metered = True
+    return wrapper
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if started:
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started.pop(),
+                                 function=getattr(_state, "db_function", None) or "other")
+
+def instrument_db():
+    """Time every public db_manager function and the SQL statements each one runs"""
+    import db_manager
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    
+    for name, obj in list(vars(db_manager).items()):
+        if name.startswith("_") or name in ("Session", "get_engine") or not inspect.isfunction(obj) or getattr(obj, "_metered", False):
+            continue
+        if obj.__module__ == db_manager.__name__:
+            setattr(db_manager, name, _db_timed(obj, name))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = generate_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass  # no line per scrape
+
+def write_metrics_file(path):
+    """Write the current metrics to a file atomically (for node_exporter's textfile collector)"""
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            f.write(generate_text())
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Error writing metrics file: {e}")
+
+def _run_file_writer(path):
+    while True:
+        write_metrics_file(path)
+        time.sleep(METRICS_INTERVAL)
+
+def start_exporter(port=METRICS_PORT, path=METRICS_FILE):
+    """Start exporting metrics over HTTP and/or to a file if configured (once per process)"""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started or not (port or path):
+            return False
+        _exporter_started = True
+    
+    instrument_db()
+    register_collector(_collect_outbox_depth)
+    register_collector(_collect_shared_cache)
+    
+    if port:
+        try:
+            server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics server on port {port}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"Serving metrics on http://{METRICS_HOST}:{port}/metrics")
+    
+    if path:
+        threading.Thread(target=_run_file_writer, args=(path.replace("{pid}", str(os.getpid())),),
+                         name="metrics-file", daemon=True).start()
+    return True
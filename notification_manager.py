@@ -1,126 +1,456 @@
 import os
-from twilio.rest import Client
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import datetime
 import json
 import db_manager
+import metrics
 
 # Twilio configuration
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 
+# HTTP transport configuration (base URL can point at a local fake server)
+TWILIO_API_BASE_URL = os.environ.get("TWILIO_API_BASE_URL")
+TWILIO_POOL_SIZE = int(os.environ.get("TWILIO_POOL_SIZE", "10"))
+TWILIO_HTTP_TIMEOUT = float(os.environ.get("TWILIO_HTTP_TIMEOUT", "10"))
+
+# Fan-out configuration
+NOTIFICATION_MAX_WORKERS = int(os.environ.get("NOTIFICATION_MAX_WORKERS", "8"))
+
+# Outbox delivery configuration
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE = float(os.environ.get("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.environ.get("OUTBOX_BACKOFF_MAX", "3600"))
+
+# Coalescing and rate limiting: events for one recipient arriving within the window are sent
+# as a single digest, and no recipient gets more than the limit of messages per rate window
+NOTIFICATION_COALESCE_SECONDS = float(os.environ.get("NOTIFICATION_COALESCE_SECONDS", "60"))
+NOTIFICATION_COALESCE_EVENTS = tuple(
+    event.strip() for event in os.environ.get("NOTIFICATION_COALESCE_EVENTS", "new_expense,status_change").split(",")
+    if event.strip()
+)
+NOTIFICATION_RATE_LIMIT = int(os.environ.get("NOTIFICATION_RATE_LIMIT", "10"))
+NOTIFICATION_RATE_WINDOW = float(os.environ.get("NOTIFICATION_RATE_WINDOW", "3600"))
+
+# Process-wide Twilio client, shared by every Streamlit session
+_twilio_client = None
+_twilio_http_client = None
+_twilio_client_lock = threading.Lock()
+
+# Bounded thread pool shared by all notification fan-outs
+_notification_executor = None
+_notification_executor_lock = threading.Lock()
+
+# Background outbox worker (one per process)
+_outbox_worker = None
+_outbox_worker_lock = threading.Lock()
+_outbox_wakeup = threading.Event()
+
+class RecipientRateLimiter:
+    """Sliding-window count of this process's messages per recipient. Only a fast path: a
+    recipient over the limit here is over it everywhere, but the database has the final say"""
+    
+    def __init__(self, limit=NOTIFICATION_RATE_LIMIT, window_seconds=NOTIFICATION_RATE_WINDOW):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._sent = {}
+        self._lock = threading.Lock()
+    
+    def check(self, recipient):
+        """None if a send may be allowed; otherwise the datetime when the next send is allowed"""
+        if self.limit <= 0:
+            return None
+        
+        now = time.monotonic()
+        with self._lock:
+            sent = self._sent.setdefault(recipient, deque())
+            while sent and sent[0] <= now - self.window_seconds:
+                sent.popleft()
+            
+            if len(sent) < self.limit:
+                return None
+            
+            wait_seconds = sent[0] + self.window_seconds - now
+        
+        return datetime.datetime.now() + datetime.timedelta(seconds=wait_seconds)
+    
+    def record(self, recipient):
+        """Count a send to the recipient"""
+        if self.limit > 0:
+            with self._lock:
+                self._sent.setdefault(recipient, deque()).append(time.monotonic())
+
+_recipient_rate_limiter = RecipientRateLimiter()
+
+def set_twilio_http_client(http_client):
+    """Inject the HTTP transport used by the shared Twilio client (e.g. a fake server in tests)"""
+    global _twilio_client, _twilio_http_client
+    with _twilio_client_lock:
+        _twilio_http_client = http_client
+        _twilio_client = None
+
+def get_twilio_client():
+    """Get the shared Twilio client, creating it on first use"""
+    global _twilio_client, _twilio_http_client
+    
+    client = _twilio_client
+    if client is not None:
+        return client
+    
+    with _twilio_client_lock:
+        if _twilio_client is None:
+            # twilio is imported on the first send rather than when the app starts
+            from twilio.rest import Client
+            import twilio_transport
+            
+            if _twilio_http_client is None:
+                _twilio_http_client = twilio_transport.PooledTwilioHttpClient(
+                    pool_size=TWILIO_POOL_SIZE,
+                    timeout=TWILIO_HTTP_TIMEOUT,
+                    base_url=TWILIO_API_BASE_URL
+                )
+            _twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=_twilio_http_client)
+        return _twilio_client
+
+def is_sms_configured():
+    """Check whether Twilio credentials are available"""
+    return all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER])
+
 def send_sms_notification(to_phone_number, message):
     """Send SMS notification using Twilio"""
-    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER]):
+    if not is_sms_configured():
         print("Twilio credentials not configured. SMS notification not sent.")
+        metrics.NOTIFICATION_SENDS.inc(result="skipped")
         return False
     
     if not to_phone_number:
         print("No recipient phone number provided. SMS notification not sent.")
+        metrics.NOTIFICATION_SENDS.inc(result="skipped")
         return False
     
+    started = time.perf_counter()
     try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        client = get_twilio_client()
         message = client.messages.create(
             body=message,
             from_=TWILIO_PHONE_NUMBER,
             to=to_phone_number
         )
         print(f"SMS notification sent with SID: {message.sid}")
+        metrics.NOTIFICATION_SENDS.inc(result="sent")
         return True
     except Exception as e:
         print(f"Error sending SMS notification: {e}")
+        metrics.NOTIFICATION_SENDS.inc(result="failed")
         return False
+    finally:
+        metrics.NOTIFICATION_SEND_SECONDS.observe(time.perf_counter() - started)
+
+def get_notification_executor():
+    """Get the shared notification thread pool, creating it on first use"""
+    global _notification_executor
+    
+    with _notification_executor_lock:
+        if _notification_executor is None:
+            _notification_executor = ThreadPoolExecutor(
+                max_workers=NOTIFICATION_MAX_WORKERS,
+                thread_name_prefix="sms-fanout"
+            )
+        return _notification_executor
+
+def fan_out_sms(deliveries):
+    """Send (recipient, phone_number, message) deliveries in parallel and count the outcomes"""
+    result = {"sent": 0, "failed": 0, "failed_recipients": []}
+    if not deliveries:
+        return result
+    
+    executor = get_notification_executor()
+    futures = {
+        executor.submit(send_sms_notification, phone_number, message): recipient
+        for recipient, phone_number, message in deliveries
+    }
+    
+    # Every send is bounded by the HTTP client's timeout (TWILIO_HTTP_TIMEOUT), so this returns
+    # however busy the executor shared with other sessions is
+    wait(futures)
+    
+    for future, recipient in futures.items():
+        try:
+            delivered = future.result()
+        except Exception as e:
+            print(f"Error sending SMS notification to {recipient}: {e}")
+            delivered = False
+        
+        if delivered:
+            result["sent"] += 1
+        else:
+            result["failed"] += 1
+            result["failed_recipients"].append(recipient)
+    
+    return result
 
 def format_currency(amount):
     """Format amount as Indian Rupees"""
     return f"₹{amount:.2f}"
 
+def format_new_expense_message(expense_user, total, categories, timestamp):
+    """Build the SMS text announcing a new expense"""
+    categories_list = ", ".join(categories)
+    return f"[Expense Tracker] {timestamp}: {expense_user} added a new expense of {format_currency(total)} for {categories_list}."
+
+def format_status_change_message(expense_user, total, new_status, timestamp):
+    """Build the SMS text announcing a status change"""
+    return f"[Expense Tracker] {timestamp}: {expense_user} marked expense of {format_currency(total)} as {new_status.upper()}."
+
 def notify_new_expense(expense_user, expense_data):
     """Notify other users about a new expense"""
-    notification_count = 0
-    
-    # Format expense amount
-    total_amount = format_currency(expense_data["total"])
-    
-    # Create expense categories summary
-    categories_list = ", ".join(expense_data["expenses"].keys())
-    
     # Create message
     timestamp = datetime.datetime.now().strftime("%d-%b %H:%M")
-    message = f"[Expense Tracker] {timestamp}: {expense_user} added a new expense of {total_amount} for {categories_list}."
+    message = format_new_expense_message(expense_user, expense_data["total"], expense_data["expenses"].keys(), timestamp)
     
     # Get users to notify from database
     users_to_notify = db_manager.get_users_to_notify_for_new_expense(expense_user)
     
-    # Send notifications
-    for username, phone_number in users_to_notify:
-        if send_sms_notification(phone_number, message):
-            notification_count += 1
-            print(f"Notification sent to {username} about new expense from {expense_user}")
+    # Send notifications in parallel
+    result = fan_out_sms([(username, phone_number, message) for username, phone_number in users_to_notify])
+    print(f"New expense from {expense_user}: {result['sent']} notifications sent, {result['failed']} failed")
     
-    return notification_count
+    return result
 
 def notify_status_change(expense_user, expense_data, new_status):
     """Notify users about expense status changes"""
-    notification_count = 0
-    
-    # Format expense amount
-    total_amount = format_currency(expense_data["total"])
-    
     # Create message
     timestamp = datetime.datetime.now().strftime("%d-%b %H:%M")
-    message = f"[Expense Tracker] {timestamp}: {expense_user} marked expense of {total_amount} as {new_status.upper()}."
+    message = format_status_change_message(expense_user, expense_data["total"], new_status, timestamp)
     
     # Get users to notify from database
     users_to_notify = db_manager.get_users_to_notify_for_status_change(expense_user)
     
-    # Send notifications
-    for username, phone_number in users_to_notify:
-        if send_sms_notification(phone_number, message):
-            notification_count += 1
-            print(f"Notification sent to {username} about status change from {expense_user}")
+    # Send notifications in parallel
+    result = fan_out_sms([(username, phone_number, message) for username, phone_number in users_to_notify])
+    print(f"Status change from {expense_user}: {result['sent']} notifications sent, {result['failed']} failed")
     
-    return notification_count
+    return result
+
+def format_daily_summary_message(summary, date):
+    """Build the daily summary SMS text"""
+    message = f"[Expense Tracker] Daily Summary ({date})\n"
+    message += f"Total Expenses: {format_currency(summary['total_spent'])}\n"
+    message += f"Unpaid: {format_currency(summary['unpaid'])}\n"
+    message += f"Paid: {format_currency(summary['paid'])}\n"
+    message += f"Total Entries: {summary['entry_count']}"
+    return message
+
+def format_budget_alert_message(alert):
+    """Build the SMS text warning that spend reached a threshold of a monthly budget"""
+    budget_name = f"{alert['category']} budget" if alert.get("category") else "overall budget"
+    return (f"[Expense Tracker] {alert['timestamp']}: {alert['month']} spending of {format_currency(alert['spent'])} "
+            f"has reached {alert['percent']}% of your {budget_name} ({format_currency(alert['budget'])}).")
 
 def send_daily_summary(username=None):
     """Send daily summary of expenses to users"""
-    notification_count = 0
+    # All summaries come from one grouped query
+    summaries = db_manager.get_daily_summaries(username)
     
-    # Get all users from database
-    session = db_manager.Session()
-    try:
-        # Query for all users with daily summary enabled
-        users_with_prefs = (session.query(db_manager.User, db_manager.NotificationPreference)
-                           .join(db_manager.NotificationPreference)
-                           .filter(db_manager.NotificationPreference.notify_daily_summary == 1)
-                           .filter(db_manager.NotificationPreference.phone_number.isnot(None)))
+    today = datetime.datetime.now().strftime("%d %b, %Y")
+    deliveries = [
+        (summary["username"], summary["phone_number"], format_daily_summary_message(summary, today))
+        for summary in summaries
+    ]
+    
+    # Send notifications in parallel
+    result = fan_out_sms(deliveries)
+    print(f"Daily summaries: {result['sent']} sent, {result['failed']} failed")
+    
+    return result
+
+# Outbox delivery
+def render_outbox_message(event_type, payload):
+    """Build the SMS text for a queued outbox event"""
+    if event_type == "new_expense":
+        return format_new_expense_message(payload["user"], payload["total"], payload["categories"], payload["timestamp"])
+    if event_type == "status_change":
+        return format_status_change_message(payload["user"], payload["total"], payload["status"], payload["timestamp"])
+    if event_type == "daily_summary":
+        return format_daily_summary_message(payload, payload["date"])
+    if event_type == "budget_alert":
+        return format_budget_alert_message(payload)
+    raise ValueError(f"Unknown notification event type: {event_type}")
+
+def get_retry_delay(attempts):
+    """Exponential backoff (in seconds) before the next delivery attempt"""
+    return min(OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)), OUTBOX_BACKOFF_MAX)
+
+def render_digest_message(entries):
+    """Merge several queued events for one recipient into a single SMS"""
+    if len(entries) == 1:
+        return render_outbox_message(entries[0]["event_type"], entries[0]["payload"])
+    
+    # Summarise per actor and action, keeping first-seen order
+    groups = {}
+    for entry in entries:
+        payload = entry["payload"]
+        key = (entry["event_type"], payload["user"], payload.get("status"))
+        group = groups.setdefault(key, {"count": 0, "total": 0, "categories": []})
+        group["count"] += 1
+        group["total"] += payload["total"]
+        for category in payload.get("categories", []):
+            if category not in group["categories"]:
+                group["categories"].append(category)
+    
+    lines = []
+    for (event_type, expense_user, status), group in groups.items():
+        noun = "expense" if group["count"] == 1 else "expenses"
+        if event_type == "new_expense":
+            lines.append(f"{expense_user} added {group['count']} {noun} totalling {format_currency(group['total'])} "
+                         f"for {', '.join(group['categories'])}.")
+        elif event_type == "status_change":
+            lines.append(f"{expense_user} marked {group['count']} {noun} totalling {format_currency(group['total'])} "
+                         f"as {status.upper()}.")
+        else:
+            raise ValueError(f"Unknown notification event type: {event_type}")
+    
+    first = entries[0]["payload"]["timestamp"]
+    last = entries[-1]["payload"]["timestamp"]
+    period = first if first == last else f"{first} - {last}"
+    return f"[Expense Tracker] {period}: " + " ".join(lines)
+
+def deliver_outbox_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Claim a batch of due outbox rows, send them in parallel and record the outcomes"""
+    # Leave rows queued until credentials are configured
+    if not is_sms_configured():
+        return 0
+    
+    entries = db_manager.claim_outbox_batch(
+        limit=batch_size,
+        coalesce_event_types=NOTIFICATION_COALESCE_EVENTS,
+        coalesce_seconds=NOTIFICATION_COALESCE_SECONDS
+    )
+    if not entries:
+        return 0
+    
+    # One message per recipient for coalesced events, one per row otherwise
+    messages = {}
+    for entry in sorted(entries, key=lambda e: e["id"]):
+        if entry["event_type"] in NOTIFICATION_COALESCE_EVENTS:
+            key = ("digest", entry["phone_number"])
+        else:
+            key = ("single", entry["id"])
+        messages.setdefault(key, []).append(entry)
+    
+    now = datetime.datetime.now()
+    updates = []
+    deliveries = []
+    
+    for key, group in messages.items():
+        phone_number = group[0]["phone_number"]
         
-        # Filter to specific user if requested
-        if username:
-            users_with_prefs = users_with_prefs.filter(db_manager.User.username == username)
-            
-        users_with_prefs = users_with_prefs.all()
+        try:
+            message = render_digest_message(group)
+        except Exception as e:
+            # Rows that cannot be rendered will never succeed
+            updates.extend({"id": entry["id"], "status": "dead", "last_error": str(e)} for entry in group)
+            continue
         
-        # Generate and send summaries
-        for user, prefs in users_with_prefs:
-            # Get summary data for user
-            summary = db_manager.get_user_summary(user.username)
-            
-            # Create message
-            today = datetime.datetime.now().strftime("%d %b, %Y")
-            message = f"[Expense Tracker] Daily Summary ({today})\n"
-            message += f"Total Expenses: {format_currency(summary['total_spent'])}\n"
-            message += f"Unpaid: {format_currency(summary['unpaid'])}\n"
-            message += f"Paid: {format_currency(summary['paid'])}\n"
-            message += f"Total Entries: {summary['entry_count']}"
-            
-            # Send notification
-            if send_sms_notification(prefs.phone_number, message):
-                notification_count += 1
-                print(f"Daily summary sent to {user.username}")
+        # Over the recipient's limit: hand the rows back without counting an attempt
+        retry_at = _recipient_rate_limiter.check(phone_number)
+        if retry_at is not None:
+            updates.extend({"id": entry["id"], "status": "pending", "next_attempt_at": retry_at} for entry in group)
+            continue
+        
+        deliveries.append((key, phone_number, message))
+    
+    # Every worker process sends from the same outbox, so the limit is enforced there
+    reservations = db_manager.reserve_outbox_sends(
+        [(phone_number, [entry["id"] for entry in messages[key]]) for key, phone_number, _ in deliveries],
+        NOTIFICATION_RATE_LIMIT,
+        NOTIFICATION_RATE_WINDOW
+    )
+    if reservations is None:
+        retry_at = now + datetime.timedelta(seconds=OUTBOX_POLL_INTERVAL)
+        reservations = [(None, retry_at)] * len(deliveries)
+    
+    sent_at = {}
+    allowed = []
+    for (key, phone_number, message), (reserved_at, retry_at) in zip(deliveries, reservations):
+        if reserved_at is None:
+            updates.extend({"id": entry["id"], "status": "pending", "next_attempt_at": retry_at}
+                           for entry in messages[key])
+            continue
+        _recipient_rate_limiter.record(phone_number)
+        sent_at[key] = reserved_at
+        allowed.append((key, phone_number, message))
+    deliveries = allowed
+    
+    result = fan_out_sms(deliveries)
+    failed_keys = set(result["failed_recipients"])
+    
+    for key, _, _ in deliveries:
+        for entry in messages[key]:
+            attempts = entry["attempts"] + 1
             
-    finally:
-        session.close()
+            if key not in failed_keys:
+                updates.append({"id": entry["id"], "status": "sent", "attempts": attempts, "sent_at": sent_at[key]})
+            elif attempts >= OUTBOX_MAX_ATTEMPTS:
+                # Dead-letter: keep the row for inspection but stop retrying
+                updates.append({"id": entry["id"], "status": "dead", "attempts": attempts,
+                                "last_error": "Delivery failed", "sent_at": None})
+                print(f"Notification {entry['idempotency_key']} dead-lettered after {attempts} attempts")
+            else:
+                retry_at = now + datetime.timedelta(seconds=get_retry_delay(attempts))
+                # A failed send doesn't count against the rate limit
+                updates.append({"id": entry["id"], "status": "pending", "attempts": attempts,
+                                "last_error": "Delivery failed", "next_attempt_at": retry_at, "sent_at": None})
     
-    return notification_count
\ No newline at end of file
+    if len(entries) > len(messages):
+        print(f"Outbox: {len(entries)} notifications merged into {len(messages)} messages")
+    
+    db_manager.update_outbox_entries(updates)
+    
+    for update in updates:
+        if update["status"] != "pending":
+            outcome = update["status"]
+        else:
+            outcome = "retry" if "attempts" in update else "rate_limited"
+        metrics.OUTBOX_DELIVERIES.inc(outcome=outcome)
+    return len(entries)
+
+def wake_outbox_worker():
+    """Ask the background worker to check the outbox now instead of at its next poll"""
+    _outbox_wakeup.set()
+
+def run_outbox_worker(stop_event=None):
+    """Deliver outbox notifications until stop_event is set"""
+    stop_event = stop_event or threading.Event()
+    
+    while not stop_event.is_set():
+        try:
+            # Keep draining while full batches come back
+            while deliver_outbox_batch() >= OUTBOX_BATCH_SIZE:
+                pass
+        except Exception as e:
+            print(f"Error delivering outbox notifications: {e}")
+        
+        _outbox_wakeup.wait(OUTBOX_POLL_INTERVAL)
+        _outbox_wakeup.clear()
+
+def start_outbox_worker():
+    """Start the background outbox worker for this process if it isn't running yet"""
+    global _outbox_worker
+    
+    with _outbox_worker_lock:
+        if _outbox_worker is None or not _outbox_worker.is_alive():
+            _outbox_worker = threading.Thread(target=run_outbox_worker, name="notification-outbox", daemon=True)
+            _outbox_worker.start()
+        return _outbox_worker
+
+if __name__ == "__main__":
+    # Run delivery as a standalone process: python notification_manager.py
+    db_manager.init_db()
+    run_outbox_worker()
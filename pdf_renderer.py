@@ -0,0 +1,88 @@
+# PDF receipt layout. Kept free of Streamlit and plotting imports because it runs
+# inside worker processes started by receipt_generator.
+from datetime import datetime
+
+from fpdf import FPDF
+
+# Built-in PDF fonts only cover Latin-1, so amounts use "Rs." instead of the rupee sign
+CURRENCY = "Rs."
+
+GREEN = (76, 175, 80)
+GREY = (102, 102, 102)
+RED = (220, 53, 69)
+
+def _latin1(text):
+    """Replace characters the built-in fonts cannot draw"""
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+def render_receipt_pdf(username, expense_data, receipt_id):
+    """Lay out one receipt and return the PDF bytes"""
+    date_obj = datetime.fromisoformat(expense_data["date"])
+    
+    pdf = FPDF(format="A4")
+    pdf.set_creation_date(date_obj)  # same expense, same bytes
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    
+    # Title
+    pdf.set_font("Helvetica", "B", 20)
+    pdf.set_text_color(*GREEN)
+    pdf.cell(0, 12, "Expense Receipt", align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+    
+    # Receipt details
+    status = expense_data["status"]
+    
+    pdf.set_font("Helvetica", "", 11)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(95, 7, _latin1(f"Receipt ID: {receipt_id}"))
+    pdf.set_text_color(*(GREEN if status == "paid" else RED))
+    pdf.cell(0, 7, _latin1(f"Status: {status.upper()}"), align="R", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(95, 7, f"Date: {date_obj.strftime('%d %B, %Y')}")
+    pdf.cell(0, 7, f"Total Amount: {CURRENCY} {expense_data['total']:.2f}", align="R", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 7, _latin1(f"User: {username}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(6)
+    
+    # Expense details table
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.set_text_color(*GREEN)
+    pdf.cell(0, 10, "Expense Details", new_x="LMARGIN", new_y="NEXT")
+    
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_fill_color(242, 242, 242)
+    pdf.cell(130, 8, "Category", border="B", fill=True)
+    pdf.cell(0, 8, f"Amount ({CURRENCY})", border="B", align="R", fill=True, new_x="LMARGIN", new_y="NEXT")
+    
+    pdf.set_font("Helvetica", "", 11)
+    for category, amount in expense_data["expenses"].items():
+        pdf.cell(130, 8, _latin1(category), border="B")
+        pdf.cell(0, 8, f"{amount:.2f}", border="B", align="R", new_x="LMARGIN", new_y="NEXT")
+    
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.cell(130, 8, "Total", border="B")
+    pdf.cell(0, 8, f"{expense_data['total']:.2f}", border="B", align="R", new_x="LMARGIN", new_y="NEXT")
+    
+    # Notes
+    if expense_data.get("notes"):
+        pdf.ln(6)
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.set_text_color(*GREEN)
+        pdf.cell(0, 10, "Notes", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", "", 11)
+        pdf.set_text_color(0, 0, 0)
+        pdf.multi_cell(0, 6, _latin1(expense_data["notes"]))
+    
+    # Footer
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "", 9)
+    pdf.set_text_color(*GREY)
+    pdf.cell(0, 5, "This is a computer-generated receipt and does not require a signature.", align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 5, "Thank you for using Expense Tracker!", align="C", new_x="LMARGIN", new_y="NEXT")
+    
+    return bytes(pdf.output())
+
+def render_receipt_pdf_batch(jobs):
+    """Render several (username, expense_data, receipt_id) jobs in one worker call"""
+    return [render_receipt_pdf(username, expense_data, receipt_id) for username, expense_data, receipt_id in jobs]
@@ -0,0 +1,234 @@
+import cProfile
+import functools
+import importlib
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Profiling configuration
+DEBUG_PANEL = os.environ.get("DEBUG_PANEL", "").lower() in ("1", "true", "yes")  # show the sidebar panel
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "15"))  # rows shown per table
+PROFILE_STATEMENT_CHARS = 300  # SQL statements are grouped and shown by this prefix
+
+# Per-rerun timing for the debug panel. Public functions of the instrumented modules are
+# wrapped with timed() and SQLAlchemy cursor events time every statement; both record
+# into the profile of the rerun running on the current thread (each Streamlit session's
+# script runs on its own thread), and cost one attribute lookup when nothing is recording.
+# Nothing is wrapped unless install() is called, which app.py only does with DEBUG_PANEL set.
+INSTRUMENTED_MODULES = ["cache_manager", "data_manager", "db_manager", "notification_manager", "utils", "visualization"]
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+class RerunProfile:
+    """Timings recorded during one script rerun"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.sections = {}  # name -> [calls, inclusive seconds, self seconds]
+        self.queries = {}  # statement -> [executions, total seconds, slowest seconds]
+        self._stack = []
+    
+    def enter(self):
+        self._stack.append(0.0)
+    
+    def exit(self, name, elapsed):
+        children = self._stack.pop()
+        if self._stack:
+            self._stack[-1] += elapsed
+        section = self.sections.setdefault(name, [0, 0.0, 0.0])
+        section[0] += 1
+        section[1] += elapsed
+        section[2] += elapsed - children
+    
+    def add_query(self, statement, elapsed):
+        query = self.queries.setdefault(" ".join(statement.split())[:PROFILE_STATEMENT_CHARS], [0, 0.0, 0.0])
+        query[0] += 1
+        query[1] += elapsed
+        query[2] = max(query[2], elapsed)
+    
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+    
+    def get_report(self, top=PROFILE_TOP):
+        """Summary for display: total, instrumented and SQL time, slowest sections and queries"""
+        total = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        sections = sorted(self.sections.items(), key=lambda item: item[1][2], reverse=True)
+        queries = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        
+        return {
+            "total_ms": round(total * 1000, 1),
+            # Sum of self times, so nested calls are not counted twice
+            "instrumented_ms": round(sum(section[2] for section in self.sections.values()) * 1000, 1),
+            "query_count": sum(query[0] for query in self.queries.values()),
+            "query_ms": round(sum(query[1] for query in self.queries.values()) * 1000, 1),
+            "sections": [
+                {"name": name, "calls": calls, "inclusive_ms": round(inclusive * 1000, 2), "self_ms": round(own * 1000, 2)}
+                for name, (calls, inclusive, own) in sections[:top]
+            ],
+            "queries": [
+                {"statement": statement, "executions": count, "total_ms": round(seconds * 1000, 2),
+                 "slowest_ms": round(slowest * 1000, 2)}
+                for statement, (count, seconds, slowest) in queries[:top]
+            ]
+        }
+
+def _current():
+    return getattr(_state, "profile", None)
+
+@contextmanager
+def timer(name):
+    """Time a block as a named section of the current rerun's profile"""
+    profile = _current()
+    if profile is None:
+        yield
+        return
+    
+    profile.enter()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.exit(name, time.perf_counter() - started)
+
+def timed(func, name=None):
+    """Wrap a function so its calls are timed as a section of the current rerun's profile"""
+    name = name or f"{func.__module__}.{func.__name__}"
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current()
+        if profile is None:
+            return func(*args, **kwargs)
+        
+        profile.enter()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.exit(name, time.perf_counter() - started)
+    
+    wrapper._profiled = True
+    return wrapper
+
+def instrument_module(module):
+    """Wrap the public functions defined in a module with timed(); returns how many were wrapped"""
+    count = 0
+    for name, obj in list(vars(module).items()):
+        if name.startswith("_") or not inspect.isfunction(obj) or getattr(obj, "_profiled", False):
+            continue
+        if obj.__module__ != module.__name__:
+            continue  # imported from elsewhere
+        setattr(module, name, timed(obj, f"{module.__name__}.{name}"))
+        count += 1
+    return count
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current()
+    started = conn.info.get("profiling_started")
+    if profile is not None and started:
+        profile.add_query(statement, time.perf_counter() - started.pop())
+
+def install(modules=INSTRUMENTED_MODULES):
+    """Instrument the hot-path modules and hook SQL timing (once per process)"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        
+        # Listening on the Engine class covers engines created later (db_manager creates its engine lazily)
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        
+        for module_name in modules:
+            instrument_module(importlib.import_module(module_name))
+        _installed = True
+
+def start_rerun(capture=None):
+    """Start recording this thread's rerun; capture="cprofile" or "pyinstrument" also profiles it"""
+    stop_capture()
+    _state.profile = RerunProfile()
+    _state.capture = None
+    
+    if capture == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            capture = "cprofile"
+        else:
+            _state.capture = ("pyinstrument", Profiler())
+            _state.capture[1].start()
+    if capture == "cprofile":
+        _state.capture = ("cprofile", cProfile.Profile())
+        _state.capture[1].enable()
+
+def stop_capture():
+    """Stop a cProfile/pyinstrument capture on this thread; returns its text report (None if none ran)"""
+    capture = getattr(_state, "capture", None)
+    _state.capture = None
+    if capture is None:
+        return None
+    
+    kind, profiler = capture
+    if kind == "pyinstrument":
+        profiler.stop()
+        return profiler.output_text(unicode=True, color=False)
+    
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+    return out.getvalue()
+
+def finish_rerun():
+    """Stop recording this thread's rerun; returns (profile, capture report)"""
+    capture_report = stop_capture()
+    profile = _current()
+    _state.profile = None
+    if profile is not None:
+        profile.finish()
+    return profile, capture_report
+
+def render_panel(profile, capture_report=None):
+    """Show a rerun's timing breakdown in the Streamlit sidebar"""
+    import pandas as pd
+    import streamlit as st
+    
+    if profile is None:
+        return
+    
+    report = profile.get_report()
+    with st.sidebar.expander("Debug: last rerun", expanded=False):
+        st.write(f"**{report['total_ms']:.1f} ms** total, {report['instrumented_ms']:.1f} ms in instrumented code, "
+                 f"{report['query_count']} SQL queries in {report['query_ms']:.1f} ms")
+        
+        if report["sections"]:
+            st.caption("Slowest sections (self time excludes instrumented calls they make)")
+            st.dataframe(pd.DataFrame(report["sections"]), hide_index=True, use_container_width=True)
+        
+        if report["queries"]:
+            st.caption("Slowest queries")
+            st.dataframe(pd.DataFrame(report["queries"]), hide_index=True, use_container_width=True)
+        
+        if capture_report:
+            st.caption("Profile of this rerun")
+            st.code(capture_report, language=None)
+        
+        # Profiles the rerun triggered by the click itself (the callback runs before it)
+        capture = st.selectbox("Profiler", ["cprofile", "pyinstrument"], key="profiler_choice")
+        st.button("Profile next rerun", on_click=_request_capture, args=(capture,))
+
+def _request_capture(capture):
+    import streamlit as st
+    st.session_state.profile_next_rerun = capture
@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+# On-disk receipt cache configuration
+RECEIPT_CACHE_DIR = os.environ.get("RECEIPT_CACHE_DIR", ".receipt_cache")
+RECEIPT_CACHE_MAX_BYTES = int(os.environ.get("RECEIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Running size of the cache directory, loaded lazily from disk
+_cache_bytes = None
+_cache_lock = threading.Lock()
+
+def get_cache_key(username, expense_data, template_version):
+    """Content address of a receipt: hash of the expense data and the template version"""
+    content = json.dumps([template_version, username, expense_data], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def _entry_path(key, extension):
+    # Shard by the first two hex digits to keep directories small
+    return os.path.join(RECEIPT_CACHE_DIR, key[:2], f"{key}.{extension}")
+
+def _iter_entries():
+    """Yield (path, size, last used) for every cached file"""
+    if not os.path.isdir(RECEIPT_CACHE_DIR):
+        return
+    for shard in os.scandir(RECEIPT_CACHE_DIR):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if entry.name.startswith("."):
+                continue  # in-flight temp file
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            yield entry.path, stat.st_size, stat.st_mtime
+
+def _load_cache_size():
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = sum(size for _, size, _ in _iter_entries())
+    return _cache_bytes
+
+def get(key, extension):
+    """Get a cached receipt, or None on a miss"""
+    path = _entry_path(key, extension)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    
+    # Mark as recently used for LRU eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+def put(key, extension, data):
+    """Store a rendered receipt, evicting least recently used entries past the size limit"""
+    global _cache_bytes
+    path = _entry_path(key, extension)
+    
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write to a temp file and rename so readers never see a partial receipt
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Error caching receipt: {e}")
+        return False
+    
+    with _cache_lock:
+        _cache_bytes = _load_cache_size() + len(data)
+        if _cache_bytes > RECEIPT_CACHE_MAX_BYTES:
+            evict(RECEIPT_CACHE_MAX_BYTES * 0.9)
+    return True
+
+def evict(target_bytes):
+    """Delete least recently used entries until the cache is under target_bytes"""
+    global _cache_bytes
+    
+    # Rescan: other processes may share the directory
+    entries = sorted(_iter_entries(), key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in entries)
+    
+    for path, size, _ in entries:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            total -= size
+        except OSError as e:
+            print(f"Error evicting cached receipt: {e}")
+    
+    _cache_bytes = total
+    return total
+
+def clear():
+    """Remove every cached receipt"""
+    return evict(0)
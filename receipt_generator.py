@@ -1,40 +1,57 @@
 import streamlit as st
+import os
+import re
+import io
+import threading
+import zipfile
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from html import escape
 import pandas as pd
-import base64
-from io import BytesIO
 import plotly.graph_objects as go
 
-def generate_receipt_html(username, expense_data, receipt_id=None):
-    """Generate an HTML receipt for an expense entry"""
-    
-    # Format the date
-    date_obj = datetime.strptime(expense_data["date"], "%Y-%m-%d %H:%M:%S")
-    formatted_date = date_obj.strftime("%d %B, %Y")
-    
-    # Receipt ID (could be based on timestamp if not provided)
-    if not receipt_id:
-        receipt_id = f"RCPT-{int(datetime.now().timestamp())}"
-    
-    # Create the HTML content
-    html_content = f"""
+import dedupe
+import receipt_cache
+import utils
+
+# PDF rendering configuration
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", str(os.cpu_count() or 1)))
+PDF_BATCH_CHUNK = int(os.environ.get("PDF_BATCH_CHUNK", "16"))  # receipts per worker task
+PDF_CACHE_SIZE = int(os.environ.get("PDF_CACHE_SIZE", "256"))
+
+# Worker processes keep CPU-heavy PDF layout off the Streamlit server threads
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+# Bump whenever receipt layout changes so cached receipts are re-rendered
+RECEIPT_TEMPLATE_VERSION = "3"
+
+# Recently rendered PDFs keyed by content hash, least recently used first (in front of the disk cache)
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+# Receipt template pieces; $name marks a value slot
+_RECEIPT_HEADER = """
     <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; border: 1px solid #ccc;">
         <div style="text-align: center; margin-bottom: 20px;">
             <h1 style="color: #4CAF50; margin-bottom: 5px;">Expense Receipt</h1>
-            <p style="color: #666; font-size: 14px;">Generated on {datetime.now().strftime('%d %B, %Y at %H:%M')}</p>
+            <p style="color: #666; font-size: 14px;">Recorded on $recorded_on</p>
         </div>
         
         <div style="margin-bottom: 25px; padding: 15px; background-color: #f9f9f9; border-radius: 4px;">
             <table style="width: 100%;">
                 <tr>
                     <td style="width: 50%;">
-                        <p><strong>Receipt ID:</strong> {receipt_id}</p>
-                        <p><strong>Date:</strong> {formatted_date}</p>
-                        <p><strong>User:</strong> {username}</p>
+                        <p><strong>Receipt ID:</strong> $receipt_id</p>
+                        <p><strong>Date:</strong> $date</p>
+                        <p><strong>User:</strong> $username</p>
                     </td>
                     <td style="width: 50%; text-align: right;">
-                        <p><strong>Status:</strong> <span style="color: {'green' if expense_data['status'] == 'paid' else 'red'}; text-transform: uppercase;">{expense_data['status']}</span></p>
-                        <p><strong>Total Amount:</strong> <span style="font-size: 18px;">₹{expense_data['total']:.2f}</span></p>
+                        <p><strong>Status:</strong> <span style="color: $status_color; text-transform: uppercase;">$status</span></p>
+                        <p><strong>Total Amount:</strong> <span style="font-size: 18px;">₹$total</span></p>
                     </td>
                 </tr>
             </table>
@@ -48,53 +65,187 @@ def generate_receipt_html(username, expense_data, receipt_id=None):
                     <th style="padding: 10px; text-align: right; border-bottom: 1px solid #ddd;">Amount (₹)</th>
                 </tr>
     """
-    
-    # Add expense items
-    for category, amount in expense_data["expenses"].items():
-        html_content += f"""
+
+_RECEIPT_ROW = """
                 <tr>
-                    <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">{category}</td>
-                    <td style="padding: 10px; text-align: right; border-bottom: 1px solid #ddd;">₹{amount:.2f}</td>
+                    <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">$category</td>
+                    <td style="padding: 10px; text-align: right; border-bottom: 1px solid #ddd;">₹$amount</td>
                 </tr>
         """
-    
-    # Add total row
-    html_content += f"""
+
+_RECEIPT_TOTAL = """
                 <tr style="font-weight: bold;">
                     <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">Total</td>
-                    <td style="padding: 10px; text-align: right; border-bottom: 1px solid #ddd;">₹{expense_data['total']:.2f}</td>
+                    <td style="padding: 10px; text-align: right; border-bottom: 1px solid #ddd;">₹$total</td>
                 </tr>
             </table>
         </div>
     """
-    
-    # Add notes if present
-    if "notes" in expense_data and expense_data["notes"]:
-        html_content += f"""
+
+_RECEIPT_NOTES = """
         <div style="margin-bottom: 25px;">
             <h2 style="color: #4CAF50; border-bottom: 1px solid #eee; padding-bottom: 10px;">Notes</h2>
-            <p style="padding: 10px; background-color: #f9f9f9; border-radius: 4px;">{expense_data['notes']}</p>
+            <p style="padding: 10px; background-color: #f9f9f9; border-radius: 4px;">$notes</p>
         </div>
         """
-    
-    # Add footer
-    html_content += f"""
+
+_RECEIPT_FOOTER = """
         <div style="margin-top: 30px; text-align: center; color: #666; font-size: 12px;">
             <p>This is a computer-generated receipt and does not require a signature.</p>
             <p>Thank you for using Expense Tracker!</p>
         </div>
     </div>
     """
+
+_TEMPLATE_SLOT = re.compile(r"\$(\w+)")
+
+def compile_template(text):
+    """Split a template once into alternating literal text and slot names"""
+    parts = _TEMPLATE_SLOT.split(text)
+    return parts[0::2], parts[1::2]
+
+def render_template(compiled, values, out):
+    """Append a compiled template filled with values to the out list"""
+    literals, slots = compiled
+    for literal, slot in zip(literals, slots):
+        out.append(literal)
+        out.append(values[slot])
+    out.append(literals[-1])
+
+# Templates are parsed once at import and reused for every receipt
+_COMPILED_HEADER = compile_template(_RECEIPT_HEADER)
+_COMPILED_ROW = compile_template(_RECEIPT_ROW)
+_COMPILED_TOTAL = compile_template(_RECEIPT_TOTAL)
+_COMPILED_NOTES = compile_template(_RECEIPT_NOTES)
+_COMPILED_FOOTER = compile_template(_RECEIPT_FOOTER)
+
+@lru_cache(maxsize=4096)
+def format_receipt_date(date_str):
+    """Format a stored expense date for display on a receipt"""
+    return datetime.fromisoformat(date_str).strftime("%d %B, %Y")
+
+@lru_cache(maxsize=4096)
+def format_receipt_timestamp(date_str):
+    """Format a stored expense date and time for display on a receipt"""
+    return datetime.fromisoformat(date_str).strftime("%d %B, %Y at %H:%M")
+
+def get_receipt_id(username, expense_data):
+    """Stable receipt ID derived from the whole expense (owner, date, total and breakdown)"""
+    # Dates are stored to the second and imported statement lines all fall at midnight,
+    # so the date alone doesn't tell expenses apart
+    fingerprint = dedupe.fingerprint_expense(username, expense_data)["fingerprint"]
+    return f"RCPT-{fingerprint[:12].upper()}"
+
+def render_receipt_html(out, username, expense_data, receipt_id):
+    """Write one receipt into the out list"""
+    total = f"{expense_data['total']:.2f}"
+    
+    render_template(_COMPILED_HEADER, {
+        "recorded_on": format_receipt_timestamp(expense_data["date"]),
+        "receipt_id": escape(receipt_id),
+        "date": format_receipt_date(expense_data["date"]),
+        "username": escape(username),
+        "status_color": "green" if expense_data["status"] == "paid" else "red",
+        "status": escape(expense_data["status"]),
+        "total": total
+    }, out)
     
-    return html_content
+    # Add expense items
+    for category, amount in expense_data["expenses"].items():
+        render_template(_COMPILED_ROW, {"category": escape(category), "amount": f"{amount:.2f}"}, out)
+    
+    # Add total row
+    render_template(_COMPILED_TOTAL, {"total": total}, out)
+    
+    # Add notes if present
+    if expense_data.get("notes"):
+        render_template(_COMPILED_NOTES, {"notes": escape(expense_data["notes"])}, out)
+    
+    # Add footer
+    render_template(_COMPILED_FOOTER, {}, out)
+
+def generate_receipt_html(username, expense_data, receipt_id=None):
+    """Generate an HTML receipt for an expense entry"""
+    out = []
+    render_receipt_html(out, username, expense_data, receipt_id or get_receipt_id(username, expense_data))
+    return "".join(out)
+
+def get_receipt_html(username, expense_data):
+    """Get an HTML receipt, served from the receipt cache when this exact expense was rendered before"""
+    key = receipt_cache.get_cache_key(username, expense_data, RECEIPT_TEMPLATE_VERSION)
+    cached = receipt_cache.get(key, "html")
+    if cached is not None:
+        return cached.decode()
+    
+    html_receipt = generate_receipt_html(username, expense_data)
+    receipt_cache.put(key, "html", html_receipt.encode())
+    return html_receipt
+
+def iter_receipts_html(username, expenses, start_date=None, end_date=None):
+    """Render receipts for all expenses in a date range, yielding (expense, html) pairs"""
+    # Rendering from the compiled template is cheaper than a cache file read, so bulk runs skip the cache
+    for expense_data in utils.filter_expenses(expenses, start_date=start_date, end_date=end_date):
+        yield expense_data, generate_receipt_html(username, expense_data)
+
+def generate_receipts_html(username, expenses, start_date=None, end_date=None):
+    """Render receipts for all expenses in a date range in one call"""
+    return [html for _, html in iter_receipts_html(username, expenses, start_date, end_date)]
+
+class _ZipChunkSink:
+    """Write-only, unseekable buffer that zipfile writes into and the caller drains"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def get_receipt_filename(index, expense_data, extension="html"):
+    """File name for a receipt inside an archive"""
+    stamp = expense_data["date"].replace(" ", "_").replace(":", "-")
+    return f"{index + 1:05d}_receipt_{stamp}.{extension}"
+
+def stream_receipts_zip(username, expenses, start_date=None, end_date=None, receipt_format="html"):
+    """Yield a ZIP archive of receipts chunk by chunk, holding only a few receipts in memory at a time"""
+    sink = _ZipChunkSink()
+    
+    if receipt_format == "pdf":
+        receipts = iter_receipts_pdf(username, expenses, start_date, end_date)
+        compression = zipfile.ZIP_STORED  # PDF streams are already compressed
+    else:
+        receipts = iter_receipts_html(username, expenses, start_date, end_date)
+        compression = zipfile.ZIP_DEFLATED
+    
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for index, (expense_data, receipt) in enumerate(receipts):
+            archive.writestr(get_receipt_filename(index, expense_data, receipt_format), receipt)
+            
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    
+    # Central directory written on close
+    yield sink.drain()
 
-def create_download_link(html_content, filename="receipt.html"):
-    """Create a download link for the HTML receipt"""
-    b64 = base64.b64encode(html_content.encode()).decode()
-    return f'<a href="data:text/html;base64,{b64}" download="{filename}">Download Receipt</a>'
+def build_receipts_zip(username, expenses, start_date=None, end_date=None, receipt_format="html"):
+    """Build the receipts ZIP as bytes"""
+    archive = io.BytesIO()
+    for chunk in stream_receipts_zip(username, expenses, start_date, end_date, receipt_format):
+        archive.write(chunk)
+    return archive.getvalue()
 
-def show_receipt(username, expense_data):
-    """Display a receipt in the Streamlit UI"""
+def show_receipt(username, expense_data, key=None):
+    """Display a receipt in the Streamlit UI (key tells apart widgets of identical expenses on one page)"""
+    widget_key = key or get_receipt_id(username, expense_data)
     
     st.subheader("Expense Receipt")
     
@@ -140,10 +291,121 @@ def show_receipt(username, expense_data):
         fig.update_layout(title_text="Expense Distribution")
         st.plotly_chart(fig, use_container_width=True)
     
-    # Generate HTML receipt and create download link
-    html_receipt = generate_receipt_html(username, expense_data)
-    st.markdown(create_download_link(html_receipt), unsafe_allow_html=True)
+    # Offer the HTML receipt as a download
+    html_receipt = get_receipt_html(username, expense_data)
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.download_button(
+            "Download Receipt",
+            data=html_receipt.encode(),
+            file_name="receipt.html",
+            mime="text/html",
+            key=f"download_receipt_{widget_key}"
+        )
+    
+    with col2:
+        # Rendered only on request, so viewing a receipt doesn't load fpdf
+        if st.button("Prepare PDF", key=f"prepare_pdf_{widget_key}"):
+            pdf_receipt = generate_pdf_receipt(username, expense_data)
+            if pdf_receipt:
+                st.download_button(
+                    "Download PDF",
+                    data=pdf_receipt,
+                    file_name="receipt.pdf",
+                    mime="application/pdf",
+                    key=f"download_pdf_{widget_key}"
+                )
+            else:
+                st.error("Could not generate the PDF receipt.")
+
+def get_pdf_executor():
+    """Get the shared PDF worker pool, creating it on first use"""
+    global _pdf_executor
+    
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            # Spawned (not forked) workers don't inherit the server's threads and locks
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_executor
+
+def _get_cached_pdf(key):
+    with _pdf_cache_lock:
+        pdf = _pdf_cache.get(key)
+        if pdf is not None:
+            _pdf_cache.move_to_end(key)
+            return pdf
+    
+    pdf = receipt_cache.get(key, "pdf")
+    if pdf is not None:
+        _remember_pdf(key, pdf)
+    return pdf
+
+def _remember_pdf(key, pdf):
+    with _pdf_cache_lock:
+        _pdf_cache[key] = pdf
+        _pdf_cache.move_to_end(key)
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+
+def _cache_pdf(key, pdf):
+    _remember_pdf(key, pdf)
+    receipt_cache.put(key, "pdf", pdf)
+
+def _render_pdf_window(username, window):
+    """Render one window of expenses, using cached PDFs where possible and the worker pool for the rest"""
+    keys = [receipt_cache.get_cache_key(username, expense_data, RECEIPT_TEMPLATE_VERSION) for expense_data in window]
+    pdfs = [_get_cached_pdf(key) for key in keys]
+    missing = [index for index, pdf in enumerate(pdfs) if pdf is None]
+    
+    if missing:
+        # fpdf is only loaded once a PDF actually has to be rendered
+        import pdf_renderer
+        
+        jobs = [(username, window[index], get_receipt_id(username, window[index])) for index in missing]
+        chunks = [jobs[i:i + PDF_BATCH_CHUNK] for i in range(0, len(jobs), PDF_BATCH_CHUNK)]
+        
+        rendered = [pdf for batch in get_pdf_executor().map(pdf_renderer.render_receipt_pdf_batch, chunks) for pdf in batch]
+        
+        for index, pdf in zip(missing, rendered):
+            pdfs[index] = pdf
+            _cache_pdf(keys[index], pdf)
+    
+    return pdfs
+
+def iter_receipts_pdf(username, expenses, start_date=None, end_date=None):
+    """Render PDF receipts for all expenses in a date range, yielding (expense, pdf bytes) pairs"""
+    selected = utils.filter_expenses(expenses, start_date=start_date, end_date=end_date)
+    
+    # Render a window at a time so every worker stays busy without holding every PDF in memory
+    window_size = PDF_RENDER_WORKERS * PDF_BATCH_CHUNK
+    for start in range(0, len(selected), window_size):
+        window = selected[start:start + window_size]
+        for expense_data, pdf in zip(window, _render_pdf_window(username, window)):
+            yield expense_data, pdf
+
+def generate_pdf_receipts(username, expenses, start_date=None, end_date=None):
+    """Render PDF receipts for all expenses in a date range, in parallel across worker processes"""
+    try:
+        return [pdf for _, pdf in iter_receipts_pdf(username, expenses, start_date, end_date)]
+    except Exception as e:
+        print(f"Error generating PDF receipts: {e}")
+        return []
 
 def generate_pdf_receipt(username, expense_data):
-    """Generate a PDF receipt for an expense entry (requires additional libraries)"""
-    pass  # Will implement if needed with libraries like ReportLab or WeasyPrint
\ No newline at end of file
+    """Generate a PDF receipt for an expense entry, in this process (the worker pool is for bulk runs)"""
+    try:
+        key = receipt_cache.get_cache_key(username, expense_data, RECEIPT_TEMPLATE_VERSION)
+        pdf = _get_cached_pdf(key)
+        if pdf is None:
+            import pdf_renderer
+            
+            pdf = pdf_renderer.render_receipt_pdf(username, expense_data, get_receipt_id(username, expense_data))
+            _cache_pdf(key, pdf)
+        return pdf
+    except Exception as e:
+        print(f"Error generating PDF receipt: {e}")
+        return None
@@ -0,0 +1,71 @@
+import os
+import socket
+import threading
+from datetime import datetime
+
+import db_manager
+import notification_manager
+
+# Scheduler configuration
+SCHEDULER_INTERVAL = float(os.environ.get("SCHEDULER_INTERVAL", "60"))
+SCHEDULER_LOCK_TTL = float(os.environ.get("SCHEDULER_LOCK_TTL", "180"))
+SCHEDULER_LOCK_NAME = "daily_summary_scheduler"
+
+# Identifies this process when competing for the scheduler lock
+SCHEDULER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Background scheduler thread (one per process; only the lock holder does work)
+_scheduler_thread = None
+_scheduler_stop = threading.Event()
+_scheduler_lock = threading.Lock()
+
+def is_leader():
+    """Take or renew the deployment-wide scheduler lease"""
+    return db_manager.acquire_lock(SCHEDULER_LOCK_NAME, SCHEDULER_ID, SCHEDULER_LOCK_TTL)
+
+def run_daily_summaries(now=None):
+    """Queue daily summaries that are due, if this process is the scheduler leader"""
+    if not is_leader():
+        return 0
+    
+    queued = db_manager.enqueue_due_daily_summaries(now or datetime.now())
+    if queued:
+        print(f"Queued {queued} daily summaries")
+        notification_manager.wake_outbox_worker()
+    
+    return queued
+
+def run_scheduler(stop_event=None):
+    """Run scheduled jobs every SCHEDULER_INTERVAL seconds until stop_event is set"""
+    stop_event = stop_event or _scheduler_stop
+    
+    try:
+        while not stop_event.is_set():
+            try:
+                run_daily_summaries()
+            except Exception as e:
+                print(f"Error running scheduled jobs: {e}")
+            
+            stop_event.wait(SCHEDULER_INTERVAL)
+    finally:
+        db_manager.release_lock(SCHEDULER_LOCK_NAME, SCHEDULER_ID)
+
+def start_scheduler():
+    """Start the background scheduler for this process if it isn't running yet"""
+    global _scheduler_thread
+    
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_stop.clear()
+            _scheduler_thread = threading.Thread(target=run_scheduler, name="scheduler", daemon=True)
+            _scheduler_thread.start()
+        return _scheduler_thread
+
+def stop_scheduler():
+    """Stop the background scheduler and release the lease"""
+    _scheduler_stop.set()
+
+if __name__ == "__main__":
+    # Run the scheduler as a standalone process: python scheduler.py
+    db_manager.init_db()
+    run_scheduler()
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Shared cache configuration
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", ".shared_cache.db")  # empty string disables it
+SHARED_CACHE_TTL = int(os.environ.get("SHARED_CACHE_TTL", "3600"))  # seconds an entry stays valid
+SHARED_CACHE_MAX_BYTES = int(os.environ.get("SHARED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Cache shared by every server process on the host, stored in one SQLite file in WAL
+# mode (readers never block each other or the writer). It holds
+# - entries: pickled values (summaries, aggregates, figures) computed by any worker,
+#   expiring after their TTL and evicted least recently used past SHARED_CACHE_MAX_BYTES
+# - versions: the data version counters from cache_versions, so a write in one worker
+#   invalidates the cached reads of all of them
+# Values are unpickled, so the file must only be writable by the app's user.
+
+# Only refresh an entry's last-used time this often, so cache hits rarely write
+_TOUCH_INTERVAL = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_used_at ON entries (used_at);
+CREATE TABLE IF NOT EXISTS versions (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+_MISSING = object()
+_local = threading.local()
+_stats = {"hits": 0, "misses": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+def is_enabled():
+    """Whether the shared cache is configured"""
+    return bool(SHARED_CACHE_PATH)
+
+def _connect():
+    # One connection per thread; sqlite3 connections must not be shared across threads
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SHARED_CACHE_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+def make_key(namespace, *parts):
+    """Cache key for a namespace and the arguments (and data versions) a value depends on"""
+    return f"{namespace}:" + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+def get(key, default=None):
+    """Get a cached value, or default on a miss"""
+    try:
+        conn = _connect()
+        row = conn.execute("SELECT value, expires_at, used_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            _count("misses")
+            return default
+        
+        # Unpickling can fail with almost any exception (e.g. a class that changed since the
+        # entry was written), so drop entries that can't be loaded instead of failing again
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            print(f"Error unpickling shared cache entry: {e}")
+            _count("errors")
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return default
+        
+        if now - row[2] > _TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading shared cache: {e}")
+        _count("errors")
+        return default
+    
+    _count("hits")
+    return value
+
+def put(key, value, ttl=SHARED_CACHE_TTL):
+    """Store a value, evicting expired and least recently used entries past the size limit"""
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        print(f"Error pickling value for shared cache: {e}")
+        return False
+    
+    if len(data) > SHARED_CACHE_MAX_BYTES:
+        return False
+    
+    now = time.time()
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                         (key, data, len(data), now + ttl, now))
+            _evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"Error writing shared cache: {e}")
+        _count("errors")
+        return False
+    return True
+
+def _evict(conn, now):
+    conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+    excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - SHARED_CACHE_MAX_BYTES
+    if excess <= 0:
+        return
+    
+    # Least recently used first, until enough space is freed
+    evicted = []
+    for key, size in conn.execute("SELECT key, size FROM entries ORDER BY used_at"):
+        evicted.append((key,))
+        excess -= size
+        if excess <= 0:
+            break
+    conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+def get_or_compute(key, compute, ttl=SHARED_CACHE_TTL):
+    """Get a cached value, computing and storing it on a miss (computes directly when disabled)"""
+    if not is_enabled():
+        return compute()
+    
+    value = get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        put(key, value, ttl)
+    return value
+
+def get_version(scope):
+    """Get the shared version of a data scope, or None if the cache cannot be read"""
+    try:
+        row = _connect().execute("SELECT version FROM versions WHERE scope = ?", (scope,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error reading shared cache version: {e}")
+        _count("errors")
+        return None
+    return row[0] if row else 0
+
+def bump_versions(scopes):
+    """Increment the shared versions of data scopes; returns False if they could not be updated"""
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO versions (scope, version) VALUES (?, 1) "
+                "ON CONFLICT (scope) DO UPDATE SET version = version + 1",
+                [(scope,) for scope in scopes]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"Error updating shared cache version: {e}")
+        _count("errors")
+        return False
+    return True
+
+def clear():
+    """Remove all cached values (versions are kept so in-process caches stay consistent)"""
+    try:
+        conn = _connect()
+        conn.execute("DELETE FROM entries")
+    except sqlite3.Error as e:
+        print(f"Error clearing shared cache: {e}")
+        return False
+    return True
+
+def get_stats():
+    """Hit/miss/error counts of this process and the size of the shared cache"""
+    with _stats_lock:
+        stats = dict(_stats)
+    
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+    try:
+        stats["entries"], stats["bytes"] = _connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+    except sqlite3.Error:
+        stats["entries"] = stats["bytes"] = None
+    return stats
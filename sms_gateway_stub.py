@@ -0,0 +1,146 @@
+# Local stand-in for the Twilio Messages API, for load testing without sending real SMS.
+# Point the app at it with TWILIO_API_BASE_URL, e.g.:
+#
+#   python sms_gateway_stub.py --port 8787 --latency-ms 120 --error-rate 0.02 --rate-limit 100
+#   TWILIO_API_BASE_URL=http://127.0.0.1:8787 streamlit run app.py
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+MESSAGES_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account_sid>[^/]+)/Messages\.json$")
+
+class GatewayState:
+    """Behaviour settings and counters shared by all request threads"""
+    
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # accepted messages per second, 0 = unlimited
+        self.lock = threading.Lock()
+        self.stats = {"accepted": 0, "failed": 0, "rate_limited": 0}
+        self._tokens = float(rate_limit)
+        self._last_refill = time.monotonic()
+    
+    def take_token(self):
+        """Token bucket: allow up to rate_limit requests per second"""
+        if self.rate_limit <= 0:
+            return True
+        
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+    
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        state = self.server.state
+        match = MESSAGES_PATH.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        
+        if not match:
+            self._send_json(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+            return
+        
+        # Simulated provider latency
+        delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        
+        if not state.take_token():
+            state.count("rate_limited")
+            self._send_json(429, {"code": 20429, "message": "Too Many Requests", "status": 429})
+            return
+        
+        if random.random() < state.error_rate:
+            state.count("failed")
+            self._send_json(500, {"code": 20500, "message": "Internal Server Error", "status": 500})
+            return
+        
+        state.count("accepted")
+        now = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
+        sid = "SM" + uuid.uuid4().hex
+        self._send_json(201, {
+            "sid": sid,
+            "account_sid": match.group("account_sid"),
+            "to": form.get("To", [""])[0],
+            "from": form.get("From", [""])[0],
+            "body": form.get("Body", [""])[0],
+            "status": "queued",
+            "direction": "outbound-api",
+            "num_segments": "1",
+            "date_created": now,
+            "date_updated": now,
+            "uri": f"/2010-04-01/Accounts/{match.group('account_sid')}/Messages/{sid}.json"
+        })
+    
+    def do_GET(self):
+        # Counters for the benchmark to read back
+        if self.path == "/stats":
+            with self.server.state.lock:
+                stats = dict(self.server.state.stats)
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+    
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_gateway(host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=0):
+    """Start the stand-in on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), GatewayHandler)
+    server.daemon_threads = True
+    server.state = GatewayState(latency_ms, jitter_ms, error_rate, rate_limit)
+    
+    thread = threading.Thread(target=server.serve_forever, name="sms-gateway-stub", daemon=True)
+    thread.start()
+    
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Twilio Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0, help="average response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="random +/- variation on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0, help="accepted messages per second (0 = unlimited)")
+    args = parser.parse_args()
+    
+    server, base_url = start_gateway(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit)
+    print(f"SMS gateway stand-in listening on {base_url} (set TWILIO_API_BASE_URL={base_url})")
+    
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import builtins
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Startup timing configuration
+STARTUP_REPORT_PATH = os.environ.get("STARTUP_REPORT_PATH")  # append one JSON line per process start
+STARTUP_REPORT_TOP = int(os.environ.get("STARTUP_REPORT_TOP", "15"))
+
+# Times every module imported between start() and report(), like `python -X importtime`:
+# inclusive time covers the module's own imports, self time excludes them. Modules
+# already in sys.modules (i.e. every import on a Streamlit rerun) are not timed.
+
+_original_import = builtins.__import__
+_imports = {}
+_phases = {}
+_state = threading.local()
+_lock = threading.Lock()
+_started_at = None
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    
+    stack = getattr(_state, "stack", None)
+    if stack is None:
+        stack = _state.stack = []
+    
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        _imports.setdefault(name, (elapsed, elapsed - children, len(stack)))
+
+def start():
+    """Start timing imports (no-op if already started in this process)"""
+    global _started_at
+    with _lock:
+        if _started_at is None:
+            _started_at = time.perf_counter()
+            builtins.__import__ = _timed_import
+
+def stop():
+    """Stop timing imports"""
+    with _lock:
+        if builtins.__import__ is _timed_import:
+            builtins.__import__ = _original_import
+
+@contextmanager
+def phase(name):
+    """Time a named startup phase (e.g. database setup)"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - start_time
+
+def get_report(top=STARTUP_REPORT_TOP):
+    """Summarize startup so far: slowest imports, phases and total elapsed time"""
+    # Only imports made directly by our code count towards the import total, since
+    # inclusive times of nested imports are already part of their parent's
+    top_level = [(name, timing) for name, timing in _imports.items() if timing[2] == 0]
+    slowest = sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    
+    return {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "elapsed_ms": round((time.perf_counter() - _started_at) * 1000, 1) if _started_at else None,
+        "import_ms": round(sum(timing[0] for _, timing in top_level) * 1000, 1),
+        "modules_imported": len(_imports),
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in _phases.items()},
+        "slowest_imports": [
+            {"module": name, "inclusive_ms": round(timing[0] * 1000, 1), "self_ms": round(timing[1] * 1000, 1)}
+            for name, timing in slowest
+        ],
+    }
+
+def format_report(report):
+    """Format a startup report as a table for the logs"""
+    lines = [
+        f"Startup: {report['elapsed_ms']} ms total, {report['import_ms']} ms importing "
+        f"{report['modules_imported']} modules"
+    ]
+    for name, ms in report["phases_ms"].items():
+        lines.append(f"  phase {name:<28} {ms:>9.1f} ms")
+    lines.append(f"  {'module':<34} {'inclusive':>9}    {'self':>9}")
+    for entry in report["slowest_imports"]:
+        lines.append(f"  {entry['module']:<34} {entry['inclusive_ms']:>9.1f} ms {entry['self_ms']:>9.1f} ms")
+    return "\n".join(lines)
+
+def report(path=STARTUP_REPORT_PATH):
+    """Stop timing, print the startup report and append it to the report file if configured"""
+    stop()
+    startup_report = get_report()
+    print(format_report(startup_report))
+    
+    if path:
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(startup_report) + "\n")
+        except OSError as e:
+            print(f"Error writing startup report: {e}")
+    
+    return startup_report
+
+# Measure a cold import of the app's modules in this process
+if __name__ == "__main__":
+    start()
+    with phase("import app modules"):
+        for module in ["cache_manager", "data_exporter", "data_manager", "db_manager", "notification_manager",
+                       "receipt_generator", "visualization", "utils"]:
+            __import__(module)
+    report(sys.argv[1] if len(sys.argv) > 1 else STARTUP_REPORT_PATH)
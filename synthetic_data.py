@@ -0,0 +1,178 @@
+# Synthetic household generator for benchmarks and load tests: N users with M expenses
+# spread over Y years, categories drawn from a Zipf distribution (a few staples like
+# vegetables dominate, most categories are rare) and chat messages between the members.
+# Households load into the JSON data file, the database, or both.
+#
+#   python synthetic_data.py --users 4 --expenses 100000 --years 3 --messages 5000 --seed 1
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import data_manager
+
+# Generator defaults
+ZIPF_EXPONENT = 1.1
+MAX_CATEGORIES_PER_EXPENSE = 3
+LOAD_CHUNK_SIZE = 20000  # expenses per database transaction
+
+DEFAULT_USERS = ["Padam", "Sandip", "Anita", "Ravi", "Meera", "Kiran", "Suresh", "Lata"]
+
+# Most common first
+CATEGORIES = data_manager.DEFAULT_CATEGORIES
+
+NOTES = ["", "", "", "", "", "", "", "weekly market", "shared with guests", "bulk purchase", "paid by card"]
+
+MESSAGES = [
+    "Bought vegetables today", "Did you pay for the gas?", "Paid, marking it now",
+    "Please add the rice bill", "Running low on oil", "I'll get tea on the way back",
+    "Can you settle the unpaid ones?", "Added last week's expenses", "Thanks!", "Ok"
+]
+
+# Weight of the k-th most common category: 1 / k^exponent, normalized
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+# Get usernames for a household of the given size
+def get_usernames(count):
+    if count <= len(DEFAULT_USERS):
+        return DEFAULT_USERS[:count]
+    return DEFAULT_USERS + [f"member_{i}" for i in range(len(DEFAULT_USERS) + 1, count + 1)]
+
+# Random timestamps within the last `years` years before end, sorted, as stored date strings
+def _random_dates(rng, count, years, end):
+    span = int(years * 365.25 * 24 * 3600)
+    offsets = np.sort(rng.integers(0, span, size=count))
+    start = np.datetime64(end.replace(microsecond=0) - timedelta(seconds=span), "s")
+    stamps = np.datetime_as_string(start + offsets.astype("timedelta64[s]"), unit="s")
+    return np.char.replace(stamps, "T", " ").tolist()
+
+def generate_expenses(rng, count, years=1, categories=CATEGORIES, end=None):
+    """Generate count expense entries in the app's format, oldest first"""
+    end = end or datetime.now()
+    dates = _random_dates(rng, count, years, end)
+    
+    # Up to three categories per expense (most have one), Zipf-distributed
+    category_picks = rng.choice(len(categories), size=(count, MAX_CATEGORIES_PER_EXPENSE), p=zipf_weights(len(categories)))
+    category_counts = rng.choice([1, 2, 3], size=count, p=[0.7, 0.2, 0.1])
+    
+    # Small everyday amounts with the occasional large one
+    amounts = np.round(rng.lognormal(mean=np.log(120), sigma=0.8, size=(count, MAX_CATEGORIES_PER_EXPENSE)), 2)
+    
+    # Older expenses are mostly settled, recent ones mostly not
+    recent_cutoff = (end - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    paid_draws = rng.random(count)
+    note_picks = rng.integers(0, len(NOTES), size=count)
+    
+    entries = []
+    for i, date in enumerate(dates):
+        breakdown = {}
+        for pick, amount in zip(category_picks[i, :category_counts[i]].tolist(), amounts[i].tolist()):
+            breakdown.setdefault(categories[pick], amount)
+        
+        paid_probability = 0.3 if date >= recent_cutoff else 0.95
+        entries.append({
+            "date": date,
+            "expenses": breakdown,
+            "total": round(sum(breakdown.values()), 2),
+            "status": "paid" if paid_draws[i] < paid_probability else "unpaid",
+            "notes": NOTES[note_picks[i]]
+        })
+    return entries
+
+def generate_messages(rng, usernames, count, years=1, end=None):
+    """Generate count (sender, receiver, content, created_at) messages between household members"""
+    if len(usernames) < 2 or not count:
+        return []
+    
+    end = end or datetime.now()
+    dates = _random_dates(rng, count, years, end)
+    senders = rng.integers(0, len(usernames), size=count)
+    receiver_offsets = rng.integers(1, len(usernames), size=count)
+    contents = rng.integers(0, len(MESSAGES), size=count)
+    
+    return [(
+        usernames[sender],
+        usernames[(sender + offset) % len(usernames)],
+        MESSAGES[content],
+        datetime.fromisoformat(date)
+    ) for sender, offset, content, date in zip(senders.tolist(), receiver_offsets.tolist(), contents.tolist(), dates)]
+
+def generate_household(users=4, expenses=1000, years=1, messages=0, seed=0, end=None):
+    """Generate a household: usernames, expenses per user (M in total) and messages"""
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now()
+    usernames = get_usernames(users)
+    
+    # Members record unequal shares of the household's expenses
+    shares = rng.multinomial(expenses, zipf_weights(len(usernames), exponent=0.5))
+    
+    return {
+        "users": usernames,
+        "expenses": {username: generate_expenses(rng, int(share), years, end=end) for username, share in zip(usernames, shares)},
+        "messages": generate_messages(rng, usernames, messages, years, end=end)
+    }
+
+def load_into_json(household):
+    """Write the household to the JSON data file (data_manager.DATA_FILE), replacing its contents"""
+    data_manager.init_data()
+    data_manager.save_data(household["expenses"])
+
+def load_into_database(household, chunk_size=LOAD_CHUNK_SIZE):
+    """Add the household's users, expenses and messages to the database (DATABASE_URL)"""
+    import db_manager
+    
+    db_manager.init_db()
+    for username in household["users"]:
+        db_manager.add_user(username)
+    
+    for username, entries in household["expenses"].items():
+        for start in range(0, len(entries), chunk_size):
+            if db_manager.bulk_add_expenses(username, entries[start:start + chunk_size]) is None:
+                raise RuntimeError(f"Could not load expenses for {username}")
+    
+    messages = household["messages"]
+    for start in range(0, len(messages), chunk_size):
+        if db_manager.bulk_add_messages(messages[start:start + chunk_size]) is None:
+            raise RuntimeError("Could not load messages")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic household and load it into the data stores")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--expenses", type=int, default=1000, help="Expenses in total across the household")
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--messages", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target", choices=["json", "db", "both"], default="both", help="Stores to load into (default: both)")
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+    
+    # Configuration is read at import time, so set it before loading the app modules
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if args.target != "json" and not os.environ.get("DATABASE_URL"):
+        print("Set DATABASE_URL or pass --database-url to load into the database")
+        return 1
+    
+    started = time.perf_counter()
+    household = generate_household(args.users, args.expenses, args.years, args.messages, args.seed)
+    print(f"Generated {args.expenses} expenses and {len(household['messages'])} messages for "
+          f"{len(household['users'])} users in {time.perf_counter() - started:.2f}s")
+    
+    if args.target in ("json", "both"):
+        started = time.perf_counter()
+        load_into_json(household)
+        print(f"Wrote the JSON data file in {time.perf_counter() - started:.2f}s")
+    
+    if args.target in ("db", "both"):
+        started = time.perf_counter()
+        load_into_database(household)
+        print(f"Loaded the database in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
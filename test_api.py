@@ -0,0 +1,126 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+import api
+import data_manager
+import db_manager
+import shared_cache
+
+TOKEN = "test-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """API client over a fresh SQLite database and JSON data file"""
+    workdir = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # The JSON data file and its lock file are relative to the working directory
+        monkeypatch.chdir(workdir)
+        monkeypatch.setattr(api, "API_TOKEN", TOKEN)
+        monkeypatch.setattr(shared_cache, "SHARED_CACHE_PATH", "")
+        db_manager.set_engine(create_engine(f"sqlite:///{workdir / 'expenses.db'}"))
+        
+        # Entering the client runs the lifespan (init_db, init_data)
+        with TestClient(api.app) as test_client:
+            yield test_client
+
+def post_expenses(client, username, count, status="unpaid"):
+    entries = [{
+        "date": f"2024-05-{day:02d} 10:00:00",
+        "expenses": {"Groceries": 10.0 * day, "Transport": 2.5},
+        "status": status,
+        "notes": f"entry {day}"
+    } for day in range(1, count + 1)]
+    response = client.post(f"/users/{username}/expenses", json=entries, headers=AUTH)
+    assert response.status_code == 201
+    return response.json()
+
+def test_requires_token(client):
+    assert client.get("/users").status_code == 401
+    assert client.get("/users", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    
+    response = client.get("/users", headers=AUTH)
+    assert response.status_code == 200
+    assert {"Padam", "Sandip"} <= set(response.json()["users"])
+
+def test_post_expenses(client):
+    created = post_expenses(client, "Padam", 3)
+    assert created["created"] == 3
+    assert len(created["ids"]) == 3
+    assert created["duplicates"] == 0
+    
+    response = client.get("/users/Padam/expenses", headers=AUTH)
+    items = response.json()["items"]
+    assert [item["id"] for item in items[:3]] == sorted(created["ids"], reverse=True)
+    assert items[0]["expenses"] == {"Groceries": 30.0, "Transport": 2.5}
+    assert items[0]["total"] == 32.5
+    
+    # Mirrored to the JSON data file the Streamlit app reads
+    mirrored = [entry for entry in data_manager.load_data()["Padam"] if entry["notes"].startswith("entry ")]
+    assert len(mirrored) == 3
+
+def test_post_skips_duplicates(client):
+    post_expenses(client, "Sandip", 2)
+    entries = [{"date": "2024-05-01 10:00:00", "expenses": {"Groceries": 10.0, "Transport": 2.5},
+                "notes": "entry 1"}]
+    response = client.post("/users/Sandip/expenses?skip_duplicates=true", json=entries, headers=AUTH)
+    assert response.status_code == 201
+    assert response.json() == {"created": 0, "ids": [], "duplicates": 1}
+
+def test_post_rejects_invalid_expenses(client):
+    negative = [{"expenses": {"Groceries": -1.0}}]
+    assert client.post("/users/Padam/expenses", json=negative, headers=AUTH).status_code == 422
+    
+    bad_date = [{"date": "05/01/2024", "expenses": {"Groceries": 1.0}}]
+    assert client.post("/users/Padam/expenses", json=bad_date, headers=AUTH).status_code == 422
+    
+    assert client.post("/users/Nobody/expenses", json=[{"expenses": {"Groceries": 1.0}}],
+                       headers=AUTH).status_code == 404
+
+def test_etag_not_modified(client):
+    response = client.get("/users/Padam/summary", headers=AUTH)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    
+    not_modified = client.get("/users/Padam/summary", headers={**AUTH, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    
+    # A write changes the summary, so the old ETag no longer matches
+    post_expenses(client, "Padam", 1)
+    changed = client.get("/users/Padam/summary", headers={**AUTH, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["entry_count"] == response.json()["entry_count"] + 1
+
+def test_keyset_paging(client):
+    post_expenses(client, "Padam", 7)
+    everything = client.get("/users/Padam/expenses", params={"limit": 1000}, headers=AUTH).json()
+    assert everything["next_cursor"] is None
+    expected_ids = [item["id"] for item in everything["items"]]
+    
+    paged_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get("/users/Padam/expenses", params=params, headers=AUTH).json()
+        assert len(page["items"]) <= 2
+        paged_ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert paged_ids == expected_ids
+    assert paged_ids == sorted(paged_ids, reverse=True)
+
+def test_update_status(client):
+    expense_id = post_expenses(client, "Sandip", 1)["ids"][0]
+    response = client.patch(f"/users/Sandip/expenses/{expense_id}", json={"status": "paid"}, headers=AUTH)
+    assert response.status_code == 200
+    assert response.json()["status"] == "paid"
+    
+    assert client.patch("/users/Sandip/expenses/999999", json={"status": "paid"},
+                        headers=AUTH).status_code == 404
@@ -0,0 +1,25 @@
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+
+# Imported on the first SMS send (see notification_manager.get_twilio_client), so
+# processes and pages that never send a message do not load twilio or requests
+
+TWILIO_DEFAULT_BASE_URL = "https://api.twilio.com"
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """Twilio HTTP client that keeps a persistent, sized connection pool"""
+    
+    def __init__(self, pool_size=10, timeout=10, base_url=None):
+        super().__init__(pool_connections=True, timeout=timeout)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        
+        # Size the pool so concurrent sends reuse connections instead of reconnecting
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def request(self, method, url, *args, **kwargs):
+        """Send a request, redirecting it to the configured base URL if any"""
+        if self.base_url and url.startswith(TWILIO_DEFAULT_BASE_URL):
+            url = self.base_url + url[len(TWILIO_DEFAULT_BASE_URL):]
+        return super().request(method, url, *args, **kwargs)
@@ -1,17 +1,26 @@
+import math
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 
+# Stored dates use "%Y-%m-%d %H:%M:%S", which orders the same as the datetimes it
+# represents, so filters and sorts compare the strings directly instead of parsing them
+
+SORT_OPTIONS = ["Newest First", "Oldest First", "Amount (High to Low)", "Amount (Low to High)"]
+
 # Filter expenses based on various criteria
 def filter_expenses(expenses, start_date=None, end_date=None, categories=None, status=None):
     filtered = []
+    start_key = start_date.isoformat() if start_date else None
+    end_key = end_date.isoformat() if end_date else None
     
     for expense in expenses:
-        # Check date filter
-        expense_date = datetime.strptime(expense["date"], "%Y-%m-%d %H:%M:%S").date()
+        # Check date filter (YYYY-MM-DD prefix of the stored date)
+        expense_date = expense["date"][:10]
         
         date_matches = True
-        if start_date and expense_date < start_date:
+        if start_key and expense_date < start_key:
             date_matches = False
-        if end_date and expense_date > end_date:
+        if end_key and expense_date > end_key:
             date_matches = False
         
         # Check category filter
@@ -86,3 +95,44 @@ def group_by_category(expenses):
     result.sort(key=lambda x: x[1], reverse=True)
     
     return result
+
+# Summarize expenses: total, unpaid and paid amounts and number of entries
+def summarize_expenses(expenses):
+    total = sum(expense["total"] for expense in expenses)
+    unpaid = sum(expense["total"] for expense in expenses if expense["status"] == "unpaid")
+    return {"total": total, "unpaid": unpaid, "paid": total - unpaid, "count": len(expenses)}
+
+# Sort expenses by one of SORT_OPTIONS
+def sort_expenses(expenses, sort_option):
+    if sort_option == "Newest First":
+        return sorted(expenses, key=lambda x: x["date"], reverse=True)
+    if sort_option == "Oldest First":
+        return sorted(expenses, key=lambda x: x["date"])
+    if sort_option == "Amount (High to Low)":
+        return sorted(expenses, key=lambda x: x["total"], reverse=True)
+    if sort_option == "Amount (Low to High)":
+        return sorted(expenses, key=lambda x: x["total"])
+    return list(expenses)
+
+# Get one page of items (pages start at 1) and the total number of pages
+def paginate(items, page, page_size):
+    page_count = max(1, math.ceil(len(items) / page_size))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page_count
+
+# Find the page holding the first expense on the given day (or the nearest one in sort order)
+def find_page_for_date(sorted_expenses, target_date, page_size, sort_option):
+    dates = [expense["date"] for expense in sorted_expenses]
+    
+    if sort_option == "Oldest First":
+        index = bisect_left(dates, target_date.isoformat())
+    elif sort_option == "Newest First":
+        # Dates are descending: count the entries after the end of the target day
+        dates.reverse()
+        index = len(dates) - bisect_right(dates, f"{target_date.isoformat()} 23:59:59")
+    else:
+        return 1
+    
+    index = min(index, max(len(dates) - 1, 0))
+    return index // page_size + 1
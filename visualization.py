@@ -1,10 +1,14 @@
-import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
 
+# plotly.express is imported inside the chart functions that use it, so loading this
+# module (e.g. for compute_household_monthly_trends) does not pay for it
+
 # Create a pie chart showing expense distribution by category
 def create_category_pie_chart(expenses):
+    import plotly.express as px
+    
     # Group expenses by category
     categories = {}
     
@@ -42,6 +46,8 @@ def create_category_pie_chart(expenses):
 
 # Create a time series chart showing expenses over time
 def create_time_series_chart(expenses):
+    import plotly.express as px
+    
     # Process data
     timeline_data = {}
     
@@ -95,6 +101,8 @@ def create_time_series_chart(expenses):
 
 # Create a chart showing paid vs unpaid expenses
 def create_payment_status_chart(expenses):
+    import plotly.express as px
+    
     # Calculate paid and unpaid amounts
     paid = sum(expense["total"] for expense in expenses if expense["status"] == "paid")
     unpaid = sum(expense["total"] for expense in expenses if expense["status"] == "unpaid")
@@ -139,6 +147,41 @@ def create_payment_status_chart(expenses):
     
     return fig
 
+# Create a budget usage chart: the share of each budget spent so far this month, marking how
+# much of a budget spending at an even pace would have used by today
+def create_budget_usage_chart(budgets, today):
+    import calendar
+    
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    pace = today.day / days_in_month * 100
+    
+    # Red when over budget, orange when ahead of pace
+    colors = [
+        "red" if budget["percent"] >= 100 else "orange" if budget["percent"] > pace else "green"
+        for budget in budgets
+    ]
+    
+    fig = go.Figure(go.Bar(
+        x=[budget["percent"] for budget in budgets],
+        y=[budget["category"] or "All categories" for budget in budgets],
+        orientation="h",
+        marker_color=colors,
+        text=[f"₹{budget['spent']:.0f} of ₹{budget['budget']:.0f}" for budget in budgets],
+        textposition="auto"
+    ))
+    
+    fig.add_vline(x=pace, line_dash="dash", line_color="gray", annotation_text="Even pace")
+    
+    fig.update_layout(
+        title=f"Budget Used in {today.strftime('%B')}",
+        xaxis_title="% of budget",
+        yaxis_title="",
+        yaxis={"autorange": "reversed"},
+        height=max(250, 60 * len(budgets) + 120)
+    )
+    
+    return fig
+
 # Create a monthly trends chart
 def create_monthly_trends_chart(expenses):
     # Group by month
@@ -198,3 +241,83 @@ def create_monthly_trends_chart(expenses):
     )
     
     return fig
+
+# Compute paid/unpaid/total per month for every user in one vectorized pass
+def compute_household_monthly_trends(data):
+    rows = [
+        (username, entry["date"], entry["total"], entry["status"])
+        for username, entries in data.items()
+        for entry in entries
+    ]
+    
+    if not rows:
+        return pd.DataFrame(columns=["User", "Month", "Paid", "Unpaid", "Total"])
+    
+    df = pd.DataFrame(rows, columns=["User", "Date", "Total", "Status"])
+    
+    # Bucket every entry into the first day of its month
+    df["Month"] = pd.to_datetime(df["Date"], format="%Y-%m-%d %H:%M:%S").dt.to_period("M").dt.to_timestamp()
+    df["Paid"] = df["Total"].where(df["Status"] == "paid", 0.0)
+    df["Unpaid"] = df["Total"] - df["Paid"]
+    
+    trends = df.groupby(["User", "Month"], as_index=False)[["Paid", "Unpaid", "Total"]].sum()
+    
+    return trends.sort_values(["Month", "User"]).reset_index(drop=True)
+
+# Create a grouped bar chart comparing monthly totals across household members
+def create_household_comparison_chart(trends):
+    import plotly.express as px
+    
+    fig = px.bar(
+        trends,
+        x="Month",
+        y="Total",
+        color="User",
+        barmode="group",
+        title="Monthly Expenses by Household Member",
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Amount (₹)",
+        xaxis=dict(tickformat="%b %Y"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    
+    return fig
+
+# Create stacked paid/unpaid bars per month, one panel per household member
+def create_household_status_chart(trends):
+    import plotly.express as px
+    
+    df = trends.melt(
+        id_vars=["User", "Month"],
+        value_vars=["Paid", "Unpaid"],
+        var_name="Status",
+        value_name="Amount"
+    )
+    
+    fig = px.bar(
+        df,
+        x="Month",
+        y="Amount",
+        color="Status",
+        facet_col="User",
+        barmode="stack",
+        title="Paid vs Unpaid by Household Member",
+        color_discrete_map={
+            "Paid": "green",
+            "Unpaid": "red"
+        }
+    )
+    
+    fig.update_xaxes(title_text="", tickformat="%b %Y")
+    fig.update_yaxes(title_text="")
+    fig.update_layout(
+        yaxis_title="Amount (₹)",
+        legend=dict(orientation="h", yanchor="bottom", y=1.08, xanchor="right", x=1)
+    )
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+    
+    return fig